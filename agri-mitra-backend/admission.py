@@ -0,0 +1,138 @@
+# admission.py
+# Admission control for agent runs.
+# Every agent run fans out into several Gemini/BigQuery/search calls, so a burst
+# of webhooks (rain alert, price spike) without a limit makes every request time
+# out together. At most `max_in_flight` runs execute at once; up to `max_queue`
+# more wait for a slot, each for at most its deadline. Anything beyond that is
+# rejected immediately so the caller can answer "busy, retry shortly" instead
+# of piling on. An admitted run gets its own deadline as well: a run that hangs
+# on a slow downstream call is cancelled rather than holding its slot forever.
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a run is shed because the queue is full, its deadline passed while
+    waiting, or (reason "run_deadline") it was cancelled for running too long.
+    """
+
+    def __init__(self, reason: str, retry_after_seconds: float):
+        super().__init__(f"agent run rejected ({reason})")
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+class AdmissionController:
+    """Global concurrency limit with a bounded wait queue, per-request wait deadlines and run deadlines."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 128,
+        queue_timeout_seconds: float = 10.0,
+        retry_after_seconds: float = 15.0,
+        run_timeout_seconds: Optional[float] = None,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.run_timeout_seconds = run_timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+        self.timed_out = 0
+        self.max_waiting = 0
+        self.wait_seconds_total = 0.0
+
+    def saturated(self) -> bool:
+        """True if a new run would be rejected right away."""
+        return self.in_flight >= self.max_in_flight and self.waiting >= self.max_queue
+
+    def check(self):
+        """Raises AdmissionRejected right away if a new run could not even be queued."""
+        if self.saturated():
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("queue_full", self.retry_after_seconds)
+
+    @asynccontextmanager
+    async def slot(self, deadline_seconds: Optional[float] = None, limit_run: bool = True):
+        """
+        Holds a run slot for the duration of the `async with` block. Waits at most
+        `deadline_seconds` (default `queue_timeout_seconds`) for a slot and raises
+        AdmissionRejected if none frees up in time or the queue is already full.
+        The block itself is cancelled after `run_timeout_seconds` (None: no limit),
+        which also raises AdmissionRejected. Pass `limit_run=False` when the block
+        yields to a consumer (a streaming response) and bound the run with
+        `limit_events` instead.
+        """
+        self.check()
+        timeout = self.queue_timeout_seconds if deadline_seconds is None else deadline_seconds
+        started = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected_deadline += 1
+            raise AdmissionRejected("deadline", self.retry_after_seconds) from None
+        finally:
+            self.waiting -= 1
+        self.wait_seconds_total += time.monotonic() - started
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            async with asyncio.timeout(self.run_timeout_seconds if limit_run else None) as run_deadline:
+                yield
+        except TimeoutError:
+            if not run_deadline.expired():
+                raise
+            self.timed_out += 1
+            raise AdmissionRejected("run_deadline", self.retry_after_seconds) from None
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def limit_events(self, events: AsyncIterator) -> AsyncIterator:
+        """
+        Yields the events of a streaming run until `run_timeout_seconds` have passed, then
+        raises AdmissionRejected. Only the waits for the next event are bounded, so a
+        timeout never cancels the consumer while it handles an event.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if self.run_timeout_seconds is None else loop.time() + self.run_timeout_seconds
+        while True:
+            try:
+                async with asyncio.timeout_at(deadline) as wait:
+                    event = await anext(events)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                if not wait.expired():
+                    raise
+                self.timed_out += 1
+                raise AdmissionRejected("run_deadline", self.retry_after_seconds) from None
+            yield event
+
+    def stats(self) -> dict:
+        """Returns in-flight runs, queue depth and rejection counters."""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_queue_depth_seen": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_deadline": self.rejected_deadline,
+            "timed_out": self.timed_out,
+            "run_timeout_seconds": self.run_timeout_seconds,
+            "mean_wait_seconds": round(self.wait_seconds_total / self.admitted, 4) if self.admitted else None,
+        }
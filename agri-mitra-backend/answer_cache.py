@@ -0,0 +1,94 @@
+# answer_cache.py
+# Exact-match answer cache for the stateless /query endpoint.
+# Questions are keyed on their normalized text. Each entry expires after a TTL
+# chosen from the sub-agents that produced the answer, so fast-changing answers
+# (weather) expire quickly while slow-changing ones (government schemes) are kept
+# longer. The cache is bounded and evicts the least recently used entries.
+
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+# Seconds an answer stays valid, by the sub-agent (AgentTool) that contributed to it.
+# An answer that used several sub-agents gets the shortest of their TTLs.
+DEFAULT_AGENT_TTLS = {
+    "weather_forecast_agent": 15 * 60,
+    "shopping_agent": 60 * 60,
+    "websearch_agent": 60 * 60,
+    "db_ds_multiagent": 6 * 3600,  # Mandi prices are refreshed daily
+    "rag_agent": 24 * 3600,  # Schemes and advisories change rarely
+}
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes a question for exact matching: Unicode NFKC, case folding, punctuation
+    and symbols removed, whitespace collapsed. Combining marks are kept so that
+    Devanagari and other Indic scripts are not mangled.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(" " if unicodedata.category(ch)[0] in "PS" else ch for ch in text)
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """LRU cache of agent answers with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1000, default_ttl_seconds: float = 3600, agent_ttls: Optional[dict] = None):
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+        self.agent_ttls = DEFAULT_AGENT_TTLS if agent_ttls is None else agent_ttls
+        self._entries = OrderedDict()  # key -> (answer, expires_at, agents)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def ttl_for(self, agents: Iterable[str]) -> float:
+        """Returns the TTL for an answer produced by the given sub-agents."""
+        ttls = [self.agent_ttls.get(agent, self.default_ttl_seconds) for agent in agents]
+        return min(ttls) if ttls else self.default_ttl_seconds
+
+    def get(self, text: str) -> Optional[str]:
+        """Returns the cached answer for the question, or None on a miss."""
+        key = normalize_query(text)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, text: str, answer: str, agents: Iterable[str] = ()):
+        """Stores an answer with a TTL derived from the sub-agents that produced it."""
+        agents = sorted(set(agents))
+        key = normalize_query(text)
+        self._entries[key] = (answer, time.monotonic() + self.ttl_for(agents), agents)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def record_bypass(self):
+        self.bypassed += 1
+
+    def stats(self) -> dict:
+        """Returns size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "bypassed": self.bypassed,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
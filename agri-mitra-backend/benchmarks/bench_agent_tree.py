@@ -0,0 +1,156 @@
+# bench_agent_tree.py
+# Offline benchmark of the agent tree (root_agent and its AgentTool sub-agents)
+# on the deterministic fake LLM backend (fake_llm.py). No Gemini call is made,
+# so the numbers are the cost of ADK, the agent tree and the session service:
+#   1. framework overhead: turns run one at a time with zero model latency;
+#   2. concurrency: turns run N at a time with scripted model latency, reporting
+#      throughput, latency percentiles and overhead (wall time minus the
+#      simulated model time of each turn);
+#   3. memory: peak RSS and Python heap allocated per retained session.
+#
+# Usage (from agri-mitra-backend, with agrimitra-core-main on PYTHONPATH):
+#   python benchmarks/bench_agent_tree.py --turns 200 --concurrency 1,10,50,200
+#   python benchmarks/bench_agent_tree.py --script script.json --llm-latency 0.5
+# or on recorded responses (cassette.py): record once against the live services, then
+# replay anywhere; --latency-scale applies to the concurrency phase.
+#   python benchmarks/bench_agent_tree.py --cassette cassettes/bench.json --cassette-mode record --turns 6 --concurrency 1
+#   python benchmarks/bench_agent_tree.py --cassette cassettes/bench.json --latency-scale 1
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "loadtest"))
+
+import cassette
+import fake_llm
+from latency import percentile
+
+QUESTIONS = [
+    "Kya kal baarish hogi Indore mein?",
+    "What is the weather forecast for Nashik this week?",
+    "Suggest a drip irrigation kit under 5000 rupees",
+    "Which fertilizer is best for paddy in the tillering stage?",
+    "PM-Kisan yojana ki agli kist kab aayegi?",
+    "How do I store onions after harvest?",
+]
+
+
+async def run_turn(runner, question: str, keep_session: bool = False) -> tuple:
+    """Runs one turn in a fresh session. Returns (wall seconds, simulated model seconds, model calls)."""
+    from google.genai import types
+
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id="bench")
+    content = types.Content(role="user", parts=[types.Part(text=question)])
+    started = time.perf_counter()
+    with fake_llm.measure() as meter, cassette.measure() as replayed:
+        async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=content):
+            pass
+    elapsed = time.perf_counter() - started
+    if not keep_session:
+        await runner.session_service.delete_session(app_name=runner.app_name, user_id="bench", session_id=session.id)
+    return elapsed, meter.seconds + replayed.seconds, meter.calls + replayed.calls
+
+
+async def run_level(runner, turns: int, concurrency: int, keep_sessions: bool = False) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(index: int):
+        async with semaphore:
+            return await run_turn(runner, QUESTIONS[index % len(QUESTIONS)], keep_sessions)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(index) for index in range(turns)))
+    return results, time.perf_counter() - started
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args):
+    if args.cassette_mode != "record":
+        fake_llm.install_fake_google_auth()
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "offline")
+    os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "us-central1")
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from agrimitra.agent import root_agent
+
+    recorder = cassette.Cassette(args.cassette, mode=args.cassette_mode).install() if args.cassette else None
+
+    def make_runner(latency) -> Runner:
+        if recorder is not None:
+            recorder.latency_scale = args.latency_scale if latency else 0.0
+            return Runner(agent=root_agent, app_name="agrimitra", session_service=InMemorySessionService())
+        if args.script:
+            script = fake_llm.FakeScript.load(args.script)
+            if latency == 0:
+                script.latency = fake_llm.Latency()
+                for rule in script.rules:
+                    rule.latency = None
+        else:
+            script = fake_llm.default_script(latency=latency)
+        fake_llm.install(root_agent, script)
+        return Runner(agent=root_agent, app_name="agrimitra", session_service=InMemorySessionService())
+
+    # 1. Framework overhead with instant model responses.
+    runner = make_runner(0)
+    await run_level(runner, min(20, args.turns), 1)  # warm-up
+    results, _ = await run_level(runner, args.turns, 1)
+    walls = sorted(wall * 1000 for wall, _, _ in results)
+    calls = statistics.mean(calls for _, _, calls in results)
+    print(f"Framework overhead over {args.turns} sequential turns ({calls:.1f} model calls per turn):")
+    print(f"  mean {statistics.mean(walls):.2f} ms   p50 {percentile(walls, 50):.2f} ms   "
+          f"p99 {percentile(walls, 99):.2f} ms   per model call {statistics.mean(walls) / calls:.2f} ms\n")
+
+    # 2. Concurrency with scripted model latency.
+    latency = {"distribution": "lognormal", "mean": args.llm_latency, "sigma": args.sigma}
+    runner = make_runner(latency)
+    print(f"Concurrency with {args.llm_latency}s mean model latency, {args.turns} turns per level:")
+    print(f"{'concurrency':>11}{'turns/s':>10}{'p50 s':>9}{'p99 s':>9}{'overhead p50 ms':>17}{'overhead p99 ms':>17}{'max RSS MB':>12}")
+    for concurrency in args.concurrency:
+        results, elapsed = await run_level(runner, args.turns, concurrency)
+        walls = sorted(wall for wall, _, _ in results)
+        overheads = sorted((wall - simulated) * 1000 for wall, simulated, _ in results)
+        print(f"{concurrency:>11}{len(results) / elapsed:>10.1f}{percentile(walls, 50):>9.3f}{percentile(walls, 99):>9.3f}"
+              f"{percentile(overheads, 50):>17.2f}{percentile(overheads, 99):>17.2f}{max_rss_mb():>12.1f}")
+
+    # 3. Memory retained per session (sessions are kept, as for long-lived farmer conversations).
+    runner = make_runner(0)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await run_level(runner, args.turns, max(args.concurrency), keep_sessions=True)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"\nMemory: {retained / args.turns / 1024:.1f} KiB retained per one-turn session, "
+          f"traced peak {peak / 1024 / 1024:.1f} MiB, max RSS {max_rss_mb():.1f} MB")
+    if recorder is not None:
+        recorder.uninstall()
+        recorder.save()
+        print(f"Cassette: {recorder.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline agent tree benchmark on the fake LLM backend")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,10,50,200", type=lambda value: [int(v) for v in value.split(",")])
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean seconds per model call")
+    parser.add_argument("--sigma", type=float, default=0.4, help="log-normal sigma of the model latency")
+    parser.add_argument("--script", help="fake_llm JSON script (default: keyword routing to sub-agents)")
+    parser.add_argument("--cassette", help="use the real models through a record/replay cassette instead of fake_llm")
+    parser.add_argument("--cassette-mode", default="replay", choices=cassette.MODES)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier of the cassette's recorded latencies")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
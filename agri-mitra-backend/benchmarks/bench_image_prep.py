@@ -0,0 +1,132 @@
+# bench_image_prep.py
+# Benchmark for the image preprocessing stage in front of Gemini vision.
+# For every sample image it reports the bytes sent to the model and the
+# end-to-end latency with the raw Twilio bytes ("before") and with the
+# downscaled, re-encoded image ("after").
+#
+# By default the upload part of the latency is estimated from --uplink-mbps so
+# the benchmark runs offline. With --gemini the images are actually described
+# by GOOGLE_MODEL_FOR_IMAGE (needs Vertex AI credentials) and the measured
+# latency and prompt token counts are reported instead.
+#
+# Usage (from agri-mitra-backend):
+#   python benchmarks/bench_image_prep.py                      # synthetic phone photos
+#   python benchmarks/bench_image_prep.py --images ./samples   # your own .jpg/.png files
+#   python benchmarks/bench_image_prep.py --images ./samples --gemini
+
+import argparse
+import asyncio
+import glob
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from image_prep import ImagePreprocessor
+
+
+def synthetic_photos(count: int, size=(4032, 3024)) -> list:
+    """Builds phone-sized JPEGs with smooth structure, sensor noise and an EXIF orientation tag."""
+    photos = []
+    rng = np.random.default_rng(42)
+    for i in range(count):
+        coarse = rng.integers(0, 255, (24, 32, 3), dtype=np.uint8)
+        image = Image.fromarray(coarse).resize(size, Image.BICUBIC)
+        pixels = np.asarray(image, dtype=np.int16) + rng.integers(-12, 12, (size[1], size[0], 3))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+        exif = Image.Exif()
+        exif[0x0112] = 6 if i % 2 else 1  # rotated 90 degrees on every other photo
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=92, exif=exif)
+        photos.append((f"synthetic-{i}.jpg", output.getvalue(), "image/jpeg"))
+    return photos
+
+
+def load_images(directory: str) -> list:
+    images = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        extension = os.path.splitext(path)[1].lower()
+        if extension in (".jpg", ".jpeg", ".png"):
+            with open(path, "rb") as f:
+                mime_type = "image/png" if extension == ".png" else "image/jpeg"
+                images.append((os.path.basename(path), f.read(), mime_type))
+    return images
+
+
+async def describe(model, content: bytes, mime_type: str) -> tuple:
+    """Returns (seconds, prompt tokens) for one real description call."""
+    from vertexai.generative_models import Part
+
+    parts = [Part.from_data(data=content, mime_type=mime_type), "Describe this image from an agricultural perspective."]
+    start = time.perf_counter()
+    response = await model.generate_content_async(parts)
+    return time.perf_counter() - start, response.usage_metadata.prompt_token_count
+
+
+async def run(args):
+    images = load_images(args.images) if args.images else synthetic_photos(args.count)
+    if not images:
+        sys.exit(f"No .jpg/.png images found in {args.images}")
+    preprocessor = ImagePreprocessor(max_dimension=args.max_dimension, quality=args.quality)
+    model = None
+    if args.gemini:
+        from vertexai.generative_models import GenerativeModel
+        model = GenerativeModel(os.environ.get("GOOGLE_MODEL_FOR_IMAGE", "gemini-2.5-flash-lite"))
+
+    bytes_per_second = args.uplink_mbps * 1e6 / 8
+    rows = []
+    for name, content, mime_type in images:
+        start = time.perf_counter()
+        prepared, prepared_mime = await preprocessor.prepare(content, mime_type)
+        prep_seconds = time.perf_counter() - start
+        row = {"name": name, "before_bytes": len(content), "after_bytes": len(prepared), "prep": prep_seconds}
+        if model is not None:
+            row["before"], row["before_tokens"] = await describe(model, content, mime_type)
+            after_seconds, row["after_tokens"] = await describe(model, prepared, prepared_mime)
+            row["after"] = prep_seconds + after_seconds
+        else:
+            row["before"] = len(content) / bytes_per_second
+            row["after"] = prep_seconds + len(prepared) / bytes_per_second
+        rows.append(row)
+    preprocessor.close()
+
+    mode = "measured Gemini latency" if model else f"estimated upload at {args.uplink_mbps} Mbit/s"
+    print(f"{len(rows)} images, max dimension {args.max_dimension}, JPEG quality {args.quality} ({mode})")
+    header = f"{'image':<24}{'before KB':>11}{'after KB':>10}{'prep ms':>9}{'before s':>10}{'after s':>9}"
+    if model:
+        header += f"{'tokens before':>15}{'after':>7}"
+    print(header)
+    for row in rows:
+        line = (f"{row['name'][:23]:<24}{row['before_bytes'] / 1024:>11.0f}{row['after_bytes'] / 1024:>10.0f}"
+                f"{row['prep'] * 1000:>9.1f}{row['before']:>10.3f}{row['after']:>9.3f}")
+        if model:
+            line += f"{row['before_tokens']:>15}{row['after_tokens']:>7}"
+        print(line)
+
+    before_bytes = sum(row["before_bytes"] for row in rows)
+    after_bytes = sum(row["after_bytes"] for row in rows)
+    print(f"bytes sent: {before_bytes / 1024:.0f} KB -> {after_bytes / 1024:.0f} KB "
+          f"({100 * (1 - after_bytes / before_bytes):.1f}% less)")
+    print(f"median end-to-end: {statistics.median(r['before'] for r in rows):.3f} s -> "
+          f"{statistics.median(r['after'] for r in rows):.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image preprocessing benchmark")
+    parser.add_argument("--images", help="directory of sample .jpg/.png files (default: synthetic photos)")
+    parser.add_argument("--count", type=int, default=8, help="number of synthetic photos")
+    parser.add_argument("--max-dimension", type=int, default=1024)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--uplink-mbps", type=float, default=20.0, help="bandwidth used to estimate upload time")
+    parser.add_argument("--gemini", action="store_true", help="call Gemini instead of estimating upload time")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
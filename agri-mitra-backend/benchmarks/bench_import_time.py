@@ -0,0 +1,116 @@
+# bench_import_time.py
+# Cold-start import cost of the agent package and the web app. Each module is
+# imported in a fresh interpreter under `python -X importtime`, so nothing is
+# cached between runs; the benchmark reports the median cumulative import time
+# and the modules that cost the most on their own. The RAG and data-science
+# sub-agents, the Vertex AI SDK and the Google Cloud clients are loaded on first
+# use (or by the startup warm-up), so they should not show up here; the cost of
+# loading the sub-agents is reported separately with --sub-agents.
+#
+# Imports run with local fake credentials and the offline environment of
+# loadtest/fake_server.py, so no Google Cloud access is needed. With --max-ms the
+# script exits non-zero when an import takes longer, for use as a budget check.
+#
+# Usage (from agri-mitra-backend):
+#   python benchmarks/bench_import_time.py --runs 5 --sub-agents
+#   python benchmarks/bench_import_time.py --module agrimitra --max-ms 1500
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORE_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "agrimitra-core-main")
+sys.path[:0] = [CORE_DIR, os.path.join(BACKEND_DIR, "loadtest")]
+
+from fake_server import OFFLINE_ENVIRONMENT
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+# Loaded on first use; importing agrimitra or web should not pull them in.
+HEAVY_MODULES = ("vertexai", "google.cloud.bigquery", "pandas", "sqlglot")
+
+# Runs in the child before the timed import: clients that are still built at import time get
+# anonymous credentials (google.auth itself is therefore not counted in the import time).
+PRELUDE = (
+    "import sys, google.auth; from google.auth.credentials import AnonymousCredentials; "
+    "google.auth.default = lambda *args, **kwargs: (AnonymousCredentials(), 'loadtest'); "
+)
+
+LOAD_SUB_AGENTS = (
+    "import time; from agrimitra.agent import rag_agent_tool, db_ds_multiagent_tool; "
+    "start = time.perf_counter(); rag_agent_tool.agent; db_ds_multiagent_tool.agent; "
+    "print(f'sub-agents loaded in {(time.perf_counter() - start) * 1000:.0f} ms', file=sys.stderr)"
+)
+
+
+def child_environment() -> dict:
+    env = dict(os.environ)
+    env.update(OFFLINE_ENVIRONMENT)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [CORE_DIR, BACKEND_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_once(module: str, sub_agents: bool = False):
+    """Imports `module` in a new interpreter; returns its cumulative and per-module self times in ms."""
+    code = PRELUDE + f"import {module}"
+    if sub_agents:
+        code += "; " + LOAD_SUB_AGENTS
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=child_environment(), capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    # A module is listed after everything it imported, so the target's subtree is every line
+    # since the previous top-level import, up to the target's own line.
+    cumulative, subtree, self_times, sub_agents_ms = None, {}, {}, None
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and cumulative is None:
+            self_us, cumulative_us, indent, name = match.groups()
+            subtree[name] = int(self_us) / 1000
+            if not indent:
+                if name == module:
+                    cumulative, self_times = int(cumulative_us) / 1000, subtree
+                subtree = {}
+        elif line.startswith("sub-agents loaded in"):
+            sub_agents_ms = float(line.split()[3])
+    return cumulative, self_times, sub_agents_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("--module", action="append", help="module to import (default: agrimitra and web)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="most expensive modules to list")
+    parser.add_argument("--sub-agents", action="store_true", help="also time loading the lazily loaded sub-agents")
+    parser.add_argument("--max-ms", type=float, help="fail when a module's median import time exceeds this")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.module or ["agrimitra", "web"]:
+        runs = [import_once(module, args.sub_agents) for _ in range(args.runs)]
+        median = statistics.median(cumulative for cumulative, _, _ in runs)
+        print(f"\nimport {module}: median {median:.0f} ms over {args.runs} runs "
+              f"({', '.join(f'{cumulative:.0f}' for cumulative, _, _ in runs)})")
+        self_times = runs[-1][1]
+        for name, ms in sorted(self_times.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {ms:>8.1f} ms  {name}")
+        heavy = [name for name in HEAVY_MODULES if name in self_times]
+        print(f"  heavy modules imported: {', '.join(heavy) or 'none'}")
+        if args.sub_agents:
+            print(f"  then {statistics.median(ms for _, _, ms in runs):.0f} ms to load the sub-agents on first use")
+        if args.max_ms is not None and median > args.max_ms:
+            over_budget.append(f"{module} ({median:.0f} ms)")
+
+    if over_budget:
+        print(f"\nOver the {args.max_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_multimodal.py
+# Compares the two ways a photo or voice note can reach the root agent:
+#   two-step:    describe_image_with_gemini / transcribe_audio_with_gemini turns the
+#                media into text, then the agent runs on that text (two LLM round trips
+#                before the agent even starts routing);
+#   single-pass: the media is passed to the agent as a Part (MULTIMODAL_AGENT_INPUT).
+# Every sample is run through both paths in a fresh session and the end-to-end
+# latency to the final answer is reported.
+#
+# This calls the real models, so it needs Vertex AI credentials and the agent's
+# environment (see agrimitra/.env).
+#
+# Usage (from agri-mitra-backend, with the agrimitra package on PYTHONPATH):
+#   python benchmarks/bench_multimodal.py --media ./samples --repeat 3
+#   python benchmarks/bench_multimodal.py --media ./samples --question "What is wrong with my crop?"
+
+import argparse
+import asyncio
+import glob
+import mimetypes
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media import AttachmentResult
+
+import web
+
+
+def load_samples(directory: str) -> list:
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        mime_type, _ = mimetypes.guess_type(path)
+        if mime_type and mime_type.split("/")[0] in ("image", "audio"):
+            with open(path, "rb") as f:
+                samples.append((os.path.basename(path), f.read(), mime_type))
+    return samples
+
+
+async def run_agent(agent_input) -> str:
+    session = await web.session_service.create_session(app_name="agrimitra", user_id="bench_user")
+    try:
+        return await web.call_agent_async(web.get_runner(), "bench_user", session.id, agent_input)
+    finally:
+        await web.session_service.delete_session(app_name="agrimitra", user_id="bench_user", session_id=session.id)
+
+
+async def two_step(content: bytes, mime_type: str, question: str) -> tuple:
+    """Returns (total seconds, analysis seconds)."""
+    start = time.perf_counter()
+    if mime_type.startswith("audio/"):
+        text = await web.transcribe_audio_with_gemini(content, mime_type)
+    else:
+        text = await web.describe_image_with_gemini(content, mime_type)
+    analysis = time.perf_counter() - start
+    attachment = AttachmentResult(index=0, url="", content_type=mime_type, text=text)
+    await run_agent(web.merge_message_input(question, [attachment]))
+    return time.perf_counter() - start, analysis
+
+
+async def single_pass(content: bytes, mime_type: str, question: str) -> float:
+    start = time.perf_counter()
+    part = await web.media_part(content, mime_type)
+    attachment = AttachmentResult(index=0, url="", content_type=mime_type, part=part)
+    await run_agent(web.merge_message_input(question, [attachment]))
+    return time.perf_counter() - start
+
+
+async def run(args):
+    samples = load_samples(args.media)
+    if not samples:
+        sys.exit(f"No image or audio files found in {args.media}")
+
+    print(f"{'sample':<28}{'two-step s':>12}{'(analysis)':>12}{'single-pass s':>15}{'saved':>8}")
+    totals_two, totals_single = [], []
+    for name, content, mime_type in samples:
+        two, analysis, single = [], [], []
+        for _ in range(args.repeat):
+            total, analysis_seconds = await two_step(content, mime_type, args.question)
+            two.append(total)
+            analysis.append(analysis_seconds)
+            single.append(await single_pass(content, mime_type, args.question))
+        two_median, single_median = statistics.median(two), statistics.median(single)
+        totals_two.append(two_median)
+        totals_single.append(single_median)
+        print(f"{name[:27]:<28}{two_median:>12.2f}{statistics.median(analysis):>12.2f}"
+              f"{single_median:>15.2f}{two_median - single_median:>8.2f}")
+
+    print(f"median over samples: two-step {statistics.median(totals_two):.2f} s, "
+          f"single-pass {statistics.median(totals_single):.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-step vs single-pass multimodal agent input")
+    parser.add_argument("--media", required=True, help="directory of sample images and voice notes")
+    parser.add_argument("--question", default="", help="text sent along with the media (default: none)")
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# bench_runner.py
+# Micro-benchmark for the per-request cost of obtaining a Runner.
+# Compares building a fresh Runner on every request (the old behaviour of /sms
+# and /query) with looking up the shared instance from the runner registry.
+#
+# Usage (from agri-mitra-backend, with the agrimitra package on PYTHONPATH):
+#   python benchmarks/bench_runner.py --iterations 2000
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "loadtest")]
+
+from google.adk.runners import Runner
+
+import web
+from latency import print_summary
+
+
+def time_calls(fn, iterations: int) -> list:
+    """Returns the duration of each call in microseconds."""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1e6)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runner acquisition micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    def per_request_runner():
+        Runner(agent=web.root_agent, app_name="agrimitra", session_service=web.session_service)
+
+    # Warm both paths once so that import and first-use costs are excluded.
+    per_request_runner()
+    web.get_runner()
+
+    print(f"Runner acquisition cost over {args.iterations} iterations")
+    print_summary("before: Runner per request", time_calls(per_request_runner, args.iterations))
+    print_summary("after: shared registry", time_calls(web.get_runner, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench_session_compaction.py
+# Prompt size of a long WhatsApp-style conversation with and without session
+# compaction (agrimitra/compaction.py), on the fake LLM backend (fake_llm.py).
+# One session answers --turns questions in a row; the sub-agents return large
+# results (a shopping list, a RAG passage), as BigQuery and scrapingdog results do.
+# For every turn the prompt tokens the root agent sent (summed over its model
+# calls, and for its last call), the events in the session and the turn's wall
+# time are reported. The fake model counts 4 characters per token and leaves out
+# the system instruction, so compare the two columns rather than the absolute values.
+#
+# Usage (from agri-mitra-backend, with agrimitra-core-main on PYTHONPATH):
+#   python benchmarks/bench_session_compaction.py --turns 30 --threshold 3000 --keep-turns 3
+
+import argparse
+import asyncio
+import json
+import time
+
+import fake_llm
+
+QUESTIONS = [
+    "Kya kal baarish hogi Indore mein?",
+    "Suggest a drip irrigation kit under 5000 rupees",
+    "Which fertilizer subsidy can I get for my 3 acre soybean farm?",
+    "What is the weather forecast for Dewas this week?",
+    "Suggest a battery sprayer for soybean",
+    "PM-Kisan yojana ki agli kist kab aayegi?",
+]
+
+
+def large_results_script() -> fake_llm.FakeScript:
+    """default_script() with sub-agent results the size of real shopping and RAG answers."""
+    products = [
+        {"title": f"Agri product {index} for {{input}}", "price": f"₹{999 + 250 * index}", "rating": "4.1 out of 5 stars",
+         "url": f"https://www.amazon.in/dp/B0{index:08d}", "reviews": 100 + index}
+        for index in range(20)
+    ]
+    passage = "Under the scheme, small and marginal farmers receive assistance for inputs. " * 40
+    script = fake_llm.default_script()
+    script.rules[:0] = [
+        fake_llm.Rule.from_dict({"agent": "shopping_agent", "text": json.dumps(products, ensure_ascii=False)}),
+        fake_llm.Rule.from_dict({"agent": "rag_agent", "text": passage}),
+    ]
+    return script
+
+
+async def run_conversation(root_agent, turns: int, compaction) -> list:
+    from google.adk.apps import App
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+
+    runner = Runner(
+        app=App(name="agrimitra", root_agent=root_agent, events_compaction_config=compaction),
+        session_service=InMemorySessionService(),
+    )
+    session = await runner.session_service.create_session(app_name="agrimitra", user_id="bench")
+    rows = []
+    for turn in range(turns):
+        content = types.Content(role="user", parts=[types.Part(text=QUESTIONS[turn % len(QUESTIONS)])])
+        prompt_tokens = last_prompt_tokens = 0
+        started = time.perf_counter()
+        async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=content):
+            if not event.partial and event.usage_metadata and event.usage_metadata.prompt_token_count:
+                prompt_tokens += event.usage_metadata.prompt_token_count
+                last_prompt_tokens = event.usage_metadata.prompt_token_count
+        elapsed = time.perf_counter() - started
+        session = await runner.session_service.get_session(app_name="agrimitra", user_id="bench", session_id=session.id)
+        rows.append((prompt_tokens, last_prompt_tokens, len(session.events), elapsed * 1000))
+    return rows
+
+
+async def run(args):
+    fake_llm.install_fake_google_auth()
+    from agrimitra.agent import root_agent
+    from agrimitra.compaction import compaction_config
+
+    fake_llm.install(root_agent, large_results_script())
+    compaction = compaction_config(args.threshold, args.keep_turns, model=args.compaction_model)
+    without = await run_conversation(root_agent, args.turns, None)
+    with_compaction = await run_conversation(root_agent, args.turns, compaction)
+
+    print(f"{args.turns} turns, compaction at {args.threshold} prompt tokens keeping {args.keep_turns} turns "
+          f"({'extractive summary' if not args.compaction_model else args.compaction_model})\n")
+    print(f"{'':>5}{'--- without compaction ---':>40}{'--- with compaction ---':>42}")
+    header = f"{'tokens':>9}{'last call':>11}{'events':>8}{'ms':>8}"
+    print(f"{'turn':>5}  {header}    {header}")
+    for turn, (off, on) in enumerate(zip(without, with_compaction), start=1):
+        print(f"{turn:>5}  {off[0]:>9}{off[1]:>11}{off[2]:>8}{off[3]:>8.1f}    {on[0]:>9}{on[1]:>11}{on[2]:>8}{on[3]:>8.1f}")
+    total_off = sum(row[0] for row in without)
+    total_on = sum(row[0] for row in with_compaction)
+    print(f"\nTotal prompt tokens: {total_off} without, {total_on} with compaction "
+          f"({100 * (1 - total_on / total_off):.0f}% fewer)")
+    print(f"Summarizer: {compaction.summarizer.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens per turn with and without session compaction")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--threshold", type=int, default=3000, help="compaction token threshold")
+    parser.add_argument("--keep-turns", type=int, default=3)
+    parser.add_argument("--compaction-model", default="", help="Gemini model for summaries (default: extractive)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# bench_session_pool.py
+# Per-request session overhead of stateless /query calls: creating and deleting
+# a session around every request (the old handler) versus checking one out of
+# EphemeralSessionPool and returning it. Only the time spent on the request path
+# is measured; the pool's background refills happen while the simulated agent
+# run (--work-ms) is in flight, as they would in production.
+#
+# Backends: the in-memory service (sessions are reset in place), SQLite through
+# DatabaseSessionService, and the in-memory service behind a simulated network
+# round trip of --rtt-ms per call, standing in for a remote session backend.
+# Before timing, every backend is checked for leaks: a session filled with
+# events and state, returned and checked out again must come back empty.
+#
+# Usage (from agri-mitra-backend):
+#   python benchmarks/bench_session_pool.py --requests 500 --rtt-ms 20
+
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "loadtest")]
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.genai import types
+
+from latency import print_summary
+from session_pool import EphemeralSessionPool
+
+APP_NAME = "agrimitra"
+USER_ID = "api_user"
+
+
+class RemoteSessionService(InMemorySessionService):
+    """The in-memory service with a fixed round-trip delay on every call."""
+
+    def __init__(self, rtt_seconds: float):
+        super().__init__()
+        self.rtt_seconds = rtt_seconds
+
+    async def create_session(self, **kwargs):
+        await asyncio.sleep(self.rtt_seconds)
+        return await super().create_session(**kwargs)
+
+    async def get_session(self, **kwargs):
+        await asyncio.sleep(self.rtt_seconds)
+        return await super().get_session(**kwargs)
+
+    async def delete_session(self, **kwargs):
+        await asyncio.sleep(self.rtt_seconds)
+        return await super().delete_session(**kwargs)
+
+    async def append_event(self, session, event):
+        await asyncio.sleep(self.rtt_seconds)
+        return await super().append_event(session, event)
+
+
+async def fill_session(session_service, session_id: str):
+    """Writes what a real run leaves behind: an event, session state and user-scoped state."""
+    session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+    await session_service.append_event(session, Event(
+        author="user",
+        invocation_id="bench",
+        content=types.Content(role="user", parts=[types.Part(text="my farm is in Indore")]),
+        actions=EventActions(state_delta={"location": "Indore", "user:crop": "soybean"}),
+    ))
+
+
+async def check_no_leaks(session_service, pool: EphemeralSessionPool):
+    """Fills every pooled session, returns it and checks that the next caller sees nothing of it."""
+    used = []
+    for _ in range(pool.size):
+        session_id = await pool.checkout()
+        await fill_session(session_service, session_id)
+        used.append(session_id)
+    for session_id in used:
+        pool.checkin(session_id)
+    await asyncio.sleep(0)
+    for _ in range(pool.size):
+        async with pool.session() as session_id:
+            session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+            # Remote backends keep "user:" state per user, not per session; only an in-place reset clears it.
+            checked = ("location", "user:crop") if pool.reset_in_place else ("location",)
+            leaked = [key for key in session.state if key in checked]
+            assert not session.events and not leaked, f"session {session_id} leaked {len(session.events)} events, state {leaked}"
+
+
+async def per_request(session_service, requests: int, work: float) -> list:
+    durations = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        session = await session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        overhead = time.perf_counter() - start
+        await asyncio.sleep(work)
+        start = time.perf_counter()
+        await session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        durations.append((overhead + time.perf_counter() - start) * 1e6)
+    return durations
+
+
+async def pooled(pool: EphemeralSessionPool, requests: int, work: float) -> list:
+    durations = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        session_id = await pool.checkout()
+        overhead = time.perf_counter() - start
+        await asyncio.sleep(work)
+        start = time.perf_counter()
+        pool.checkin(session_id)
+        durations.append((overhead + time.perf_counter() - start) * 1e6)
+    return durations
+
+
+async def bench_backend(name: str, make_service, args, reset_in_place=None):
+    work = args.work_ms / 1000
+    print(f"\n{name}")
+    print_summary("before: create + delete", await per_request(make_service(), args.requests, work))
+
+    session_service = make_service()
+    pool = EphemeralSessionPool(
+        session_service, app_name=APP_NAME, user_id=USER_ID, size=args.pool_size, reset_in_place=reset_in_place
+    )
+    await pool.prefill()
+    await check_no_leaks(session_service, pool)
+    print_summary("after: pool checkout + checkin", await pooled(pool, args.requests, work))
+    print(f"{'':<34} {pool.stats()}")
+    await asyncio.sleep(0.1)
+    await pool.close()
+
+
+async def run(args):
+    print(f"Session overhead per request over {args.requests} requests ({args.work_ms} ms simulated agent run)")
+    await bench_backend("in-memory", InMemorySessionService, args)
+    with tempfile.TemporaryDirectory() as directory:
+        db_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'sessions.db')}"
+        await bench_backend("sqlite (DatabaseSessionService)", lambda: DatabaseSessionService(db_url=db_url), args)
+    # A remote backend's storage is out of reach, so its sessions are recycled rather than reset.
+    remote = functools.partial(RemoteSessionService, args.rtt_ms / 1000)
+    await bench_backend(f"remote ({args.rtt_ms} ms round trip)", remote, args, reset_in_place=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session pool per-request overhead benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--work-ms", type=float, default=5.0, help="simulated agent run per request")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="round trip of the simulated remote backend")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# coalescer.py
+# Per-sender serialization and burst coalescing for the /sms webhook.
+# Farmers often send several WhatsApp messages in a row (text, then a photo, then
+# a voice note). Instead of starting one concurrent agent run per message against
+# the same session, messages from a sender are collected for a short debounce
+# window and merged into a single agent turn; messages that arrive while a turn
+# is running are merged into the next one.
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _SenderState:
+    """Pending messages and the run lock of a single sender."""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = []  # (item, future) pairs waiting for the next turn
+        self.flusher: Optional[asyncio.Task] = None
+        self.first_arrival = 0.0
+        self.last_arrival = 0.0
+
+
+class SenderCoalescer:
+    """
+    Runs at most one turn per sender at a time and merges bursts into single turns.
+
+    `process(sender, merged_item)` runs one agent turn. `merge(items)` combines the
+    items collected for a turn (by default text items are joined with newlines).
+    """
+
+    def __init__(
+        self,
+        process: Callable[[str, Any], Awaitable[Any]],
+        merge: Optional[Callable[[list], Any]] = None,
+        debounce_seconds: float = 1.5,
+        max_wait_seconds: float = 6.0,
+    ):
+        self.process = process
+        self.merge = merge or (lambda items: "\n".join(items))
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._senders = {}
+        self.submitted = 0
+        self.turns = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    async def submit(self, sender: str, item: Any) -> Optional[Any]:
+        """
+        Queues a message for the sender's next turn and waits for that turn to finish.
+
+        The most recent message of a merged turn receives the turn's result; the
+        messages merged into it receive None.
+        """
+        state = self._senders.get(sender)
+        if state is None:
+            state = self._senders[sender] = _SenderState()
+        now = time.monotonic()
+        if not state.pending:
+            state.first_arrival = now
+        state.last_arrival = now
+        future = asyncio.get_running_loop().create_future()
+        state.pending.append((item, future))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, len(state.pending))
+        if state.flusher is None:
+            state.flusher = asyncio.create_task(self._flush(sender, state))
+        return await future
+
+    async def _flush(self, sender: str, state: _SenderState):
+        async with state.lock:
+            # Wait until the sender has been quiet for the debounce window, but never
+            # longer than max_wait_seconds after the first pending message.
+            while True:
+                now = time.monotonic()
+                quiet_until = state.last_arrival + self.debounce_seconds
+                deadline = state.first_arrival + self.max_wait_seconds
+                wake_at = min(quiet_until, deadline)
+                if now >= wake_at:
+                    break
+                await asyncio.sleep(wake_at - now)
+
+            batch, state.pending = state.pending, []
+            # Messages arriving from now on start a new flusher, which waits for this turn.
+            state.flusher = None
+            self.turns += 1
+            self.coalesced += len(batch) - 1
+            if len(batch) > 1:
+                logger.info("Coalesced %d messages from %s into one turn.", len(batch), sender)
+
+            # Futures may already be cancelled if the webhook request went away.
+            futures = [future for _, future in batch]
+            try:
+                result = await self.process(sender, self.merge([item for item, _ in batch]))
+            except Exception as e:
+                if not futures[-1].done():
+                    futures[-1].set_exception(e)
+            else:
+                if not futures[-1].done():
+                    futures[-1].set_result(result)
+            for future in futures[:-1]:
+                if not future.done():
+                    future.set_result(None)
+
+        if not state.pending and state.flusher is None and self._senders.get(sender) is state:
+            del self._senders[sender]
+
+    def stats(self) -> dict:
+        """Returns queue depth and coalescing counters."""
+        return {
+            "senders": len(self._senders),
+            "senders_in_flight": sum(1 for state in self._senders.values() if state.lock.locked()),
+            "queue_depth": sum(len(state.pending) for state in self._senders.values()),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "turns": self.turns,
+            "coalesced": self.coalesced,
+            "debounce_seconds": self.debounce_seconds,
+        }
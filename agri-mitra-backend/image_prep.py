@@ -0,0 +1,99 @@
+# image_prep.py
+# Normalization of incoming photos before they are sent to Gemini vision.
+# Phone photos arrive as 3-5 MB JPEGs with EXIF metadata; the agronomic
+# description does not get better above ~1024 px, but upload time and token
+# cost do. Images are decoded, rotated according to their EXIF orientation,
+# stripped of metadata, downscaled to a maximum dimension and re-encoded as
+# JPEG. The CPU-bound work runs in a dedicated thread pool so the event loop
+# and the default executor stay free.
+
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_image(content: bytes, max_dimension: int = 1024, quality: int = 80) -> bytes:
+    """
+    Returns the image as an EXIF-free JPEG no larger than `max_dimension` on
+    either side. Raises if the bytes cannot be decoded as an image.
+    """
+    with Image.open(io.BytesIO(content)) as image:
+        # Let the JPEG decoder skip detail that the resize would throw away anyway.
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+class ImagePreprocessor:
+    """Runs `normalize_image` in a thread pool and keeps byte/time counters."""
+
+    def __init__(self, max_dimension: int = 1024, quality: int = 80, workers: int = 2):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-prep")
+        self.images = 0
+        self.failed = 0
+        self.enlarged = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_total = 0.0
+
+    async def prepare(self, content: bytes, mime_type: str) -> tuple:
+        """
+        Returns (bytes, mime type) to send to the model. The re-encoded image is sent
+        even when it is larger than the original (e.g. a small, already compressed
+        photo), since the original still carries its EXIF data (GPS position, device);
+        the original is sent only if it cannot be decoded.
+        """
+        started = time.monotonic()
+        try:
+            prepared = await asyncio.get_running_loop().run_in_executor(
+                self._executor, normalize_image, content, self.max_dimension, self.quality
+            )
+        except Exception as e:
+            logger.warning("Image preprocessing failed, sending the original: %s", e)
+            self.failed += 1
+            prepared = None
+        self.images += 1
+        self.seconds_total += time.monotonic() - started
+        self.bytes_in += len(content)
+        if prepared is None:
+            self.bytes_out += len(content)
+            return content, mime_type
+        if len(prepared) > len(content):
+            self.enlarged += 1
+        self.bytes_out += len(prepared)
+        return prepared, "image/jpeg"
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        """Returns bytes before/after preprocessing and the time spent."""
+        return {
+            "max_dimension": self.max_dimension,
+            "quality": self.quality,
+            "images": self.images,
+            "failed": self.failed,
+            "enlarged": self.enlarged,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "reduction": round(1 - self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+            "seconds_total": round(self.seconds_total, 3),
+        }
@@ -0,0 +1,98 @@
+# fake_server.py
+# Runs web.py under uvicorn with all Google services replaced by local fakes
+# (see fakes.py), for load testing /sms with loadgen.py. Nothing leaves the
+# machine except media downloads, which loadgen.py serves itself.
+#
+# The server also reports its own event-loop lag at GET /loadtest/loop-lag
+# (?reset=true clears the samples), which loadgen.py collects after a run.
+#
+# Usage (from agri-mitra-backend, with the agrimitra package on PYTHONPATH):
+#   python loadtest/fake_server.py --port 8080 --llm-latency 0.8 --media-latency 1.5
+#   python loadtest/fake_server.py --llm-script script.json   # see fake_llm.py for the format
+#   python loadtest/fake_server.py --cassette cassettes/sms.json --latency-scale 0.5   # see cassette.py
+# Any web.py setting can be passed through the environment as usual, e.g.
+#   SMS_DEBOUNCE_SECONDS=0 AGENT_MAX_IN_FLIGHT=64 python loadtest/fake_server.py
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+
+import fake_llm
+from fake_llm import Latency
+from fakes import install_fakes
+from latency import LoopLagMonitor
+
+# Settings the agent tree and web.py read at import time; real values are kept if set.
+OFFLINE_ENVIRONMENT = {
+    "GOOGLE_CLOUD_PROJECT": "loadtest",
+    "GOOGLE_CLOUD_LOCATION": "us-central1",
+    "GOOGLE_GENAI_USE_VERTEXAI": "1",
+    "BQ_DATA_PROJECT_ID": "loadtest",
+    "BQ_COMPUTE_PROJECT_ID": "loadtest",
+    "BQ_DATASET_ID": "loadtest",
+    "TTS_CACHE_DIR": "",
+    "TRACING_EXPORTER": "none",
+    "SESSION_COMPACTION_MODEL": "",  # extractive summaries, no Gemini call
+    "WARMUP_SKIP": "bigquery_schema,rag_corpora",  # BigQuery and RAG are not faked
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="web.py with local fakes for every Google service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="mean seconds per model call")
+    parser.add_argument("--llm-script", help="fake_llm JSON script (default: keyword routing to sub-agents)")
+    parser.add_argument("--llm-session", help="replay the model responses recorded in an ADK session dump")
+    parser.add_argument("--cassette", help="replay Gemini, BigQuery, RAG and API calls from a recorded cassette")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier of the cassette's recorded latencies")
+    parser.add_argument("--media-latency", type=float, default=1.5, help="mean seconds per transcription / image description")
+    parser.add_argument("--tts-latency", type=float, default=0.4, help="mean seconds per speech synthesis")
+    parser.add_argument("--storage-latency", type=float, default=0.05, help="mean seconds per GCS call")
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal sigma of all fake latencies")
+    args = parser.parse_args()
+
+    for key, value in OFFLINE_ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+    if args.cassette:
+        os.environ.update(CASSETTE_PATH=args.cassette, CASSETTE_MODE="replay", CASSETTE_LATENCY_SCALE=str(args.latency_scale))
+    fake_llm.install_fake_google_auth(os.environ["GOOGLE_CLOUD_PROJECT"])
+
+    import web
+
+    llm_latency = {"distribution": "lognormal", "mean": args.llm_latency, "sigma": args.sigma}
+    if args.cassette:
+        llm_script = None
+    elif args.llm_script:
+        llm_script = fake_llm.FakeScript.load(args.llm_script)
+    elif args.llm_session:
+        llm_script = fake_llm.FakeScript.from_session(args.llm_session, latency=llm_latency)
+    else:
+        llm_script = fake_llm.default_script(latency=llm_latency)
+    install_fakes(
+        web,
+        llm_script=llm_script,
+        media_latency=Latency("lognormal", mean=args.media_latency, sigma=args.sigma),
+        tts_latency=Latency("lognormal", mean=args.tts_latency, sigma=args.sigma),
+        storage_latency=Latency("lognormal", mean=args.storage_latency, sigma=args.sigma),
+    )
+
+    loop_lag = LoopLagMonitor()
+
+    @web.app.on_event("startup")
+    async def start_loop_lag_monitor():
+        loop_lag.start()
+
+    @web.app.get("/loadtest/loop-lag")
+    def get_loop_lag(reset: bool = False):
+        return loop_lag.snapshot(reset=reset)
+
+    uvicorn.run(web.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# fakes.py
+# Local stand-ins for the Google services web.py talks to, so the webhook can be
+# load tested on a laptop with no network and no credentials:
+#   - Gemini: the agent tree answers from a fake_llm script (keyword routing to
+#     sub-agents by default), and the Vertex GenerativeModel used for
+#     transcription / image description is replaced;
+#   - Text-to-Speech and the GCS bucket of the voice reply cache.
+# With a replay cassette (cassette.py) the recorded Gemini answers are used
+# instead, and only Text-to-Speech and GCS are faked.
+# Google auth is faked with fake_llm.install_fake_google_auth() before web.py is
+# imported. Every fake sleeps for a latency drawn from a fake_llm.Latency
+# distribution (log-normal in fake_server.py), which is what makes the load test
+# realistic about concurrency.
+
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import fake_llm
+from fake_llm import Latency
+
+_rng = random.Random()
+
+
+async def wait(latency: Latency):
+    await asyncio.sleep(latency.sample(_rng))
+
+
+def block(latency: Latency):
+    """Sleeps for a sampled latency; used by fakes that are called from worker threads."""
+    time.sleep(latency.sample(_rng))
+
+
+def fake_generative_model(latency: Latency):
+    """Returns a replacement for vertexai's GenerativeModel class."""
+
+    class FakeGenerativeModel:
+        def __init__(self, model_name: str, *args, **kwargs):
+            self.model_name = model_name
+
+        async def generate_content_async(self, contents, *args, **kwargs):
+            await wait(latency)
+            prompt = contents[-1] if isinstance(contents, list) else contents
+            if "Transcribe" in str(prompt):
+                text = "Meri gehun ki fasal mein peele patte aa rahe hain, kya karun?"
+            else:
+                text = "A wheat leaf with yellowing along the margins, possibly nitrogen deficiency or rust."
+            return SimpleNamespace(text=text)
+
+    return FakeGenerativeModel
+
+
+class FakeTTSClient:
+    """Returns a few bytes of 'audio' after the synthesis latency (called from a worker thread)."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def synthesize_speech(self, input, voice, audio_config):
+        block(self.latency)
+        return SimpleNamespace(audio_content=b"OggS" + input.text.encode("utf-8")[:256])
+
+
+class FakeBlob:
+    def __init__(self, bucket, name: str):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.example.invalid/{self.bucket.name}/{self.name}"
+
+    def exists(self) -> bool:
+        block(self.bucket.latency)
+        return self.name in self.bucket.objects
+
+    def upload_from_string(self, data, content_type=None):
+        block(self.bucket.latency)
+        self.bucket.objects[self.name] = data
+
+
+class FakeBucket:
+    """In-memory GCS bucket with per-call latency."""
+
+    def __init__(self, name: str, latency: Latency):
+        self.name = name
+        self.latency = latency
+        self.objects = {}
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+def install_fakes(
+    web,
+    llm_script: Optional[fake_llm.FakeScript],
+    media_latency: Latency,
+    tts_latency: Latency,
+    storage_latency: Latency,
+):
+    """Swaps the Google services used by an imported web module for the fakes above.
+
+    Without an llm_script the agents and media models are left to web.cassette.
+    """
+    if llm_script is not None:
+        fake_llm.install(web.root_agent, llm_script)
+        web.GenerativeModel = fake_generative_model(media_latency)
+    web.tts_client = FakeTTSClient(tts_latency)
+    web.tts_cache.bucket = FakeBucket(web.GCS_BUCKET_NAME, storage_latency)
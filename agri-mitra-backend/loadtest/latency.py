@@ -0,0 +1,75 @@
+# latency.py
+# Latency helpers shared by the load-test harness and the benchmarks: percentile
+# summaries and an event-loop lag monitor. The monitor sleeps for a fixed interval
+# in a loop and records how much later than requested it woke up; anything that
+# blocks the event loop (synchronous I/O, CPU-heavy work, logging) shows up as lag.
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Optional
+
+
+def percentile(sorted_values: list, q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: list) -> dict:
+    """Returns count, mean, p50, p95, p99 and max of a list of seconds."""
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+
+def print_summary(label: str, durations: list, unit: str = "us"):
+    """Prints the mean, p50 and p99 of `durations` (any unit, named by `unit`) on one line."""
+    summary = summarize(durations)
+    print(f"{label:<34} mean {summary['mean']:>9.1f} {unit}   "
+          f"p50 {summary['p50']:>9.1f} {unit}   p99 {summary['p99']:>9.1f} {unit}")
+
+
+class LoopLagMonitor:
+    """Samples the lag of the running event loop every `interval_seconds`."""
+
+    def __init__(self, interval_seconds: float = 0.05, max_samples: int = 100000):
+        self.interval_seconds = interval_seconds
+        self.samples = deque(maxlen=max_samples)
+        self._task = None
+
+    def start(self):
+        """Starts sampling. Must be called from within the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval_seconds)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval_seconds))
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Returns the lag summary (seconds) of the samples taken so far."""
+        summary = summarize(list(self.samples))
+        summary["interval_seconds"] = self.interval_seconds
+        if reset:
+            self.samples.clear()
+        return summary
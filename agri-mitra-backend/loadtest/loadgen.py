@@ -0,0 +1,306 @@
+# loadgen.py
+# Load generator for the /sms webhook. Sends Twilio-style form posts with a
+# configurable mix of text, photo and voice-note messages (Hinglish and English
+# farmer questions) from a pool of simulated senders, and reports throughput,
+# p50/p95/p99 latency per message kind, error/shed rates and event-loop lag of
+# both the server (when it is fake_server.py) and the generator itself.
+#
+# The photos and voice notes are served by a media stub started in this
+# process, so the server downloads them over HTTP like real Twilio media.
+#
+# Usage (against `python loadtest/fake_server.py --port 8080`):
+#   python loadtest/loadgen.py --concurrency 50 --duration 60
+#   python loadtest/loadgen.py --rate 20 --duration 60 --mix text=6,image=3,audio=1
+#   python loadtest/loadgen.py --concurrency 20 --json results.json
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from PIL import Image
+
+from latency import LoopLagMonitor, summarize
+
+QUERIES = [
+    "What is the weather forecast for Nashik this week?",
+    "Mere gehun ke patte peele ho rahe hain, kya karun?",
+    "Aaj Pune mandi mein pyaaz ka bhav kya hai?",
+    "Which fertilizer is best for paddy in the tillering stage?",
+    "Tamatar mein blight lag gaya hai, koi upay batao",
+    "How much water does sugarcane need in summer?",
+    "PM-Kisan ki agli kist kab aayegi?",
+    "Suggest a drip irrigation kit under 5000 rupees",
+    "Kya kal baarish hogi Indore mein?",
+    "What is the MSP for cotton this season?",
+    "Soybean ki buvai ka sahi samay kya hai?",
+    "How do I control pink bollworm in cotton?",
+    "Mitti ki jaanch kahan karwayein?",
+    "Compare onion prices in Lasalgaon and Nashik",
+    "Organic khad kaise banayein ghar par?",
+    "Is it a good time to sell my chana crop?",
+]
+
+# Twilio's WhatsApp sandbox number; the value only matters for async replies.
+CHANNEL_NUMBER = "whatsapp:+14155238886"
+
+
+def make_images(count: int, size: tuple = (1600, 1200)) -> list:
+    """Distinct JPEGs (coloured noise), so the media caches do not turn every photo into a hit."""
+    images = []
+    for index in range(count):
+        rng = random.Random(index)
+        image = Image.effect_noise(size, 64).convert("RGB")
+        tint = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        buffer = io.BytesIO()
+        Image.blend(image, tint, 0.5).save(buffer, "JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def make_voice_notes(count: int, size: int = 24000) -> list:
+    """Opaque OGG-like payloads; the fake transcriber never decodes them."""
+    return [b"OggS" + random.Random(1000 + index).randbytes(size) for index in range(count)]
+
+
+class MediaStub:
+    """Serves /image/<n>.jpg and /audio/<n>.ogg from memory on a background thread."""
+
+    def __init__(self, host: str, port: int, variants: int):
+        self.files = {}
+        for index, content in enumerate(make_images(variants)):
+            self.files[f"/image/{index}.jpg"] = (content, "image/jpeg")
+        for index, content in enumerate(make_voice_notes(variants)):
+            self.files[f"/audio/{index}.ogg"] = (content, "audio/ogg")
+        self.variants = variants
+        files = self.files
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                content, content_type = files.get(self.path.split("?")[0], (None, None))
+                if content is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def url(self, kind: str, rng: random.Random) -> str:
+        extension = "jpg" if kind == "image" else "ogg"
+        return f"{self.base_url}/{kind}/{rng.randrange(self.variants)}.{extension}"
+
+
+def parse_mix(spec: str) -> dict:
+    """Parses "text=7,image=2,audio=1" into normalised weights."""
+    weights = {}
+    for item in spec.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in ("text", "image", "audio"):
+            raise SystemExit(f"Unknown message kind in --mix: {kind!r}")
+        weights[kind.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    return {kind: weight / total for kind, weight in weights.items()}
+
+
+def build_form(kind: str, sender: int, rng: random.Random, media: MediaStub) -> dict:
+    """A Twilio inbound-message form for one simulated farmer message."""
+    form = {
+        "MessageSid": "SM" + uuid.uuid4().hex,
+        "AccountSid": "AC" + "0" * 32,
+        "From": f"whatsapp:+9199{sender:08d}",
+        "To": CHANNEL_NUMBER,
+        "Body": "",
+        "NumMedia": "0",
+    }
+    if kind == "text" or rng.random() < 0.5:
+        form["Body"] = rng.choice(QUERIES)
+    if kind in ("image", "audio"):
+        form["NumMedia"] = "1"
+        form["MediaUrl0"] = media.url(kind, rng)
+        form["MediaContentType0"] = "image/jpeg" if kind == "image" else "audio/ogg"
+    return form
+
+
+class Results:
+    def __init__(self):
+        self.records = []  # (kind, outcome, seconds)
+
+    def add(self, kind: str, outcome: str, seconds: float):
+        self.records.append((kind, outcome, seconds))
+
+
+async def send_one(client: httpx.AsyncClient, url: str, kind: str, form: dict, results: Results, busy_marker: str):
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, data=form)
+        if response.status_code >= 400:
+            outcome = f"http_{response.status_code}"
+        elif busy_marker in response.text:
+            outcome = "shed"
+        elif "<Message" not in response.text:
+            outcome = "merged"  # answered as part of another message of the same sender
+        else:
+            outcome = "ok"
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    results.add(kind, outcome, time.perf_counter() - started)
+
+
+async def run_load(args, media: MediaStub) -> tuple:
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    rng = random.Random(args.seed)
+    results = Results()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        def next_request():
+            kind = rng.choices(kinds, weights)[0]
+            return kind, build_form(kind, rng.randrange(args.senders), rng, media)
+
+        if args.rate:
+            # Open loop: requests start on schedule whether or not earlier ones finished.
+            tasks = set()
+            interval = 1.0 / args.rate
+            next_start = time.perf_counter()
+            while next_start < deadline:
+                await asyncio.sleep(max(0.0, next_start - time.perf_counter()))
+                kind, form = next_request()
+                task = asyncio.create_task(send_one(client, args.url, kind, form, results, args.busy_marker))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                next_start += rng.expovariate(1.0 / interval)
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: each virtual user sends its next message when the previous one is answered.
+            async def user():
+                while time.perf_counter() < deadline:
+                    kind, form = next_request()
+                    await send_one(client, args.url, kind, form, results, args.busy_marker)
+
+            await asyncio.gather(*(user() for _ in range(args.concurrency)))
+
+        server_lag = None
+        try:
+            response = await client.get(args.url.rsplit("/", 1)[0] + "/loadtest/loop-lag")
+            if response.status_code == 200:
+                server_lag = response.json()
+        except httpx.HTTPError:
+            pass
+    return results, server_lag
+
+
+def format_seconds(value) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def report(results: Results, elapsed: float, server_lag, client_lag: dict) -> dict:
+    summary = {"elapsed_seconds": elapsed, "requests": len(results.records), "kinds": {}}
+    print(f"{'kind':<8}{'requests':>9}{'ok':>7}{'errors':>8}{'shed':>6}{'merged':>8}"
+          f"{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max s':>9}")
+    for kind in ("text", "image", "audio", "all"):
+        records = [record for record in results.records if kind == "all" or record[0] == kind]
+        if not records:
+            continue
+        outcomes = {}
+        for _, outcome, _ in records:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        latency = summarize([seconds for _, outcome, seconds in records if outcome in ("ok", "shed", "merged")])
+        errors = len(records) - outcomes.get("ok", 0) - outcomes.get("shed", 0) - outcomes.get("merged", 0)
+        summary["kinds"][kind] = {"outcomes": outcomes, "latency_seconds": latency}
+        print(f"{kind:<8}{len(records):>9}{outcomes.get('ok', 0):>7}{errors:>8}{outcomes.get('shed', 0):>6}"
+              f"{outcomes.get('merged', 0):>8}{format_seconds(latency['p50']):>9}{format_seconds(latency['p95']):>9}"
+              f"{format_seconds(latency['p99']):>9}{format_seconds(latency['max']):>9}")
+
+    overall = summary["kinds"].get("all", {"outcomes": {}})["outcomes"]
+    completed = overall.get("ok", 0) + overall.get("merged", 0)
+    failed = len(results.records) - completed - overall.get("shed", 0)
+    summary["throughput_per_second"] = completed / elapsed if elapsed else None
+    summary["error_rate"] = failed / len(results.records) if results.records else None
+    summary["shed_rate"] = overall.get("shed", 0) / len(results.records) if results.records else None
+    summary["server_loop_lag_seconds"] = server_lag
+    summary["client_loop_lag_seconds"] = client_lag
+    print(f"\n{len(results.records)} requests in {elapsed:.1f}s: throughput {summary['throughput_per_second'] or 0:.2f} answered/s, "
+          f"error rate {(summary['error_rate'] or 0) * 100:.2f}%, shed rate {(summary['shed_rate'] or 0) * 100:.2f}%")
+    other = {outcome: count for outcome, count in overall.items() if outcome not in ("ok", "shed", "merged")}
+    if other:
+        print(f"errors: {other}")
+    for label, lag in (("server", server_lag), ("loadgen", client_lag)):
+        if lag:
+            print(f"{label} event-loop lag: p50 {format_seconds(lag['p50'])}s, p99 {format_seconds(lag['p99'])}s, "
+                  f"max {format_seconds(lag['max'])}s over {lag['count']} samples")
+        else:
+            print(f"{label} event-loop lag: not available")
+    return summary
+
+
+async def main_async(args):
+    media = MediaStub(args.media_host, args.media_port, args.media_variants)
+    media.start()
+    client_lag = LoopLagMonitor()
+    client_lag.start()
+    try:
+        # Start the server-side lag window with this run.
+        async with httpx.AsyncClient(timeout=10) as client:
+            try:
+                await client.get(args.url.rsplit("/", 1)[0] + "/loadtest/loop-lag", params={"reset": "true"})
+            except httpx.HTTPError as e:
+                raise SystemExit(f"Server not reachable at {args.url}: {e}")
+        mode = f"open loop at {args.rate}/s" if args.rate else f"closed loop with {args.concurrency} users"
+        print(f"Sending {args.mix} to {args.url} for {args.duration:.0f}s, {mode}, {args.senders} senders")
+        started = time.perf_counter()
+        results, server_lag = await run_load(args, media)
+        elapsed = time.perf_counter() - started
+    finally:
+        await client_lag.stop()
+        media.stop()
+    summary = report(results, elapsed, server_lag, client_lag.snapshot())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Twilio /sms load generator")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/sms")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to generate load for")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users (closed loop)")
+    parser.add_argument("--rate", type=float, help="messages per second (open loop, Poisson arrivals)")
+    parser.add_argument("--mix", default="text=7,image=2,audio=1", help="relative weights of message kinds")
+    parser.add_argument("--senders", type=int, default=1000, help="distinct farmer numbers")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--media-host", default="127.0.0.1")
+    parser.add_argument("--media-port", type=int, default=0, help="port of the media stub (default: any free port)")
+    parser.add_argument("--media-variants", type=int, default=16, help="distinct photos / voice notes served")
+    parser.add_argument("--busy-marker", default="receiving a lot of", help="text identifying a shed (busy) reply")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the summary to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
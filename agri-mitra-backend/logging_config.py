@@ -0,0 +1,184 @@
+# logging_config.py
+# Structured, non-blocking logging for the webhook and the agent tools.
+# Modules log through `logging.getLogger(__name__)`; setup_logging() routes every
+# record through a bounded in-memory queue to a background thread that writes
+# one JSON object per line (Cloud Logging picks up `severity` and `message`).
+# The request handler only pays for formatting the message: long payloads (SQL,
+# agent answers, query results) are truncated before they are queued, and when
+# the queue is full records are dropped and counted instead of blocking.
+#
+# Every record carries the request id bound for the current request (see the
+# request id middleware in web.py) and, when tracing is enabled, the trace id.
+# Levels are tuned per logger with LOG_LEVELS, e.g.
+#   LOG_LEVELS="web=DEBUG,agrimitra.sub_agents.data_science=WARNING"
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from opentelemetry import trace
+
+# The id of the request being handled, bound by the request id middleware.
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra` fields.
+STANDARD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id", "trace_id", "span_id"}
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def bind_request_id(request_id: Optional[str] = None) -> contextvars.Token:
+    """Binds a request id (a new one if not given) to the current context; undo with reset_request_id."""
+    return request_id_var.set(request_id or new_request_id())
+
+
+def reset_request_id(token: contextvars.Token):
+    request_id_var.reset(token)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def truncate(text: str, max_chars: int, keep_tail: bool = False) -> str:
+    """Shortens text to `max_chars`, keeping its start (or its end with `keep_tail`)."""
+    if max_chars and len(text) > max_chars:
+        if keep_tail:
+            return f"[{len(text) - max_chars} earlier chars]..." + text[-max_chars:]
+        return text[:max_chars] + f"...[{len(text) - max_chars} more chars]"
+    return text
+
+
+class BufferedQueueHandler(QueueHandler):
+    """
+    Queues records for the background writer. Runs in the calling thread, so it
+    captures the request/trace ids and renders the (truncated) message here;
+    JSON encoding and the actual write happen on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_message_chars: int):
+        super().__init__(log_queue)
+        self.max_message_chars = max_message_chars
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        span_context = trace.get_current_span().get_span_context()
+        record.trace_id = format(span_context.trace_id, "032x") if span_context.is_valid else None
+        record.span_id = format(span_context.span_id, "016x") if span_context.is_valid else None
+        record.msg = truncate(record.getMessage(), self.max_message_chars)
+        record.args = None
+        if record.exc_info:
+            # A traceback ends with the exception itself, so its innermost frames are kept.
+            record.exc_text = truncate(
+                logging.Formatter().formatException(record.exc_info), self.max_message_chars, keep_tail=True
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, severity, logger, message, ids, exception and `extra` fields."""
+
+    def __init__(self, max_field_chars: int = 2000):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("request_id", "trace_id", "span_id"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = truncate(value, self.max_field_chars) if isinstance(value, str) else value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+
+def parse_levels(spec: str) -> dict:
+    """Parses "logger=LEVEL,other=LEVEL" into {logger: level}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+# The handler installed by setup_logging, kept for logging_stats().
+_handler: Optional[BufferedQueueHandler] = None
+
+
+def setup_logging(
+    level: str = "INFO",
+    module_levels: Optional[dict] = None,
+    fmt: str = "json",
+    max_message_chars: int = 2000,
+    queue_size: int = 10000,
+) -> QueueListener:
+    """
+    Replaces the root logger's handlers with the buffered queue handler and starts
+    the writer thread (stopped, and the queue flushed, at interpreter exit).
+    """
+    global _handler
+    log_queue = queue.Queue(maxsize=queue_size)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter(max_message_chars))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=False)
+
+    _handler = BufferedQueueHandler(log_queue, max_message_chars)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def logging_stats() -> Optional[dict]:
+    """Returns the logging queue depth and the number of records dropped because it was full."""
+    if _handler is None:
+        return None
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
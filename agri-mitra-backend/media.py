@@ -0,0 +1,191 @@
+# media.py
+# Download and analysis of the media attached to incoming Twilio messages.
+# Media is fetched with a pooled async HTTP client (no blocking requests.get on
+# the event loop), streamed with a size cap that aborts oversized downloads
+# early, and every attachment of a message (NumMedia) is downloaded and analysed
+# concurrently. Per-attachment download/analysis timings are kept for /stats.
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from opentelemetry import trace
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+
+class MediaTooLargeError(Exception):
+    """Raised when an attachment is larger than the configured limit."""
+
+
+@dataclass
+class AttachmentResult:
+    """The outcome of downloading and analysing one attachment."""
+    index: int
+    url: str
+    content_type: str
+    size_bytes: int = 0
+    download_seconds: float = 0.0
+    analysis_seconds: float = 0.0
+    text: Optional[str] = None
+    part: Any = None  # set instead of `text` when the analyzer returns a media part
+    error: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        return self.content_type.split("/", 1)[0]
+
+
+def message_attachments(form_data: dict) -> list:
+    """Returns (index, url, content type) for every attachment of a Twilio message."""
+    try:
+        count = int(form_data.get("NumMedia") or 0)
+    except ValueError:
+        count = 0
+    if not count and form_data.get("MediaUrl0"):
+        count = 1
+    attachments = []
+    for index in range(count):
+        url = (form_data.get(f"MediaUrl{index}") or "").strip()
+        if url:
+            content_type = (form_data.get(f"MediaContentType{index}") or "").strip()
+            attachments.append((index, url, content_type))
+    return attachments
+
+
+class MediaIngestor:
+    """
+    Downloads and analyses message attachments.
+
+    `analyzers` maps a top-level media type ("audio", "image") to an async
+    callable `(content: bytes, mime_type: str)` that turns the media into text
+    for the agent, or into a part passed to the agent as is. Other types (video,
+    PDF, ...) go to the `fallback_kind` analyzer, as the webhook always did with
+    every non-audio attachment.
+    """
+
+    def __init__(
+        self,
+        analyzers: dict,
+        auth: Optional[tuple] = None,
+        max_bytes: int = 16 * 1024 * 1024,
+        timeout_seconds: float = 30.0,
+        max_connections: int = 20,
+        fallback_kind: Optional[str] = "image",
+    ):
+        self.analyzers = analyzers
+        self.fallback_kind = fallback_kind
+        self.max_bytes = max_bytes
+        # Twilio media URLs redirect to the storage host that serves the file.
+        self.client = httpx.AsyncClient(
+            auth=auth,
+            follow_redirects=True,
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.attachments = 0
+        self.failed = 0
+        self.too_large = 0
+        self.bytes_downloaded = 0
+        self.download_seconds_total = 0.0
+        self.download_seconds_max = 0.0
+        self.analysis_seconds_total = 0.0
+        self.analysis_seconds_max = 0.0
+
+    async def download(self, url: str) -> bytes:
+        """Streams a media file into memory, aborting as soon as it exceeds `max_bytes`."""
+        with tracer.start_as_current_span("media.download") as span:
+            content = await self._download(url)
+            span.set_attribute("media.size_bytes", len(content))
+        return content
+
+    async def _download(self, url: str) -> bytes:
+        async with self.client.stream("GET", url) as response:
+            response.raise_for_status()
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                raise MediaTooLargeError(f"{declared} bytes exceeds the {self.max_bytes} byte limit")
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > self.max_bytes:
+                    raise MediaTooLargeError(f"more than {self.max_bytes} bytes")
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def ingest(self, form_data: dict) -> list:
+        """Downloads and analyses all attachments of a message concurrently, in attachment order."""
+        return await asyncio.gather(
+            *(self._process(index, url, content_type) for index, url, content_type in message_attachments(form_data))
+        )
+
+    async def _process(self, index: int, url: str, content_type: str) -> AttachmentResult:
+        result = AttachmentResult(index=index, url=url, content_type=content_type)
+        self.attachments += 1
+        analyzer: Optional[Callable[[bytes, str], Awaitable[Any]]] = (
+            self.analyzers.get(result.kind) or self.analyzers.get(self.fallback_kind)
+        )
+        if analyzer is None:
+            result.error = f"unsupported media type {content_type or 'unknown'}"
+            self.failed += 1
+            return result
+
+        started = time.monotonic()
+        try:
+            content = await self.download(url)
+        except MediaTooLargeError as e:
+            result.error = f"attachment too large ({e})"
+            self.too_large += 1
+        except Exception as e:
+            result.error = f"download failed ({e})"
+        result.download_seconds = time.monotonic() - started
+        self.download_seconds_total += result.download_seconds
+        self.download_seconds_max = max(self.download_seconds_max, result.download_seconds)
+        if result.error:
+            logger.warning("Attachment %d (%s) from %s: %s", index, content_type, url, result.error)
+            self.failed += 1
+            return result
+        result.size_bytes = len(content)
+        self.bytes_downloaded += len(content)
+
+        started = time.monotonic()
+        try:
+            output = await analyzer(content, content_type)
+            if isinstance(output, str):
+                result.text = output
+            else:
+                result.part = output
+        except Exception as e:
+            result.error = f"analysis failed ({e})"
+            self.failed += 1
+        result.analysis_seconds = time.monotonic() - started
+        self.analysis_seconds_total += result.analysis_seconds
+        self.analysis_seconds_max = max(self.analysis_seconds_max, result.analysis_seconds)
+        logger.info(
+            "Attachment %d (%s, %d bytes): download %.2fs, analysis %.2fs%s",
+            index, content_type, result.size_bytes, result.download_seconds, result.analysis_seconds,
+            f", {result.error}" if result.error else "",
+        )
+        return result
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        """Returns attachment counts, bytes downloaded and download/analysis timings."""
+        return {
+            "attachments": self.attachments,
+            "failed": self.failed,
+            "too_large": self.too_large,
+            "bytes_downloaded": self.bytes_downloaded,
+            "max_bytes": self.max_bytes,
+            "download_seconds_total": round(self.download_seconds_total, 3),
+            "download_seconds_max": round(self.download_seconds_max, 3),
+            "analysis_seconds_total": round(self.analysis_seconds_total, 3),
+            "analysis_seconds_max": round(self.analysis_seconds_max, 3),
+        }
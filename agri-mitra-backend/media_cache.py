@@ -0,0 +1,154 @@
+# media_cache.py
+# Cache of the text derived from incoming media (audio transcripts, image descriptions).
+# The same crop photos and voice notes are forwarded across farmer WhatsApp groups,
+# and every copy would otherwise cost a Gemini call. Results are keyed on the
+# SHA-256 of the downloaded bytes; images also carry a perceptual difference hash
+# (dHash) so that copies re-encoded by WhatsApp still hit when their hash is
+# within a small Hamming distance. Entries expire after a TTL and the cache
+# evicts least recently used entries beyond `max_entries`.
+
+import asyncio
+import hashlib
+import io
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from PIL import Image
+
+from single_flight import SingleFlight
+
+
+def image_dhash(content: bytes, hash_size: int = 8) -> Optional[int]:
+    """Returns the 64-bit difference hash of an image, or None if it cannot be decoded."""
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.draft("L", (hash_size * 4, hash_size * 4))  # cheap JPEG downscale while decoding
+            pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class _Entry:
+    __slots__ = ("text", "expires_at", "phash", "latency_seconds")
+
+    def __init__(self, text: str, expires_at: float, phash: Optional[int], latency_seconds: float):
+        self.text = text
+        self.expires_at = expires_at
+        self.phash = phash
+        self.latency_seconds = latency_seconds
+
+
+class DerivationCache:
+    """
+    Caches derive(content, mime_type) -> text results per media kind.
+
+    Use `wrap(kind, derive)` to get a drop-in replacement for an analyzer.
+    Concurrent requests for identical bytes share one derivation.
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 7 * 24 * 3600, phash_max_distance: int = 4):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.phash_max_distance = phash_max_distance
+        self._entries = OrderedDict()  # (kind, sha256) -> _Entry
+        self._inflight = SingleFlight("media derivation")  # keyed on (kind, sha256)
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.saved_latency_seconds = 0.0
+
+    def wrap(self, kind: str, derive: Callable[[bytes, str], Awaitable[str]]) -> Callable[[bytes, str], Awaitable[str]]:
+        """Returns `derive` with its results cached under `kind`."""
+        async def cached(content: bytes, mime_type: str) -> str:
+            return await self.get_or_derive(kind, content, mime_type, derive)
+        return cached
+
+    async def get_or_derive(
+        self, kind: str, content: bytes, mime_type: str, derive: Callable[[bytes, str], Awaitable[str]]
+    ) -> str:
+        """Returns the cached text for the media, deriving and storing it on a miss."""
+        key = (kind, hashlib.sha256(content).hexdigest())
+        entry = self._get(key)
+        if entry is not None:
+            self.exact_hits += 1
+            return self._served(entry)
+
+        return await self._inflight.run(key, lambda: self._derive(key, content, mime_type, derive))
+
+    async def _derive(self, key, content: bytes, mime_type: str, derive: Callable[[bytes, str], Awaitable[str]]) -> str:
+        kind = key[0]
+        phash = await asyncio.to_thread(image_dhash, content) if kind == "image" else None
+        entry = self._find_similar(kind, phash)
+        if entry is not None:
+            self.perceptual_hits += 1
+            text = self._served(entry)
+        else:
+            self.misses += 1
+            started = time.monotonic()
+            text = await derive(content, mime_type)  # failures are not cached
+            entry = _Entry(text, 0.0, phash, time.monotonic() - started)
+        self._put(key, _Entry(text, time.monotonic() + self.ttl_seconds, phash, entry.latency_seconds))
+        return text
+
+    def _get(self, key) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expired += 1
+            return None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _find_similar(self, kind: str, phash: Optional[int]) -> Optional[_Entry]:
+        """Returns the closest live entry of `kind` whose perceptual hash is within the distance limit."""
+        if phash is None:
+            return None
+        now = time.monotonic()
+        best_key, best_distance = None, self.phash_max_distance + 1
+        for key, entry in self._entries.items():
+            if key[0] != kind or entry.phash is None or entry.expires_at <= now:
+                continue
+            distance = (entry.phash ^ phash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return self._get(best_key) if best_key is not None else None
+
+    def _served(self, entry: _Entry) -> str:
+        self.saved_latency_seconds += entry.latency_seconds
+        return entry.text
+
+    def _put(self, key, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        """Returns hit rates and the model latency saved by cache hits."""
+        hits = self.exact_hits + self.perceptual_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "perceptual_hits": self.perceptual_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "in_flight": len(self._inflight),
+            "deduplicated": self._inflight.deduplicated,
+            "saved_latency_seconds": round(self.saved_latency_seconds, 3),
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
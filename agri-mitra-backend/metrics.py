@@ -0,0 +1,143 @@
+# metrics.py
+# Prometheus latency histograms for the webhook and the JSON API.
+# Every stage of a request (form parsing, media download, transcription, the
+# agent run, TTS, ...) is observed in `agrimitra_stage_duration_seconds`, and the
+# sub-agent/tool calls and model turns of each agent run are derived from the ADK
+# event stream. Labels are channel (sms, api, api_batch, api_stream), stage or
+# tool/agent name, and outcome, which is enough for p50/p99 dashboards. The prompt
+# tokens the root agent sends per turn show how far session compaction keeps them down.
+#
+# With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty,
+# writable directory so that /metrics aggregates all workers.
+
+import os
+import time
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+TOKEN_BUCKETS = (500, 1000, 2000, 4000, 6000, 8000, 12000, 16000, 32000, 64000, 128000)
+
+STAGE_SECONDS = Histogram(
+    "agrimitra_stage_duration_seconds",
+    "Duration of a request processing stage.",
+    ["channel", "stage", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_SECONDS = Histogram(
+    "agrimitra_tool_duration_seconds",
+    "Duration of a sub-agent (AgentTool) or tool call made during an agent run.",
+    ["channel", "tool", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TURN_SECONDS = Histogram(
+    "agrimitra_llm_turn_duration_seconds",
+    "Time from the previous event of an agent run until the agent's next model response.",
+    ["channel", "agent"],
+    buckets=LATENCY_BUCKETS,
+)
+TURN_PROMPT_TOKENS = Histogram(
+    "agrimitra_turn_prompt_tokens",
+    "Prompt tokens of one agent run: the sum over the model calls of the root agent.",
+    ["channel"],
+    buckets=TOKEN_BUCKETS,
+)
+LAST_PROMPT_TOKENS = Histogram(
+    "agrimitra_last_prompt_tokens",
+    "Prompt tokens of the last model call of an agent run (the whole session history as sent).",
+    ["channel"],
+    buckets=TOKEN_BUCKETS,
+)
+
+
+def observe_stage(channel: str, stage: str, seconds: float, outcome: str = "ok"):
+    STAGE_SECONDS.labels(channel=channel, stage=stage, outcome=outcome).observe(seconds)
+
+
+class StageTimer:
+    """
+    Times a block as a stage: `with StageTimer("sms", "tts"): ...`. The outcome is
+    "error" if the block raises; otherwise "ok" unless the block sets `.outcome`.
+    """
+
+    def __init__(self, channel: str, stage: str):
+        self.channel = channel
+        self.stage = stage
+        self.outcome = "ok"
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "error"
+        observe_stage(self.channel, self.stage, time.perf_counter() - self._started, self.outcome)
+        return False
+
+
+class AgentRunObserver:
+    """
+    Derives tool and model-turn durations from the events of one agent run.
+
+    Event timestamps are set when ADK creates the event (for model responses that
+    is before the model is called), so durations use the time each event is
+    received instead.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._pending = {}  # function call id -> (tool name, start time)
+        self._last_event_at = time.perf_counter()
+        self.prompt_tokens = 0
+        self.last_prompt_tokens = 0
+        self._finished = False
+
+    def observe(self, event):
+        now = time.perf_counter()
+        calls = event.get_function_calls()
+        responses = event.get_function_responses()
+        if event.author != "user" and not event.partial and not responses and (calls or event.content):
+            LLM_TURN_SECONDS.labels(channel=self.channel, agent=event.author).observe(now - self._last_event_at)
+        for call in calls:
+            self._pending[call.id or call.name] = (call.name, now)
+        for response in responses:
+            name, started = self._pending.pop(response.id or response.name, (response.name, None))
+            if started is not None:
+                outcome = "error" if isinstance(response.response, dict) and "error" in response.response else "ok"
+                TOOL_SECONDS.labels(channel=self.channel, tool=name, outcome=outcome).observe(now - started)
+        if not event.partial:
+            self._last_event_at = now
+            usage = event.usage_metadata
+            if usage is not None and usage.prompt_token_count:
+                self.prompt_tokens += usage.prompt_token_count
+                self.last_prompt_tokens = usage.prompt_token_count
+
+    def finish(self, error: Optional[BaseException] = None):
+        """
+        Records the run's prompt tokens and calls that never got a response (the run
+        failed or was cancelled). Only the first call records anything.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        if self.prompt_tokens:
+            TURN_PROMPT_TOKENS.labels(channel=self.channel).observe(self.prompt_tokens)
+            LAST_PROMPT_TOKENS.labels(channel=self.channel).observe(self.last_prompt_tokens)
+        now = time.perf_counter()
+        outcome = "error" if error is not None else "incomplete"
+        for name, started in self._pending.values():
+            TOOL_SECONDS.labels(channel=self.channel, tool=name, outcome=outcome).observe(now - started)
+        self._pending.clear()
+
+
+def render_metrics() -> tuple:
+    """Returns (body, content type) in the Prometheus text exposition format."""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
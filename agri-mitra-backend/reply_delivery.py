@@ -0,0 +1,158 @@
+# reply_delivery.py
+# Background delivery of agent replies for the asynchronous Twilio reply mode.
+# The /sms webhook acknowledges Twilio straight away with empty TwiML and hands
+# the message to a bounded pool of worker tasks. Once the agent has answered,
+# the reply is sent through the Twilio Messages REST API (or a local stub).
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from twilio.rest import Client as TwilioClient
+
+from logging_config import bind_request_id, current_request_id, reset_request_id
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplyMessage:
+    """A single outbound message: text, an optional media attachment, or both."""
+    body: Optional[str] = None
+    media_url: Optional[str] = None
+
+
+@dataclass
+class ReplyJob:
+    """An inbound Twilio message waiting to be processed by a delivery worker."""
+    sender: str          # The farmer's number ('From' on the inbound message)
+    channel_number: str  # Our Twilio number ('To' on the inbound message)
+    form_data: dict
+    enqueued_at: float = field(default_factory=time.monotonic)
+    request_id: Optional[str] = field(default_factory=current_request_id)  # Of the webhook request that queued it
+
+
+class TwilioRestSender:
+    """Sends outbound messages through the Twilio Messages REST API."""
+
+    def __init__(self, account_sid: str, auth_token: str):
+        self.client = TwilioClient(account_sid, auth_token)
+
+    async def send(self, to: str, from_: str, message: ReplyMessage) -> str:
+        kwargs = {"to": to, "from_": from_}
+        if message.body:
+            kwargs["body"] = message.body
+        if message.media_url:
+            kwargs["media_url"] = [message.media_url]
+        # The Twilio SDK is synchronous, so keep it off the event loop.
+        sent = await asyncio.to_thread(self.client.messages.create, **kwargs)
+        return sent.sid
+
+
+class LocalStubSender:
+    """
+    Records outbound messages in memory (and optionally as JSON lines in a file)
+    instead of calling Twilio. Used for tests and offline runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.sent = []
+
+    async def send(self, to: str, from_: str, message: ReplyMessage) -> str:
+        record = {"to": to, "from": from_, "sent_at": time.time(), **asdict(message)}
+        self.sent.append(record)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return f"stub-{len(self.sent)}"
+
+
+class ReplyDispatcher:
+    """
+    Bounded worker pool that processes queued Twilio messages and delivers the replies.
+
+    `handler` turns the inbound form data into the list of ReplyMessages to send back.
+    The queue is bounded so that a burst of webhooks cannot pile up unlimited work;
+    `submit` returns False when it is full and the caller should reply immediately.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict], Awaitable[list]],
+        sender,
+        workers: int = 8,
+        queue_size: int = 200,
+    ):
+        self.handler = handler
+        self.sender = sender
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self.busy_workers = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.delivered = 0
+        self.failed = 0
+
+    def start(self):
+        """Starts the worker tasks. Must be called from within the running event loop."""
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(index)))
+        logger.info("Reply dispatcher started with %d workers (queue size %d).", self.workers, self.queue.maxsize)
+
+    async def stop(self):
+        """Cancels the worker tasks. Messages still queued are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job: ReplyJob) -> bool:
+        """Queues a job for background processing. Returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self.queue.get()
+            self.busy_workers += 1
+            token = bind_request_id(job.request_id)
+            try:
+                queued_for = time.monotonic() - job.enqueued_at
+                messages = await self.handler(job.form_data)
+                for message in messages:
+                    await self.sender.send(to=job.sender, from_=job.channel_number, message=message)
+                    self.delivered += 1
+                logger.info(
+                    "Worker %d delivered %d message(s) to %s (queued %.2fs, total %.2fs)",
+                    index, len(messages), job.sender, queued_for, time.monotonic() - job.enqueued_at,
+                )
+            except Exception:
+                self.failed += 1
+                logger.exception("Failed to deliver reply to %s from worker %d", job.sender, index)
+            finally:
+                reset_request_id(token)
+                self.busy_workers -= 1
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        """Returns counters describing the current state of the dispatcher."""
+        return {
+            "workers": self.workers,
+            "busy_workers": self.busy_workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "delivered": self.delivered,
+            "failed": self.failed,
+        }
@@ -0,0 +1,207 @@
+# semantic_cache.py
+# Semantic answer cache shared by the /sms webhook and the /query endpoint.
+# Farmers ask the same question in many ways (Hindi, Hinglish, English), so an
+# exact-match cache misses most repeats. Questions are embedded locally with
+# hashed character n-grams (no model, no network), stored as int8 rows of a
+# fixed-size NumPy matrix, and matched by cosine similarity against a threshold.
+# N-gram similarity barely notices a changed number or date ("12 March" vs
+# "13 March" scores close to 1), so a match also needs the same numbers and date
+# words as the cached question; otherwise it would serve another day's price.
+# Entries expire after a TTL and carry provenance (original question, channel,
+# sub-agents, latency) so hit rates and latency savings can be used to tune the
+# threshold.
+
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from answer_cache import normalize_query
+
+_QUANT_SCALE = 127
+
+_NUMBER = re.compile(r"\d+")
+# Relative days, weekdays and months (English, Hinglish and Hindi) that change the answer.
+_DATE_WORDS = frozenset(
+    "today tonight tomorrow yesterday aaj kal parso parson "
+    "monday tuesday wednesday thursday friday saturday sunday "
+    "mon tue tues wed thu thur thurs fri sat "
+    "january february march april june july august september october november december "
+    "jan feb apr jun jul aug sep sept oct nov dec "
+    "आज कल परसों सोमवार मंगलवार बुधवार गुरुवार शुक्रवार शनिवार रविवार "
+    "जनवरी फरवरी मार्च अप्रैल मई जून जुलाई अगस्त सितंबर अक्टूबर नवंबर दिसंबर".split()
+)
+
+
+def embed_text(text: str, dim: int = 512, ngram_sizes=(2, 3, 4)) -> np.ndarray:
+    """
+    Embeds text as an L2-normalized float32 vector of signed, hashed character
+    n-grams plus whole words. Works for any script and needs no model.
+    """
+    normalized = normalize_query(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    padded = f" {normalized} "
+    features = [padded[i:i + n] for n in ngram_sizes for i in range(len(padded) - n + 1)]
+    features += [f"w:{word}" for word in normalized.split()]
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def key_facts(text: str) -> tuple:
+    """Returns the numbers (in any script's digits) and date words of a question, in order."""
+    normalized = normalize_query(text)
+    numbers = [str(int(number)) for number in _NUMBER.findall(normalized)]
+    return tuple(numbers + [word for word in normalized.split() if word in _DATE_WORDS])
+
+
+def quantize(vector: np.ndarray) -> np.ndarray:
+    """Quantizes a unit vector to int8."""
+    return np.clip(np.rint(vector * _QUANT_SCALE), -_QUANT_SCALE, _QUANT_SCALE).astype(np.int8)
+
+
+@dataclass
+class SemanticHit:
+    """A cached answer whose question matched the lookup."""
+    answer: str
+    similarity: float
+    provenance: dict
+
+
+class SemanticCache:
+    """
+    Fixed-capacity semantic cache. Rows of `_matrix` hold the int8 embeddings of
+    cached questions; a slot is free when `_expires_at` is 0. When full, the entry
+    that was used least recently is replaced.
+
+    In shadow mode lookups are measured (hit rate, similarity distribution) but
+    callers are expected not to serve the cached answer.
+    """
+
+    def __init__(self, capacity: int = 5000, dim: int = 512, threshold: float = 0.9, shadow: bool = False):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.shadow = shadow
+        self._matrix = np.zeros((capacity, dim), dtype=np.int8)
+        self._expires_at = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._answers = [None] * capacity
+        self._provenance = [None] * capacity
+        self._facts = [None] * capacity
+        self.lookups = 0
+        self.hits = 0
+        self.fact_mismatches = 0
+        self.expired = 0
+        self.evicted = 0
+        self.latency_saved_seconds = 0.0
+        self._hit_similarity_total = 0.0
+        # Best similarity of every lookup, in 0.05-wide buckets, for threshold tuning.
+        self._similarity_histogram = np.zeros(20, dtype=np.int64)
+
+    def lookup(self, text: str) -> Optional[SemanticHit]:
+        """
+        Returns the best cached answer at or above the similarity threshold whose
+        question has the same numbers and date words, or None.
+        """
+        self.lookups += 1
+        self._expire()
+        live = np.flatnonzero(self._expires_at)
+        if not len(live):
+            self._similarity_histogram[0] += 1
+            return None
+
+        query = quantize(embed_text(text, self.dim))
+        scores = np.einsum("ij,j->i", self._matrix[live], query, dtype=np.int32)
+        similarities = np.minimum(scores / (_QUANT_SCALE * _QUANT_SCALE), 1.0)
+        best_similarity = float(similarities.max())
+        self._similarity_histogram[min(max(int(best_similarity * 20), 0), 19)] += 1
+        candidates = np.flatnonzero(similarities >= self.threshold)
+        if not len(candidates):
+            return None
+        facts = key_facts(text)
+        for index in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+            if self._facts[live[index]] == facts:
+                break
+        else:
+            self.fact_mismatches += 1
+            return None
+
+        slot = int(live[index])
+        similarity = float(similarities[index])
+        provenance = self._provenance[slot]
+        provenance["hits"] += 1
+        self._last_used[slot] = time.monotonic()
+        self.hits += 1
+        self._hit_similarity_total += similarity
+        if not self.shadow:
+            self.latency_saved_seconds += provenance.get("latency_seconds") or 0.0
+        return SemanticHit(self._answers[slot], similarity, dict(provenance))
+
+    def put(
+        self,
+        text: str,
+        answer: str,
+        ttl_seconds: float,
+        channel: str,
+        agents: Iterable[str] = (),
+        latency_seconds: Optional[float] = None,
+    ):
+        """Stores an answer along with where and how it was produced."""
+        self._expire()
+        now = time.monotonic()
+        free = np.flatnonzero(self._expires_at == 0)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = int(np.argmin(self._last_used))
+            self.evicted += 1
+        self._matrix[slot] = quantize(embed_text(text, self.dim))
+        self._expires_at[slot] = now + ttl_seconds
+        self._last_used[slot] = now
+        self._answers[slot] = answer
+        self._facts[slot] = key_facts(text)
+        self._provenance[slot] = {
+            "question": text,
+            "channel": channel,
+            "agents": sorted(set(agents)),
+            "created_at": time.time(),
+            "ttl_seconds": ttl_seconds,
+            "latency_seconds": latency_seconds,
+            "hits": 0,
+        }
+
+    def _expire(self):
+        expired = np.flatnonzero((self._expires_at > 0) & (self._expires_at <= time.monotonic()))
+        if len(expired):
+            self._expires_at[expired] = 0
+            for slot in expired:
+                self._answers[slot] = None
+                self._provenance[slot] = None
+                self._facts[slot] = None
+            self.expired += len(expired)
+
+    def stats(self) -> dict:
+        """Returns hit rates, similarity distribution and estimated latency saved."""
+        return {
+            "mode": "shadow" if self.shadow else "on",
+            "entries": int(np.count_nonzero(self._expires_at)),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+            "fact_mismatches": self.fact_mismatches,
+            "mean_hit_similarity": round(self._hit_similarity_total / self.hits, 4) if self.hits else None,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "best_similarity_histogram": {
+                f"{i / 20:.2f}": int(count) for i, count in enumerate(self._similarity_histogram)
+            },
+        }
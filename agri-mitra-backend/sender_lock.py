@@ -0,0 +1,147 @@
+# sender_lock.py
+# Cross-process serialization of a sender's /sms turns.
+# The SenderCoalescer runs one turn per sender at a time, but only within its own
+# process. With a shared session database and several workers or instances, the
+# webhooks of one farmer's burst can land in different processes and run
+# concurrent turns on the same session. DatabaseSenderLock closes that gap with a
+# per-sender lease row in the session database: a turn holds the lease while it
+# runs, renews it in the background, and deletes it when it finishes. A lease that
+# is not renewed (its process died) expires after `ttl_seconds`. Expiry uses the
+# wall clock, so the clocks of the hosts sharing the database must be in sync.
+
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+
+from sqlalchemy import Column, Float, MetaData, String, Table, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+sender_leases = Table(
+    "agrimitra_sender_leases",
+    _metadata,
+    Column("sender", String(128), primary_key=True),
+    Column("owner", String(32), nullable=False),
+    Column("expires_at", Float, nullable=False),
+)
+
+
+class SenderLockTimeout(Exception):
+    """Raised when another process held the sender's lease for longer than the wait limit."""
+
+
+class DatabaseSenderLock:
+    """
+    Per-sender leases in the session database (the AsyncEngine of a DatabaseSessionService).
+
+    `hold(sender)` waits up to `wait_seconds` for the lease, polling every
+    `poll_seconds`, and raises SenderLockTimeout if it is still taken.
+    """
+
+    def __init__(self, engine, ttl_seconds: float = 30, wait_seconds: float = 10, poll_seconds: float = 0.25):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._table_ready = False
+        self.acquired = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.lost = 0
+
+    @contextlib.asynccontextmanager
+    async def hold(self, sender: str):
+        owner = uuid.uuid4().hex
+        await self._acquire(sender, owner)
+        renewer = asyncio.create_task(self._renew(sender, owner))
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            try:
+                async with self.engine.begin() as connection:
+                    await connection.execute(
+                        delete(sender_leases).where(sender_leases.c.sender == sender, sender_leases.c.owner == owner)
+                    )
+            except Exception as e:
+                # The lease expires on its own after ttl_seconds.
+                logger.error("Failed to release the sender lease of %s: %s", sender, e)
+
+    async def _acquire(self, sender: str, owner: str):
+        if not self._table_ready:
+            await self._create_table()
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while not await self._try_acquire(sender, owner):
+            if time.monotonic() >= deadline:
+                self.timeouts += 1
+                raise SenderLockTimeout(f"sender {sender} is busy in another process")
+            if not waited:
+                waited = True
+                self.waited += 1
+                logger.info("Waiting for the turn of %s running in another process", sender)
+            await asyncio.sleep(self.poll_seconds)
+        self.acquired += 1
+
+    async def _create_table(self):
+        try:
+            async with self.engine.begin() as connection:
+                await connection.run_sync(_metadata.create_all)
+        except Exception:
+            # Another process created it at the same time; the second check finds it.
+            async with self.engine.begin() as connection:
+                await connection.run_sync(_metadata.create_all)
+        self._table_ready = True
+
+    async def _try_acquire(self, sender: str, owner: str) -> bool:
+        now = time.time()
+        async with self.engine.begin() as connection:
+            # Take over an expired lease...
+            result = await connection.execute(
+                update(sender_leases)
+                .where(sender_leases.c.sender == sender, sender_leases.c.expires_at < now)
+                .values(owner=owner, expires_at=now + self.ttl_seconds)
+            )
+            if result.rowcount == 1:
+                return True
+        try:
+            # ...or create it if nobody holds one.
+            async with self.engine.begin() as connection:
+                await connection.execute(
+                    insert(sender_leases).values(sender=sender, owner=owner, expires_at=now + self.ttl_seconds)
+                )
+            return True
+        except IntegrityError:
+            return False
+
+    async def _renew(self, sender: str, owner: str):
+        while True:
+            await asyncio.sleep(self.ttl_seconds / 3)
+            try:
+                async with self.engine.begin() as connection:
+                    result = await connection.execute(
+                        update(sender_leases)
+                        .where(sender_leases.c.sender == sender, sender_leases.c.owner == owner)
+                        .values(expires_at=time.time() + self.ttl_seconds)
+                    )
+                if result.rowcount == 0:
+                    self.lost += 1
+                    logger.warning("The sender lease of %s expired while its turn was still running", sender)
+                    return
+            except Exception as e:
+                logger.error("Failed to renew the sender lease of %s: %s", sender, e)
+
+    def stats(self) -> dict:
+        """Returns lease counters."""
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "wait_seconds": self.wait_seconds,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "timeouts": self.timeouts,
+            "lost": self.lost,
+        }
@@ -0,0 +1,345 @@
+# session_manager.py
+# Bounded bookkeeping for the per-sender ADK sessions used by the /sms webhook.
+# InMemorySessionService keeps every event of every session forever, so this
+# manager evicts sessions that have been idle for too long and enforces a total
+# event/byte budget with least-recently-used eviction. Evicted sessions can be
+# archived to a local directory and rehydrated when the farmer writes again.
+#
+# With a shared session store (e.g. DatabaseSessionService used by several
+# workers) the store itself is the source of truth for the sender -> session
+# mapping: the most recently updated session of a sender is their current one.
+# The mapping kept here then acts as a read-through cache whose entries are
+# re-validated against the store after `mapping_ttl_seconds`, and eviction only
+# drops cache entries - sessions are never deleted or archived.
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """
+    Maps senders to ADK session ids and keeps the sessions they own within budget.
+
+    `sessions` is the sender -> session id mapping (ordered from least to most
+    recently used). Senders with a run in flight are never evicted. Set
+    `shared_store` when the session service is shared between processes.
+    """
+
+    def __init__(
+        self,
+        session_service,
+        app_name: str = "agrimitra",
+        idle_ttl_seconds: float = 6 * 3600,
+        max_sessions: int = 5000,
+        max_total_events: int = 200_000,
+        max_total_bytes: int = 512 * 1024 * 1024,
+        archive_dir: Optional[str] = None,
+        shared_store: bool = False,
+        mapping_ttl_seconds: float = 30,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_total_events = max_total_events
+        self.max_total_bytes = max_total_bytes
+        self.shared_store = shared_store
+        self.mapping_ttl_seconds = mapping_ttl_seconds
+        self.archive_dir = None if shared_store else archive_dir
+        if self.archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+
+        self.sessions = OrderedDict()
+        self._last_used = {}
+        self._footprint = {}  # sender -> (event count, serialized bytes)
+        self._active = set()
+        self._fresh = set()  # senders whose session was created here and has no turns yet
+        self._validated_at = {}  # sender -> when the cached mapping was last read from the shared store
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.archived = 0
+        self.rehydrated = 0
+
+    # --- Lookup ---
+    async def get_or_create_session(self, sender: str) -> str:
+        """
+        Returns the sender's session id, rehydrating an archived session or creating
+        a new one if needed. Marks the sender as active until `record_turn` is called.
+        """
+        session_id = self._cached_session_id(sender)
+        if session_id is None and self.shared_store:
+            session_id = await self._lookup_shared(sender)
+        if session_id is None:
+            session = await self._rehydrate(sender)
+            if session is None:
+                session = await self.session_service.create_session(app_name=self.app_name, user_id=sender)
+                logger.info("Created new ADK session for %s: %s", sender, session.id)
+                self._fresh.add(sender)
+            session_id = session.id
+            self._remember(sender, session_id, len(session.events))
+        self.sessions.move_to_end(sender)
+        self._last_used[sender] = time.monotonic()
+        self._active.add(sender)
+        return session_id
+
+    def is_fresh(self, sender: str) -> bool:
+        """True if the sender's session was just created and has no conversation history yet."""
+        return sender in self._fresh
+
+    async def reset_session(self, sender: str):
+        """Deletes the sender's current session and any archive so the next message starts fresh."""
+        session_ids = [self.sessions[sender]] if self.sessions.get(sender) else []
+        if self.shared_store:
+            # Other workers may have created sessions for this sender as well.
+            try:
+                response = await self.session_service.list_sessions(app_name=self.app_name, user_id=sender)
+                session_ids = [session.id for session in response.sessions]
+            except Exception as e:
+                logger.error("Failed to list sessions for %s: %s", sender, e)
+        for session_id in session_ids:
+            try:
+                await self.session_service.delete_session(
+                    app_name=self.app_name, user_id=sender, session_id=session_id
+                )
+                logger.info("Deleted old session for %s: %s", sender, session_id)
+            except Exception as e:
+                logger.error("Failed to delete old session %s: %s", session_id, e)
+        self._forget(sender)
+        archive_path = self._archive_path(sender)
+        if archive_path and os.path.exists(archive_path):
+            os.remove(archive_path)
+
+    async def append_turn(self, sender: str, question: str, answer: str, author: str):
+        """
+        Writes a turn that was answered without running the agent (e.g. from a cache)
+        into the sender's session as a user and a model event, so follow-ups have context.
+        """
+        session_id = self.sessions.get(sender)
+        if session_id is None:
+            return
+        session = await self.session_service.get_session(
+            app_name=self.app_name, user_id=sender, session_id=session_id
+        )
+        if session is None:
+            return
+        invocation_id = Event.new_id()
+        await self.session_service.append_event(session, Event(
+            author="user",
+            invocation_id=invocation_id,
+            content=types.Content(role="user", parts=[types.Part(text=question)]),
+        ))
+        await self.session_service.append_event(session, Event(
+            author=author,
+            invocation_id=invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=answer)]),
+        ))
+
+    async def record_turn(self, sender: str):
+        """Re-measures the sender's session after an agent turn and enforces the budgets."""
+        self._active.discard(sender)
+        self._fresh.discard(sender)
+        session_id = self.sessions.get(sender)
+        if session_id is None:
+            return
+        if self.shared_store:
+            # Measuring a shared session would mean loading its full history from the
+            # store, so only the number of cached mappings is bounded.
+            await self.enforce_budget()
+            return
+        try:
+            session = await self.session_service.get_session(
+                app_name=self.app_name, user_id=sender, session_id=session_id
+            )
+            if session is not None:
+                self._footprint[sender] = (len(session.events), len(session.model_dump_json()))
+            await self.enforce_budget()
+        except Exception as e:
+            logger.error("Failed to record session footprint for %s: %s", sender, e)
+
+    # --- Eviction ---
+    async def evict_idle(self):
+        """Evicts every inactive session that has been idle for longer than the TTL."""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        idle = [
+            sender for sender, last_used in self._last_used.items()
+            if last_used < cutoff and sender not in self._active
+        ]
+        for sender in idle:
+            if await self._evict(sender):
+                self.evicted_idle += 1
+
+    async def enforce_budget(self):
+        """Evicts least recently used sessions until the count, event and byte budgets are met."""
+        for sender in list(self.sessions):
+            if not self._over_budget():
+                break
+            if sender in self._active:
+                continue
+            if await self._evict(sender):
+                self.evicted_lru += 1
+
+    async def run_sweeper(self, interval_seconds: float):
+        """Periodically evicts idle sessions. Meant to run as a background task."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.evict_idle()
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def _over_budget(self) -> bool:
+        events, size = self._totals()
+        return (
+            len(self.sessions) > self.max_sessions
+            or events > self.max_total_events
+            or size > self.max_total_bytes
+        )
+
+    async def _evict(self, sender: str) -> bool:
+        """
+        Drops the sender's mapping and, with a local store, archives and deletes their
+        session. The farmer may write again while this awaits the store, so it gives up
+        (returns False) as soon as the sender is active again.
+        """
+        session_id = self.sessions.get(sender)
+        if sender in self._active:
+            return False
+        if session_id is None or self.shared_store:
+            self._drop_mapping(sender)
+            return True
+        archive_path = None
+        try:
+            session = await self.session_service.get_session(
+                app_name=self.app_name, user_id=sender, session_id=session_id
+            )
+            if sender in self._active:
+                return False
+            if session is not None and self.archive_dir:
+                archive_path = self._archive_path(sender)
+                await asyncio.to_thread(self._write_archive, sender, session)
+                if sender in self._active:
+                    # The live session is being used again; a stale archive must not be rehydrated later.
+                    os.remove(archive_path)
+                    return False
+                self.archived += 1
+            await self.session_service.delete_session(
+                app_name=self.app_name, user_id=sender, session_id=session_id
+            )
+        except Exception as e:
+            logger.error("Failed to evict session %s for %s: %s", session_id, sender, e)
+            if sender in self._active:
+                return False
+        self._drop_mapping(sender)
+        return True
+
+    # --- Mapping cache ---
+    def _cached_session_id(self, sender: str) -> Optional[str]:
+        session_id = self.sessions.get(sender)
+        if session_id is not None and self.shared_store:
+            if time.monotonic() - self._validated_at.get(sender, 0) > self.mapping_ttl_seconds:
+                session_id = None
+        if session_id is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+        return session_id
+
+    async def _lookup_shared(self, sender: str) -> Optional[str]:
+        """Reads the sender's most recently updated session from the shared store."""
+        response = await self.session_service.list_sessions(app_name=self.app_name, user_id=sender)
+        if not response.sessions:
+            return None
+        latest = max(response.sessions, key=lambda session: session.last_update_time)
+        self._remember(sender, latest.id, 0)
+        return latest.id
+
+    def _remember(self, sender: str, session_id: str, events: int):
+        self.sessions[sender] = session_id
+        self._validated_at[sender] = time.monotonic()
+        self._footprint[sender] = (events, 0)
+
+    def _drop_mapping(self, sender: str):
+        self.sessions.pop(sender, None)
+        self._validated_at.pop(sender, None)
+        self._last_used.pop(sender, None)
+        self._footprint.pop(sender, None)
+        self._fresh.discard(sender)
+
+    def _forget(self, sender: str):
+        self._drop_mapping(sender)
+        self._active.discard(sender)
+
+    # --- Archive ---
+    def _archive_path(self, sender: str) -> Optional[str]:
+        if not self.archive_dir:
+            return None
+        digest = hashlib.sha256(sender.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.archive_dir, f"{digest}.json")
+
+    def _write_archive(self, sender: str, session: Session):
+        path = self._archive_path(sender)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(session.model_dump_json())
+        os.replace(tmp_path, path)
+
+    async def _rehydrate(self, sender: str) -> Optional[Session]:
+        """Recreates an archived session for a returning sender, if one exists."""
+        path = self._archive_path(sender)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                archived = Session.model_validate_json(f.read())
+            session = await self.session_service.create_session(
+                app_name=self.app_name, user_id=sender, state=archived.state
+            )
+            for event in archived.events:
+                await self.session_service.append_event(session, event)
+            os.remove(path)
+            self.rehydrated += 1
+            logger.info("Rehydrated archived session for %s with %d events: %s", sender, len(archived.events), session.id)
+            return session
+        except Exception:
+            logger.exception("Failed to rehydrate archived session for %s", sender)
+            return None
+
+    # --- Stats ---
+    def _totals(self):
+        events = sum(count for count, _ in self._footprint.values())
+        size = sum(size for _, size in self._footprint.values())
+        return events, size
+
+    def stats(self) -> dict:
+        """Returns the number of sessions, events and bytes held, plus eviction counters."""
+        events, size = self._totals()
+        return {
+            "shared_store": self.shared_store,
+            "sessions": len(self.sessions),
+            "active": len(self._active),
+            "events": events,
+            "bytes": size,
+            "max_sessions": self.max_sessions,
+            "max_total_events": self.max_total_events,
+            "max_total_bytes": self.max_total_bytes,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "archived": self.archived,
+            "rehydrated": self.rehydrated,
+            "mapping_cache_hits": self.cache_hits,
+            "mapping_cache_misses": self.cache_misses,
+        }
@@ -0,0 +1,176 @@
+# session_pool.py
+# Pool of pre-created ADK sessions for stateless requests (/query, /query/stream
+# and batch queries). Creating and deleting a session around every request costs
+# two round trips with a remote session backend. The pool keeps sessions ready
+# ahead of time and takes the create/delete work off the request path.
+#
+# A returned session is reset before anyone else can check it out:
+# - with the in-memory backend it is reset in place: its events and state are
+#   replaced by an empty session under the same id, and the state scoped to the
+#   pool user ("user:" keys) is cleared, so the next caller starts from nothing;
+# - with a remote backend it is never handed out again but deleted in the
+#   background and replaced by a fresh one. Remote backends keep "user:" state
+#   per user rather than per session, so agents must not write it for API calls.
+# A session whose caller did not finish cleanly (cancelled, client gone) may
+# still be written to by its run, so it is always discarded rather than reset.
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from google.adk.sessions import InMemorySessionService, Session
+
+logger = logging.getLogger(__name__)
+
+
+class EphemeralSessionPool:
+    """Hands out fresh, unused sessions and resets or recycles returned ones."""
+
+    def __init__(
+        self,
+        session_service,
+        app_name: str = "agrimitra",
+        user_id: str = "api_user",
+        size: int = 8,
+        reset_in_place: Optional[bool] = None,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.user_id = user_id
+        self.size = size
+        # Only the in-memory backend exposes its storage, so only it can be reset without a round trip.
+        self.reset_in_place = (
+            isinstance(session_service, InMemorySessionService) if reset_in_place is None else reset_in_place
+        )
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._creating = 0
+        self._checked_out = set()
+        self._background = set()
+        self.hits = 0
+        self.misses = 0
+        self.resets = 0
+        self.recycled = 0
+        self.discarded = 0
+
+    @property
+    def checked_out(self) -> int:
+        return len(self._checked_out)
+
+    def _missing(self) -> int:
+        # Sessions that are reset in place come back to the pool, so they still count as owned.
+        owned = self._ready.qsize() + self._creating
+        if self.reset_in_place:
+            owned += len(self._checked_out)
+        return max(self.size - owned, 0)
+
+    async def prefill(self):
+        """Creates sessions until `size` of them are ready."""
+        missing = self._missing()
+        self._creating += missing
+        await asyncio.gather(*(self._create_ready() for _ in range(missing)))
+
+    async def checkout(self) -> str:
+        """Returns the id of a fresh session, creating one if none is ready."""
+        try:
+            session_id = self._ready.get_nowait()
+            self.hits += 1
+        except asyncio.QueueEmpty:
+            session = await self.session_service.create_session(app_name=self.app_name, user_id=self.user_id)
+            session_id = session.id
+            self.misses += 1
+        self._checked_out.add(session_id)
+        self._refill()
+        return session_id
+
+    def checkin(self, session_id: str, discard: bool = False):
+        """Returns a used session; it is reset for reuse or deleted in the background.
+
+        Pass `discard=True` when the run that used the session may still be going.
+        """
+        if session_id not in self._checked_out:
+            logger.warning("Ignoring check-in of session %s, which is not checked out of the pool", session_id)
+            return
+        self._checked_out.discard(session_id)
+        if discard:
+            self.discarded += 1
+        elif self.reset_in_place and self._missing() > 0 and self._reset(session_id):
+            self.resets += 1
+            self._ready.put_nowait(session_id)
+            return
+        else:
+            self.recycled += 1
+        self._spawn(self._delete(session_id))
+        self._refill()
+
+    @asynccontextmanager
+    async def session(self):
+        """Checks out a session for the duration of the `async with` block."""
+        session_id = await self.checkout()
+        clean = False
+        try:
+            yield session_id
+            clean = True
+        finally:
+            self.checkin(session_id, discard=not clean)
+
+    async def close(self):
+        """Deletes the sessions that are still waiting in the pool."""
+        while not self._ready.empty():
+            await self._delete(self._ready.get_nowait())
+
+    def _reset(self, session_id: str) -> bool:
+        """Replaces an in-memory session by an empty one with the same id."""
+        sessions = self.session_service.sessions.get(self.app_name, {}).get(self.user_id, {})
+        if session_id not in sessions:
+            return False
+        sessions[session_id] = Session(
+            id=session_id, app_name=self.app_name, user_id=self.user_id, last_update_time=time.time()
+        )
+        # "user:" state is shared by every session of the pool user and would reach the next caller.
+        self.session_service.user_state.get(self.app_name, {}).pop(self.user_id, None)
+        return True
+
+    def _refill(self):
+        for _ in range(self._missing()):
+            self._creating += 1
+            self._spawn(self._create_ready())
+
+    async def _create_ready(self):
+        # The caller has already counted this session in `_creating`.
+        try:
+            session = await self.session_service.create_session(app_name=self.app_name, user_id=self.user_id)
+            self._ready.put_nowait(session.id)
+        except Exception as e:
+            logger.error("Failed to pre-create pooled session: %s", e)
+        finally:
+            self._creating -= 1
+
+    async def _delete(self, session_id: str):
+        try:
+            await self.session_service.delete_session(
+                app_name=self.app_name, user_id=self.user_id, session_id=session_id
+            )
+        except Exception as e:
+            logger.warning("Failed to delete pooled session %s: %s", session_id, e)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def stats(self) -> dict:
+        """Returns pool occupancy and hit/miss/reset counters."""
+        return {
+            "size": self.size,
+            "reset_in_place": self.reset_in_place,
+            "ready": self._ready.qsize(),
+            "creating": self._creating,
+            "checked_out": self.checked_out,
+            "hits": self.hits,
+            "misses": self.misses,
+            "resets": self.resets,
+            "recycled": self.recycled,
+            "discarded": self.discarded,
+        }
@@ -0,0 +1,52 @@
+# single_flight.py
+# Shares one in-flight computation between concurrent requests for the same key.
+# Used by the caches in front of slow external calls (speech synthesis, media
+# transcription/description): the first request for a key does the work, and
+# requests for that key arriving meanwhile wait for its result instead of
+# repeating the call.
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Runs `work()` once per key among concurrent callers of `run(key, work)`.
+
+    Waiters get the leader's result or exception. If the leader is cancelled (e.g.
+    its request timed out), the waiters are woken with a RuntimeError naming `what`
+    rather than left waiting. Failures are not remembered: the next call runs again.
+    """
+
+    def __init__(self, what: str):
+        self.what = what
+        self._inflight = {}  # key -> future shared by concurrent callers
+        self.deduplicated = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.deduplicated += 1
+            # A waiter that is cancelled must not cancel the work the others wait for.
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await work()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved in case nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.what} was cancelled"))
+                future.exception()
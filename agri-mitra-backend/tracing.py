@@ -0,0 +1,250 @@
+# tracing.py
+# OpenTelemetry tracing for the webhook and the agent tree.
+# ADK already creates spans for every agent invocation (invoke_agent), model call
+# (call_llm) and tool call (execute_tool), nested through AgentTool; the web
+# handlers and the agrimitra tools add spans around external APIs (media
+# download, Gemini transcription, TTS, GCS, BigQuery, weather/shopping APIs).
+# This module installs a tracer provider that exports all of them, with the
+# parent/child tree intact, to a local JSONL file or an OTLP collector.
+#
+# It is also a CLI that prints the slowest critical path of a trace:
+#   python tracing.py traces.jsonl                  # slowest trace in the file
+#   python tracing.py traces.jsonl --trace-id <id>  # a specific trace
+#   python tracing.py traces.jsonl --list           # slowest traces
+
+import argparse
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer("agrimitra.web")
+
+# Attribute values longer than this are truncated in the JSONL file (ADK attaches full LLM requests).
+MAX_ATTRIBUTE_CHARS = 2000
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends one JSON object per finished span to a local file."""
+
+    def __init__(self, path: str, max_attribute_chars: int = MAX_ATTRIBUTE_CHARS):
+        self.path = path
+        self.max_attribute_chars = max_attribute_chars
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _attribute(self, value):
+        if isinstance(value, str) and len(value) > self.max_attribute_chars:
+            return value[:self.max_attribute_chars] + f"...[{len(value) - self.max_attribute_chars} more chars]"
+        if isinstance(value, (list, tuple)):
+            return [self._attribute(item) for item in value]
+        return value
+
+    def export(self, spans) -> SpanExportResult:
+        lines = []
+        for span in spans:
+            lines.append(json.dumps({
+                "trace_id": format(span.context.trace_id, "032x"),
+                "span_id": format(span.context.span_id, "016x"),
+                "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+                "name": span.name,
+                "start_ns": span.start_time,
+                "end_ns": span.end_time,
+                "status": span.status.status_code.name,
+                "attributes": {key: self._attribute(value) for key, value in (span.attributes or {}).items()},
+            }, ensure_ascii=False, default=str))
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.error("Failed to write spans to %s: %s", self.path, e)
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def setup_tracing(
+    exporter: str,
+    path: str = "traces.jsonl",
+    otlp_endpoint: Optional[str] = None,
+    service_name: str = "agrimitra",
+) -> Optional[TracerProvider]:
+    """
+    Installs a global tracer provider exporting to "jsonl" or "otlp" (OTLP/HTTP).
+    Returns None and leaves tracing disabled for any other exporter value.
+    """
+    if exporter == "jsonl":
+        span_exporter = JsonlSpanExporter(path)
+    elif exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        # Without an explicit endpoint the exporter honours OTEL_EXPORTER_OTLP_* variables.
+        span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint) if otlp_endpoint else OTLPSpanExporter()
+    else:
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    logger.info("Tracing enabled: exporting spans via %s", exporter)
+    return provider
+
+
+# --- Critical path CLI ---
+def load_traces(path: str) -> dict:
+    """Returns trace id -> list of span dicts."""
+    traces = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces.setdefault(span["trace_id"], []).append(span)
+    return traces
+
+
+def trace_bounds(spans: list) -> tuple:
+    return min(span["start_ns"] for span in spans), max(span["end_ns"] for span in spans)
+
+
+def span_children(spans: list) -> dict:
+    """
+    Returns span id -> child spans, for the spans whose parent is in the trace.
+
+    ADK keeps a call_llm span (and its generate_content span) open while the tools
+    the model asked for run, so execute_tool is a sibling that lies entirely inside
+    it. A span that lies inside a sibling is listed under that sibling (the shortest
+    one), which puts the tool and its sub-agent under the model call that waited for it.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    children = {}
+    for span in spans:
+        if span["parent_id"] in by_id:
+            children.setdefault(span["parent_id"], []).append(span)
+    for parent_id in list(children):
+        _nest_contained(children, parent_id)
+    return children
+
+
+def _nest_contained(children: dict, parent_id: str):
+    siblings = children.get(parent_id, [])
+    order = {id(span): index for index, span in enumerate(siblings)}
+
+    def contains(outer: dict, inner: dict) -> bool:
+        if outer is inner or not (outer["start_ns"] <= inner["start_ns"] and inner["end_ns"] <= outer["end_ns"]):
+            return False
+        # Identical intervals: the earlier span contains the later one, never both ways.
+        return (outer["end_ns"] - outer["start_ns"] > inner["end_ns"] - inner["start_ns"]
+                or order[id(outer)] < order[id(inner)])
+
+    kept, containers = [], []
+    for span in siblings:
+        outer = [sibling for sibling in siblings if contains(sibling, span)]
+        if outer:
+            container = min(outer, key=lambda sibling: (sibling["end_ns"] - sibling["start_ns"], -order[id(sibling)]))
+            children.setdefault(container["span_id"], []).append(span)
+            containers.append(container["span_id"])
+        else:
+            kept.append(span)
+    children[parent_id] = kept
+    for container_id in dict.fromkeys(containers):
+        _nest_contained(children, container_id)
+
+
+def critical_path(spans: list) -> list:
+    """
+    Returns the spans that determined the trace's end time as (depth, span) pairs in
+    start order. Below each span, the children are walked backwards from its end:
+    take the child that finished last, then the child that finished last before that
+    one started, and so on, so sequential children (model calls, tool calls, AgentTool
+    sub-agents) are all on the path; each of them is expanded the same way.
+    """
+    children = span_children(spans)
+    span_ids = {span["span_id"] for span in spans}
+    roots = [span for span in spans if span["parent_id"] not in span_ids]
+    path = []
+
+    def visit(span: dict, depth: int):
+        path.append((depth, span))
+        chain = []
+        cursor = None  # the first child may end after its parent (e.g. work it did not await)
+        candidates = children.get(span["span_id"], [])
+        while True:
+            before = [child for child in candidates if cursor is None or child["end_ns"] <= cursor]
+            if not before:
+                break
+            child = max(before, key=lambda child: child["end_ns"])
+            chain.append(child)
+            cursor = child["start_ns"]
+        for child in reversed(chain):
+            visit(child, depth + 1)
+
+    visit(max(roots, key=lambda span: span["end_ns"] - span["start_ns"]), 0)
+    return path
+
+
+def self_time_ns(span: dict, children: list) -> int:
+    """The span's duration minus the union of its children's intervals (clipped to the span)."""
+    covered, covered_until = 0, span["start_ns"]
+    for child in sorted(children, key=lambda child: child["start_ns"]):
+        start, end = max(child["start_ns"], covered_until), min(child["end_ns"], span["end_ns"])
+        if end > start:
+            covered += end - start
+            covered_until = end
+    return span["end_ns"] - span["start_ns"] - covered
+
+
+def span_label(span: dict) -> str:
+    attributes = span["attributes"]
+    detail = attributes.get("gen_ai.tool.name") or attributes.get("gen_ai.agent.name") or attributes.get("gen_ai.request.model")
+    return f"{span['name']} ({detail})" if detail and detail not in span["name"] else span["name"]
+
+
+def print_critical_path(spans: list):
+    start, end = trace_bounds(spans)
+    children = span_children(spans)
+    print(f"trace {spans[0]['trace_id']}: {(end - start) / 1e9:.3f}s, {len(spans)} spans")
+    print(f"{'offset s':>9} {'duration s':>10} {'self s':>8}  span")
+    for depth, span in critical_path(spans):
+        duration = span["end_ns"] - span["start_ns"]
+        self_time = self_time_ns(span, children.get(span["span_id"], []))
+        print(f"{(span['start_ns'] - start) / 1e9:>9.3f} {duration / 1e9:>10.3f} {self_time / 1e9:>8.3f}  "
+              f"{'  ' * depth}{span_label(span)}{'' if span['status'] != 'ERROR' else '  [ERROR]'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the slowest critical path of a trace from a JSONL span file")
+    parser.add_argument("path", help="JSONL file written by the jsonl exporter")
+    parser.add_argument("--trace-id", help="trace to analyse (default: the slowest one)")
+    parser.add_argument("--list", type=int, nargs="?", const=10, metavar="N", help="list the N slowest traces")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path)
+    if not traces:
+        raise SystemExit(f"No spans in {args.path}")
+    durations = sorted(
+        ((trace_bounds(spans)[1] - trace_bounds(spans)[0], trace_id) for trace_id, spans in traces.items()),
+        reverse=True,
+    )
+    if args.list:
+        for duration, trace_id in durations[:args.list]:
+            root = min(traces[trace_id], key=lambda span: span["start_ns"])
+            print(f"{trace_id}  {duration / 1e9:>8.3f}s  {len(traces[trace_id]):>4} spans  {span_label(root)}")
+        return
+    trace_id = args.trace_id or durations[0][1]
+    if trace_id not in traces:
+        raise SystemExit(f"Trace {trace_id} not found in {args.path}")
+    print_critical_path(traces[trace_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# tts_cache.py
+# Content-addressed cache for synthesized voice replies.
+# The same texts (greetings, error messages, common advisories) are spoken over
+# and over, so audio is keyed on a hash of the text and the voice settings and
+# stored in GCS under that hash. A reply resolves, in order, from the in-memory
+# URL map, from an existing GCS blob, or from the local disk tier (upload only),
+# and is synthesized only when none of them has it. All Google Cloud client calls
+# are blocking, so they run in worker threads instead of on the event loop.
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from opentelemetry import trace
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+
+def audio_key(text: str, voice: str) -> str:
+    """Returns the content hash that names the audio for `text` spoken with `voice`."""
+    return hashlib.sha256(f"{voice}\n{text}".encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """
+    Resolves reply texts to public audio URLs, synthesizing and uploading only
+    on a miss in every tier.
+
+    `synthesize(text)` must return the encoded audio bytes; it is called in a
+    worker thread. Concurrent requests for the same text share one synthesis.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], bytes],
+        bucket,
+        voice: str,
+        prefix: str = "audio-responses/cache",
+        extension: str = "ogg",
+        content_type: str = "audio/ogg",
+        max_entries: int = 2000,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.synthesize = synthesize
+        self.bucket = bucket
+        self.voice = voice
+        self.prefix = prefix
+        self.extension = extension
+        self.content_type = content_type
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._urls = OrderedDict()  # key -> public URL
+        self._inflight = SingleFlight("speech synthesis")
+        self.memory_hits = 0
+        self.gcs_hits = 0
+        self.disk_hits = 0
+        self.synthesized = 0
+        self.errors = 0
+
+    async def get_url(self, text: str) -> str:
+        """Returns the public URL of the audio for `text`, creating it if needed."""
+        key = audio_key(text, self.voice)
+        url = self._urls.get(key)
+        if url is not None:
+            self._urls.move_to_end(key)
+            self.memory_hits += 1
+            return url
+
+        return await self._inflight.run(key, lambda: self._resolve(key, text))
+
+    async def _resolve(self, key: str, text: str) -> str:
+        try:
+            url = await self._find_or_create(key, text)
+        except Exception:
+            self.errors += 1
+            raise
+        self._urls[key] = url
+        while len(self._urls) > self.max_entries:
+            self._urls.popitem(last=False)
+        return url
+
+    async def _find_or_create(self, key: str, text: str) -> str:
+        blob = self.bucket.blob(f"{self.prefix}/{key}.{self.extension}")
+        with tracer.start_as_current_span("gcs.blob_exists"):
+            exists = await asyncio.to_thread(blob.exists)
+        if exists:
+            self.gcs_hits += 1
+            return blob.public_url
+
+        audio = await asyncio.to_thread(self._read_disk, key)
+        if audio is not None:
+            self.disk_hits += 1
+        else:
+            logger.debug("Synthesizing audio for text: %r", text[:50])
+            audio = await asyncio.to_thread(self.synthesize, text)
+            self.synthesized += 1
+            try:
+                await asyncio.to_thread(self._write_disk, key, audio)
+            except OSError as e:
+                logger.warning("Failed to write audio to the disk cache: %s", e)
+
+        logger.debug("Uploading audio to GCS as %r", blob.name)
+        with tracer.start_as_current_span("gcs.upload") as span:
+            span.set_attribute("gcs.size_bytes", len(audio))
+            await asyncio.to_thread(blob.upload_from_string, audio, content_type=self.content_type)
+        return blob.public_url
+
+    # --- Disk tier ---
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, f"{key}.{self.extension}")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            audio = f.read()
+        os.utime(path)  # keeps recently used files from being pruned first
+        return audio
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._disk_path(key)
+        if not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Deletes the least recently used files until the disk tier fits its byte budget."""
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(f".{self.extension}"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def stats(self) -> dict:
+        """Returns per-tier hit counters."""
+        return {
+            "entries": len(self._urls),
+            "in_flight": len(self._inflight),
+            "memory_hits": self.memory_hits,
+            "gcs_hits": self.gcs_hits,
+            "disk_hits": self.disk_hits,
+            "synthesized": self.synthesized,
+            "deduplicated": self._inflight.deduplicated,
+            "errors": self.errors,
+        }
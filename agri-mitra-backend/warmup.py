@@ -0,0 +1,160 @@
+# warmup.py
+# Startup warm-up. After a cold start the first farmer used to pay for BigQuery
+# schema introspection, the first RAG corpus listing, loading the RAG and
+# data-science sub-agents, Gemini client setup and the runner. StartupWarmup
+# runs the registered warmers concurrently in the background as soon as the app
+# starts, within a time budget, and records for each one whether it finished
+# and how long it took; GET /ready reports that.
+# A warmer still running when the budget is spent keeps going, but no longer
+# holds back readiness; a failed warmer is reported and the app serves anyway,
+# paying the cold cost on first use as before.
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.models.registry import LLMRegistry
+
+from agrimitra.lazy_agent_tool import walk_agents
+
+logger = logging.getLogger(__name__)
+
+
+class Warmer:
+    """One warm-up step: a coroutine function, or a blocking function run in a thread."""
+
+    def __init__(self, name: str, fn: Callable, enabled: bool = True):
+        self.name = name
+        self.fn = fn
+        self.status = "pending" if enabled else "skipped"
+        self.started: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result = None
+
+    async def run(self):
+        self.status = "running"
+        self.started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(self.fn):
+                self.result = await self.fn()
+            else:
+                self.result = await asyncio.to_thread(self.fn)
+            self.status = "ok"
+        except Exception as e:
+            self.status = "error"
+            self.error = str(e)
+            logger.warning("Warm-up step %s failed: %s", self.name, e)
+        finally:
+            self.seconds = time.perf_counter() - self.started
+
+    def report(self) -> dict:
+        seconds = self.seconds
+        if seconds is None and self.started is not None:
+            seconds = time.perf_counter() - self.started  # still running
+        report = {"status": self.status, "seconds": round(seconds, 3) if seconds is not None else None}
+        if self.error:
+            report["error"] = self.error
+        if isinstance(self.result, (int, float, str)):
+            report["result"] = self.result
+        return report
+
+
+class StartupWarmup:
+    """Runs warmers concurrently at startup and tracks readiness against a time budget."""
+
+    def __init__(self, budget_seconds: float = 20.0):
+        self.budget_seconds = budget_seconds
+        self.warmers = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, fn: Callable, enabled: bool = True):
+        """Registers a warmer; a disabled one is reported as skipped."""
+        self.warmers[name] = Warmer(name, fn, enabled)
+
+    def start(self):
+        """Starts the warm-up in the background of the running event loop."""
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def run(self):
+        """Runs every enabled warmer at once and returns when all finished or the budget is spent."""
+        self.started_at = time.perf_counter()
+        tasks = [
+            asyncio.create_task(warmer.run(), name=f"warmup-{warmer.name}")
+            for warmer in self.warmers.values()
+            if warmer.status == "pending"
+        ]
+        if tasks and self.budget_seconds > 0:
+            await asyncio.wait(tasks, timeout=self.budget_seconds)
+        self.finished_at = time.perf_counter()
+        late = [warmer.name for warmer in self.warmers.values() if warmer.status in ("pending", "running")]
+        logger.info(
+            "Warm-up finished in %.2fs%s",
+            self.finished_at - self.started_at,
+            f"; still running past the {self.budget_seconds:.0f}s budget: {', '.join(late)}" if late else "",
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    def report(self) -> dict:
+        now = time.perf_counter()
+        return {
+            "ready": self.ready,
+            "budget_seconds": self.budget_seconds,
+            "elapsed_seconds": (
+                round((self.finished_at or now) - self.started_at, 3) if self.started_at is not None else None
+            ),
+            "warmers": {name: warmer.report() for name, warmer in self.warmers.items()},
+        }
+
+
+class LazyClient:
+    """A client built by `factory` on first use instead of at import; attributes are forwarded to it."""
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+async def warm_llm_clients(root_agent) -> int:
+    """Gives every agent that names its model one shared, connected model instance per name.
+
+    ADK resolves a model name into a new Gemini instance whenever it meets an
+    agent it has not resolved before, and each instance builds its own genai
+    client (credential lookup, ~60 ms) on first use. Agents are copied per
+    invocation, so that happened on nearly every model call. Assigning the
+    resolved instance to the agent itself keeps it across copies; its client is
+    built here, on the serving event loop, before the first request. Agents
+    whose model is already an instance (e.g. a fake in benchmarks) are left alone.
+    Returns the number of model instances shared.
+    """
+    shared = {}
+    for agent in walk_agents(root_agent):
+        if isinstance(agent, LlmAgent) and isinstance(agent.model, str) and agent.model:
+            if agent.model not in shared:
+                shared[agent.model] = LLMRegistry.new_llm(agent.model)
+            agent.model = shared[agent.model]
+    for llm in shared.values():
+        # The client is cached per event loop, so it has to be built on the loop that serves requests.
+        if hasattr(llm, "api_client"):
+            _ = llm.api_client
+    return len(shared)
@@ -10,25 +10,47 @@ GOOGLE_MODEL_FOR_IMAGE = "gemini-2.5-flash-lite"
 GOOGLE_MODEL_FOR_AUDIO = "gemini-2.5-flash-lite"
 
 
+import asyncio
+import json
+import logging
 import os
-import requests
+import time
 from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.request_validator import RequestValidator
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.apps import App
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService, VertexAiSessionService, DatabaseSessionService
 from google.genai import types
 from google.cloud import texttospeech
-from google.cloud import speech_v1p1beta1 as speech # Use v1p1beta1 for better features if needed, or v1
-from vertexai.generative_models import GenerativeModel, Part
 from google.cloud import storage
-import uuid
+from typing import Optional
 from pydantic import BaseModel
 # Import the root_agent from the agent module.
+from agrimitra import init_vertexai
 from agrimitra.agent import root_agent
+from agrimitra.compaction import compaction_config
+from agrimitra.lazy_agent_tool import walk_agents
 # from starlette.middleware.cors import CORSMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.exceptions import RequestValidationError
+from reply_delivery import LocalStubSender, ReplyDispatcher, ReplyJob, ReplyMessage, TwilioRestSender
+from session_manager import SessionManager
+from coalescer import SenderCoalescer
+from sender_lock import DatabaseSenderLock, SenderLockTimeout
+from session_pool import EphemeralSessionPool
+from warmup import LazyClient, StartupWarmup, warm_llm_clients
+from answer_cache import AnswerCache
+from semantic_cache import SemanticCache
+from tts_cache import TTSAudioCache
+from media import MediaIngestor
+from media_cache import DerivationCache
+from image_prep import ImagePreprocessor
+from admission import AdmissionController, AdmissionRejected
+from metrics import AgentRunObserver, StageTimer, observe_stage, render_metrics
+from tracing import setup_tracing, tracer
+from logging_config import bind_request_id, current_request_id, logging_stats, parse_levels, reset_request_id, setup_logging
 
 
 
@@ -49,33 +71,334 @@ origins = [
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN',"")
 
+# Asynchronous reply mode: acknowledge the webhook immediately with empty TwiML and
+# deliver the answer through the Twilio REST API from a bounded background worker pool.
+TWILIO_ASYNC_REPLY = os.environ.get('TWILIO_ASYNC_REPLY', 'false').lower() == 'true'
+TWILIO_REPLY_WORKERS = int(os.environ.get('TWILIO_REPLY_WORKERS', '8'))
+TWILIO_REPLY_QUEUE_SIZE = int(os.environ.get('TWILIO_REPLY_QUEUE_SIZE', '200'))
+TWILIO_REPLY_TRANSPORT = os.environ.get('TWILIO_REPLY_TRANSPORT', 'twilio')  # 'twilio' or 'stub'
+TWILIO_REPLY_STUB_PATH = os.environ.get('TWILIO_REPLY_STUB_PATH')  # Optional JSONL file for the stub transport
+
+# Session backend: 'memory' (default, per process), 'database' (SQLite/Postgres through
+# DatabaseSessionService, shared by all workers) or 'vertex' (Vertex AI Agent Engine).
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+SESSION_DB_URL = os.environ.get('SESSION_DB_URL', 'sqlite+aiosqlite:///./agrimitra_sessions.db')
+SESSION_DB_POOL_SIZE = int(os.environ.get('SESSION_DB_POOL_SIZE', '10'))
+SESSION_DB_MAX_OVERFLOW = int(os.environ.get('SESSION_DB_MAX_OVERFLOW', '20'))
+SESSION_VERTEX_AGENT_ENGINE_ID = os.environ.get('SESSION_VERTEX_AGENT_ENGINE_ID')
+# How long a cached sender -> session mapping is trusted before re-reading it from a shared backend.
+SESSION_MAPPING_CACHE_TTL_SECONDS = float(os.environ.get('SESSION_MAPPING_CACHE_TTL_SECONDS', '30'))
+
+# Per-sender session limits: idle sessions are evicted after the TTL, and the least
+# recently used ones are evicted when the count/event/byte budgets are exceeded.
+SESSION_IDLE_TTL_SECONDS = float(os.environ.get('SESSION_IDLE_TTL_SECONDS', str(6 * 3600)))
+SESSION_MAX_COUNT = int(os.environ.get('SESSION_MAX_COUNT', '5000'))
+SESSION_MAX_EVENTS = int(os.environ.get('SESSION_MAX_EVENTS', '200000'))
+SESSION_MAX_BYTES = int(os.environ.get('SESSION_MAX_BYTES', str(512 * 1024 * 1024)))
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.environ.get('SESSION_SWEEP_INTERVAL_SECONDS', '60'))
+SESSION_ARCHIVE_DIR = os.environ.get('SESSION_ARCHIVE_DIR')  # Archive evicted sessions here for rehydration
+
+# Session history compaction (see agrimitra/compaction.py): once the root agent's prompt reaches
+# the token threshold, all but the last SESSION_COMPACTION_KEEP_TURNS turns are folded into a
+# summary plus a farmer-facts block. A threshold of 0 disables it; an empty model summarizes
+# extractively instead of with Gemini.
+SESSION_COMPACTION_TOKEN_THRESHOLD = int(os.environ.get('SESSION_COMPACTION_TOKEN_THRESHOLD', '6000'))
+SESSION_COMPACTION_KEEP_TURNS = int(os.environ.get('SESSION_COMPACTION_KEEP_TURNS', '3'))
+SESSION_COMPACTION_MODEL = os.environ.get('SESSION_COMPACTION_MODEL', 'gemini-2.5-flash-lite')
+
+# Messages from the same sender are answered one turn at a time. Messages arriving within
+# the debounce window (or while a turn is running) are merged into a single agent turn.
+SMS_DEBOUNCE_SECONDS = float(os.environ.get('SMS_DEBOUNCE_SECONDS', '1.5'))
+SMS_MAX_DEBOUNCE_SECONDS = float(os.environ.get('SMS_MAX_DEBOUNCE_SECONDS', '6'))
+# The coalescer only serializes within one process. With SESSION_BACKEND=database a sender's
+# turns are also serialized across workers and instances by a lease in the session database
+# (see sender_lock.py), which expires SMS_SENDER_LOCK_TTL_SECONDS after its process died. A turn
+# waits up to SMS_SENDER_LOCK_WAIT_SECONDS for one running elsewhere, then gets the "busy" reply.
+# The vertex backend has no such lease: run a single worker and route each sender to one instance.
+SMS_SENDER_LOCK_TTL_SECONDS = float(os.environ.get('SMS_SENDER_LOCK_TTL_SECONDS', '30'))
+SMS_SENDER_LOCK_WAIT_SECONDS = float(os.environ.get('SMS_SENDER_LOCK_WAIT_SECONDS', '60' if TWILIO_ASYNC_REPLY else '10'))
+
+# Batch /query: maximum number of inputs per request and of agent runs in flight per batch.
+BATCH_QUERY_MAX_ITEMS = int(os.environ.get('BATCH_QUERY_MAX_ITEMS', '500'))
+BATCH_QUERY_CONCURRENCY = int(os.environ.get('BATCH_QUERY_CONCURRENCY', '8'))
+
+# Pre-created sessions kept ready for /query, /query/stream and batch queries.
+QUERY_SESSION_POOL_SIZE = int(os.environ.get('QUERY_SESSION_POOL_SIZE', '16'))
+
+# Exact-match answer cache for /query. Per-entry TTLs depend on the sub-agents used
+# (see answer_cache.DEFAULT_AGENT_TTLS); the default applies to answers that used none.
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', '1000'))
+ANSWER_CACHE_DEFAULT_TTL_SECONDS = float(os.environ.get('ANSWER_CACHE_DEFAULT_TTL_SECONDS', '3600'))
+
+# Semantic answer cache shared by /sms and /query. 'shadow' only measures how often
+# paraphrased questions would hit (see /stats); 'on' serves the cached answers.
+SEMANTIC_CACHE_MODE = os.environ.get('SEMANTIC_CACHE_MODE', 'shadow').lower()  # 'off', 'shadow' or 'on'
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', '0.9'))
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get('SEMANTIC_CACHE_CAPACITY', '5000'))
+SEMANTIC_CACHE_DIM = int(os.environ.get('SEMANTIC_CACHE_DIM', '512'))
+
+# Voice reply audio cache: URLs are kept in memory, audio bytes on local disk, and
+# blobs in GCS are named by content hash so identical replies are synthesized once.
+TTS_CACHE_MAX_ENTRIES = int(os.environ.get('TTS_CACHE_MAX_ENTRIES', '2000'))
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', './tts_cache')  # empty disables the disk tier
+TTS_CACHE_DISK_MAX_BYTES = int(os.environ.get('TTS_CACHE_DISK_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Incoming media (MediaUrlN): downloads larger than MEDIA_MAX_BYTES are aborted early.
+MEDIA_MAX_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', str(16 * 1024 * 1024)))
+MEDIA_DOWNLOAD_TIMEOUT_SECONDS = float(os.environ.get('MEDIA_DOWNLOAD_TIMEOUT_SECONDS', '30'))
+MEDIA_MAX_CONNECTIONS = int(os.environ.get('MEDIA_MAX_CONNECTIONS', '20'))
+
+# Cache of transcripts/descriptions of forwarded media, keyed by content hash (and a
+# perceptual hash for images, matched within MEDIA_CACHE_PHASH_MAX_DISTANCE bits of 64).
+MEDIA_CACHE_MAX_ENTRIES = int(os.environ.get('MEDIA_CACHE_MAX_ENTRIES', '2000'))
+MEDIA_CACHE_TTL_SECONDS = float(os.environ.get('MEDIA_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+MEDIA_CACHE_PHASH_MAX_DISTANCE = int(os.environ.get('MEDIA_CACHE_PHASH_MAX_DISTANCE', '4'))
+
+# Photos are downscaled, stripped of EXIF and re-encoded before they are sent to Gemini vision.
+IMAGE_PREP_ENABLED = os.environ.get('IMAGE_PREP_ENABLED', 'true').lower() == 'true'
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', '1024'))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '80'))
+IMAGE_PREP_WORKERS = int(os.environ.get('IMAGE_PREP_WORKERS', '2'))
+
+# Pass photos and voice notes to the root agent as media parts in a single model turn,
+# instead of first turning them into text with a separate describe/transcribe call.
+MULTIMODAL_AGENT_INPUT = os.environ.get('MULTIMODAL_AGENT_INPUT', 'false').lower() == 'true'
+
+# Admission control: at most AGENT_MAX_IN_FLIGHT agent runs at once, AGENT_MAX_QUEUE more
+# waiting up to AGENT_QUEUE_TIMEOUT_SECONDS each; beyond that requests get a fast "busy" reply.
+# The queue wait stays below Twilio's ~15s webhook timeout, so a synchronous /sms reply is
+# not sent after Twilio gave up waiting. An admitted run is cancelled after
+# AGENT_RUN_TIMEOUT_SECONDS (0: no limit) and answered with the "busy" reply as well.
+AGENT_MAX_IN_FLIGHT = int(os.environ.get('AGENT_MAX_IN_FLIGHT', '32'))
+AGENT_MAX_QUEUE = int(os.environ.get('AGENT_MAX_QUEUE', '128'))
+AGENT_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('AGENT_QUEUE_TIMEOUT_SECONDS', '10'))
+AGENT_RUN_TIMEOUT_SECONDS = float(os.environ.get('AGENT_RUN_TIMEOUT_SECONDS', '90'))
+AGENT_RETRY_AFTER_SECONDS = int(os.environ.get('AGENT_RETRY_AFTER_SECONDS', '15'))
+AGENT_BUSY_MESSAGE = "We're receiving a lot of questions right now. Please send your message again in a few minutes."
+
+# Startup warm-up of the BigQuery schema, RAG corpus names, the lazily loaded sub-agents and their
+# Gemini clients, the Text-to-Speech and Storage clients, the runner and the session pool.
+# GET /ready answers 503 until every warmer finished or WARMUP_BUDGET_SECONDS passed (0: ready at once,
+# warming continues in the background). WARMUP_SKIP lists warmers to leave out, e.g. "bigquery_schema".
+WARMUP_BUDGET_SECONDS = float(os.environ.get('WARMUP_BUDGET_SECONDS', '20'))
+WARMUP_SKIP = {name.strip() for name in os.environ.get('WARMUP_SKIP', '').split(',') if name.strip()}
+
+# Span export for the agent tree and external API calls: 'jsonl', 'otlp' or 'none'.
+# Inspect a JSONL file with `python tracing.py traces.jsonl`.
+TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'none').lower()
+TRACING_JSONL_PATH = os.environ.get('TRACING_JSONL_PATH', './traces.jsonl')
+TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT')  # e.g. http://localhost:4318/v1/traces
+
+# Structured logging: JSON lines (or 'text' locally) written by a background thread.
+# LOG_LEVELS overrides the level per logger, e.g. "web=DEBUG,session_manager=WARNING";
+# full transcripts, answers and SQL are logged at DEBUG and truncated to LOG_MAX_MESSAGE_CHARS.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.environ.get('LOG_LEVELS', 'google_adk=WARNING,httpx=WARNING')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()  # 'json' or 'text'
+LOG_MAX_MESSAGE_CHARS = int(os.environ.get('LOG_MAX_MESSAGE_CHARS', '2000'))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+# Record/replay of the Gemini, BigQuery, Vertex RAG and third-party API calls (see cassette.py).
+# 'record' saves every call to CASSETTE_PATH; 'replay' answers from it without network access,
+# waiting CASSETTE_LATENCY_SCALE times the recorded latency; 'auto' records only what is missing.
+CASSETTE_PATH = os.environ.get('CASSETTE_PATH')  # unset disables record/replay
+CASSETTE_MODE = os.environ.get('CASSETTE_MODE', 'replay').lower()
+CASSETTE_LATENCY_SCALE = float(os.environ.get('CASSETTE_LATENCY_SCALE', '1'))
+
+
+setup_logging(
+    LOG_LEVEL,
+    module_levels=parse_levels(LOG_LEVELS),
+    fmt=LOG_FORMAT,
+    max_message_chars=LOG_MAX_MESSAGE_CHARS,
+    queue_size=LOG_QUEUE_SIZE,
+)
+logger = logging.getLogger(__name__)
+
+
+tracer_provider = setup_tracing(TRACING_EXPORTER, path=TRACING_JSONL_PATH, otlp_endpoint=TRACING_OTLP_ENDPOINT)
+
+cassette = None
+if CASSETTE_PATH:
+    # cassette.py is a test tool next to the agrimitra package; deployments without it run fine.
+    from cassette import Cassette
+    cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE).install()
 
 # Initialize Twilio Request Validator
 # This validator is crucial for verifying that incoming requests genuinely originate from Twilio.
 if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
     validator = RequestValidator(TWILIO_AUTH_TOKEN)
 else:
-    print("CRITICAL WARNING: TWILIO_ACCOUNT_SID or TWILIO_AUTH_TOKEN not set. Twilio webhook validation will be skipped.")
+    logger.warning("TWILIO_ACCOUNT_SID or TWILIO_AUTH_TOKEN not set. Twilio webhook validation will be skipped.")
     validator = None # Disable validation if credentials are missing
 
-# Initialize Google Cloud Speech-to-Text client
-speech_client = speech.SpeechClient()
+def create_speech_client():
+    from google.cloud import speech_v1p1beta1 as speech # Use v1p1beta1 for better features if needed, or v1
+
+    return speech.SpeechClient()
+
+
+# Google Cloud clients are built on first use (or by the startup warm-up), not at import.
+# Speech-to-Text client
+speech_client = LazyClient(create_speech_client)
 
 # Text-to-Speech client for generating audio responses
-tts_client = texttospeech.TextToSpeechClient()
-storage_client = storage.Client()
+tts_client = LazyClient(texttospeech.TextToSpeechClient)
+storage_client = LazyClient(storage.Client)
+
+# vertexai's GenerativeModel for the media models; importing vertexai takes over a second,
+# so it is imported by the first transcription or image description.
+GenerativeModel = None
+
 
+def media_model(model_name: str):
+    """Returns a Gemini model for transcribing audio or describing images."""
+    global GenerativeModel
+    if GenerativeModel is None:
+        init_vertexai()
+        from vertexai.generative_models import GenerativeModel
+    return GenerativeModel(model_name)
 
-# session_service = VertexAiSessionService(project=GOOGLE_CLOUD_PROJECT, location=GOOGLE_CLOUD_LOCATION)
 
-session_service = InMemorySessionService()  # Use in-memory sessions for simplicity
-user_adk_sessions = {}
+def media_request_part(content: bytes, mime_type: str):
+    """Wraps downloaded media as a vertexai Part for the media models."""
+    from vertexai.generative_models import Part
+
+    return Part.from_data(data=content, mime_type=mime_type)
+
+
+def create_session_service():
+    """Builds the session service selected by SESSION_BACKEND."""
+    if SESSION_BACKEND == "database":
+        engine_kwargs = {"pool_pre_ping": True}
+        if not SESSION_DB_URL.startswith("sqlite"):
+            engine_kwargs.update(pool_size=SESSION_DB_POOL_SIZE, max_overflow=SESSION_DB_MAX_OVERFLOW)
+        logger.info("Using database session backend: %s", SESSION_DB_URL.split('@')[-1])
+        return DatabaseSessionService(db_url=SESSION_DB_URL, **engine_kwargs)
+    if SESSION_BACKEND == "vertex":
+        logger.info("Using Vertex AI session backend")
+        return VertexAiSessionService(
+            project=GOOGLE_CLOUD_PROJECT,
+            location=GOOGLE_CLOUD_LOCATION,
+            agent_engine_id=SESSION_VERTEX_AGENT_ENGINE_ID,
+        )
+    return InMemorySessionService()  # Use in-memory sessions for simplicity
+
+
+session_service = create_session_service()
+session_compaction = compaction_config(
+    token_threshold=SESSION_COMPACTION_TOKEN_THRESHOLD,
+    keep_turns=SESSION_COMPACTION_KEEP_TURNS,
+    model=SESSION_COMPACTION_MODEL,
+)
+session_manager = SessionManager(
+    session_service,
+    app_name="agrimitra",
+    idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+    max_sessions=SESSION_MAX_COUNT,
+    max_total_events=SESSION_MAX_EVENTS,
+    max_total_bytes=SESSION_MAX_BYTES,
+    archive_dir=SESSION_ARCHIVE_DIR,
+    shared_store=SESSION_BACKEND != "memory",
+    mapping_ttl_seconds=SESSION_MAPPING_CACHE_TTL_SECONDS,
+)
+sender_lock = DatabaseSenderLock(
+    session_service.db_engine,
+    ttl_seconds=SMS_SENDER_LOCK_TTL_SECONDS,
+    wait_seconds=SMS_SENDER_LOCK_WAIT_SECONDS,
+) if SESSION_BACKEND == "database" else None
+user_adk_sessions = session_manager.sessions  # sender -> session id, least recently used first
+# Pre-created sessions for stateless API queries; returned sessions are reset before reuse
+query_session_pool = EphemeralSessionPool(
+    session_service, app_name="agrimitra", user_id="api_user", size=QUERY_SESSION_POOL_SIZE
+)
+
+# --- Runner Registry ---
+# A Runner holds no per-request state (conversation state lives in the session
+# service), so one instance per app is built at startup and shared by all requests
+# instead of being rebuilt from the whole agent tree on every call.
+runners = {}
+
+def get_runner(app_name: str = "agrimitra") -> Runner:
+    """Returns the shared Runner for `app_name`, building it on first use."""
+    runner = runners.get(app_name)
+    if runner is None:
+        app_config = App(name=app_name, root_agent=root_agent, events_compaction_config=session_compaction)
+        runner = Runner(app=app_config, session_service=session_service)
+        runners[app_name] = runner
+    return runner
+
+agent_admission = AdmissionController(
+    max_in_flight=AGENT_MAX_IN_FLIGHT,
+    max_queue=AGENT_MAX_QUEUE,
+    queue_timeout_seconds=AGENT_QUEUE_TIMEOUT_SECONDS,
+    retry_after_seconds=AGENT_RETRY_AFTER_SECONDS,
+    run_timeout_seconds=AGENT_RUN_TIMEOUT_SECONDS or None,
+)
+
+
+def busy_exception(rejection: AdmissionRejected) -> HTTPException:
+    """The 503 returned by the JSON endpoints when an agent run is shed."""
+    return HTTPException(
+        status_code=503,
+        detail=AGENT_BUSY_MESSAGE,
+        headers={"Retry-After": str(int(rejection.retry_after_seconds))},
+    )
+
+
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES, default_ttl_seconds=ANSWER_CACHE_DEFAULT_TTL_SECONDS
+)
+
+semantic_cache = None
+if SEMANTIC_CACHE_MODE in ("shadow", "on"):
+    semantic_cache = SemanticCache(
+        capacity=SEMANTIC_CACHE_CAPACITY,
+        dim=SEMANTIC_CACHE_DIM,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        shadow=SEMANTIC_CACHE_MODE == "shadow",
+    )
+
+
+def semantic_lookup(text: str, channel: str) -> Optional[str]:
+    """Returns a semantically cached answer to serve, or None (always None in shadow mode)."""
+    if semantic_cache is None:
+        return None
+    hit = semantic_cache.lookup(text)
+    if hit is None:
+        return None
+    logger.info(
+        "Semantic cache %shit on %s (similarity %.3f) for: %r",
+        "shadow " if semantic_cache.shadow else "", channel, hit.similarity, hit.provenance["question"],
+    )
+    return None if semantic_cache.shadow else hit.answer
+
+
+def semantic_store(text: str, answer: str, channel: str, agents_used: set, latency_seconds: float):
+    """Stores a fresh agent answer in the semantic cache."""
+    if semantic_cache is None or "An error occurred" in answer:
+        return
+    semantic_cache.put(
+        text,
+        answer,
+        ttl_seconds=answer_cache.ttl_for(agents_used),
+        channel=channel,
+        agents=agents_used,
+        latency_seconds=latency_seconds,
+    )
 
 # --- Pydantic Model for /query endpoint ---
 class QueryInput(BaseModel):
     """Defines the expected request body for the /query endpoint."""
     input: str
 
+
+class BatchQueryInput(BaseModel):
+    """Defines the expected request body for the /query/batch endpoint."""
+    inputs: list[str]
+    concurrency: Optional[int] = None  # Capped at BATCH_QUERY_CONCURRENCY
+
 async def process_agent_response(event):
     """Process and extract the final text response from agent events."""
     # print(f"Event ID: {event.id}, Author: {event.author}") # For debugging agent events
@@ -88,191 +411,347 @@ async def process_agent_response(event):
                     final_response += part.text.strip() + " "
     return final_response.strip()
 
-async def call_agent_async(runner, user_id, session_id, query):
-    """Call the agent asynchronously with the user's query and return the final response."""
-    content = types.Content(role="user", parts=[types.Part(text=query)])
+async def call_agent_async(runner, user_id, session_id, query, agents_used=None, channel="other"):
+    """
+    Call the agent asynchronously with the user's query and return the final response.
+    `query` is either text or a list of types.Part (text and media).
+    If `agents_used` is a set, the names of the sub-agents/tools called during the run are added to it.
+    `channel` labels the latency metrics of the run.
+    """
+    parts = [types.Part(text=query)] if isinstance(query, str) else list(query)
+    content = types.Content(role="user", parts=parts)
     final_response_text = ""
+    observer = AgentRunObserver(channel)
 
-    try:
-        async for event in runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
-        ):
-            response_part = await process_agent_response(event)
-            if response_part:
-                final_response_text += response_part + " " # Accumulate parts if agent sends multiple final_response events
-    except Exception as e:
-        print(f"ERROR during agent run for user {user_id}, session {session_id}: {e}")
-        final_response_text = f"An error occurred while processing your request. Please try again later. Error: {str(e)}"
+    with StageTimer(channel, "agent_run") as timer:
+        try:
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=content
+            ):
+                observer.observe(event)
+                if agents_used is not None:
+                    agents_used.update(call.name for call in event.get_function_calls())
+                response_part = await process_agent_response(event)
+                if response_part:
+                    final_response_text += response_part + " " # Accumulate parts if agent sends multiple final_response events
+            observer.finish()
+            logger.debug(
+                "Agent run for session %s sent %d prompt tokens (%d in its last model call)",
+                session_id, observer.prompt_tokens, observer.last_prompt_tokens,
+            )
+        except Exception as e:
+            observer.finish(error=e)
+            timer.outcome = "error"
+            logger.exception("Agent run failed for user %s, session %s", user_id, session_id)
+            final_response_text = f"An error occurred while processing your request. Please try again later. Error: {str(e)}"
 
     return final_response_text.strip()
 
-async def transcribe_audio_with_gemini(audio_url: str, mime_type: str) -> str:
+@tracer.start_as_current_span("gemini.transcribe_audio")
+async def transcribe_audio_with_gemini(audio_content: bytes, mime_type: str) -> str:
     """
-    Downloads an audio file and transcribes it using the Vertex AI Gemini 1.5 Pro model.
+    Transcribes downloaded audio using the Vertex AI Gemini 1.5 Pro model.
     """
-    print(f"Attempting to transcribe audio from: {audio_url} with mime_type: {mime_type}")
+    logger.debug("Transcribing %d bytes of %s audio with Gemini", len(audio_content), mime_type)
     try:
-        # 1. Download audio with authentication
-        response = requests.get(audio_url, auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN))
-        response.raise_for_status()
-        audio_content = response.content
-
-        # 2. Prepare for Vertex AI Gemini
-        audio_part = Part.from_data(data=audio_content, mime_type=mime_type)
-        model = GenerativeModel(GOOGLE_MODEL_FOR_AUDIO) # Using a powerful multimodal model
+        # 1. Prepare for Vertex AI Gemini
+        audio_part = media_request_part(audio_content, mime_type)
+        model = media_model(GOOGLE_MODEL_FOR_AUDIO) # Using a powerful multimodal model
 
-        # 3. Perform transcription
-        print("Transcribing with Vertex AI Gemini...")
+        # 2. Perform transcription
         transcription_response = await model.generate_content_async([audio_part, "Transcribe this audio."])
 
         transcribed_text = transcription_response.text.strip()
-        print(f"Transcribed text: '{transcribed_text}'")
+        logger.debug("Transcribed text: %r", transcribed_text)
         return transcribed_text
 
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error downloading audio from {audio_url}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to download audio for transcription.")
-    except Exception as e:
-        print(f"Error during audio transcription with Gemini: {e}")
+    except Exception:
+        logger.exception("Audio transcription with Gemini failed")
         raise HTTPException(status_code=500, detail="Failed to transcribe audio.")
 
+TTS_LANGUAGE_CODE = "en-US"
+TTS_VOICE_GENDER = texttospeech.SsmlVoiceGender.NEUTRAL
+
+
+@tracer.start_as_current_span("tts.synthesize")
+def synthesize_ogg_opus(text: str) -> bytes:
+    """
+    Synthesizes text to OGG/Opus audio. This format is required for WhatsApp to
+    render it as a playable voice note. Blocking; run it in a worker thread.
+    """
+    synthesis_input = texttospeech.SynthesisInput(text=text)
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=TTS_LANGUAGE_CODE, ssml_gender=TTS_VOICE_GENDER
+    )
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.OGG_OPUS
+    )
+    tts_response = tts_client.synthesize_speech(
+        input=synthesis_input, voice=voice, audio_config=audio_config
+    )
+    return tts_response.audio_content
+
+
+tts_cache = TTSAudioCache(
+    synthesize_ogg_opus,
+    LazyClient(lambda: storage_client.bucket(GCS_BUCKET_NAME)),
+    voice=f"{TTS_LANGUAGE_CODE}/{TTS_VOICE_GENDER.name}/OGG_OPUS",
+    max_entries=TTS_CACHE_MAX_ENTRIES,
+    disk_dir=TTS_CACHE_DIR or None,
+    disk_max_bytes=TTS_CACHE_DISK_MAX_BYTES,
+)
+
+
 async def text_to_speech_and_upload(text: str) -> str:
     """
-    Converts text to an OGG/Opus audio file, uploads it to GCS, and returns the public URL.
-    This format is required for WhatsApp to render it as a playable voice note.
+    Converts text to an OGG/Opus audio file in GCS and returns its public URL.
+    Identical texts resolve to the same cached blob without being synthesized again.
     """
     try:
-        print(f"Generating OGG/Opus audio for text: '{text[:50]}...'")
-        # 1. Synthesize Speech
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US", ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
-        )
-        # UPDATED: Changed audio encoding to OGG_OPUS for native playback in WhatsApp
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.OGG_OPUS
-        )
-        tts_response = tts_client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
-
-        # 2. Upload to Google Cloud Storage
-        bucket = storage_client.bucket(GCS_BUCKET_NAME)
-        # UPDATED: Changed file extension and content type to .ogg
-        blob_name = f"audio-responses/{uuid.uuid4()}.ogg"
-        blob = bucket.blob(blob_name)
-        
-        print(f"Uploading audio to GCS bucket '{GCS_BUCKET_NAME}' as '{blob_name}'")
-        blob.upload_from_string(tts_response.audio_content, content_type="audio/ogg")
-        
-        print("Audio uploaded successfully.")
-        return blob.public_url
-        
-    except Exception as e:
-        print(f"Error during Text-to-Speech or GCS upload: {e}")
+        with StageTimer("sms", "tts"):
+            return await tts_cache.get_url(text)
+    except Exception:
+        logger.exception("Text-to-Speech or GCS upload failed")
         raise  # Re-raise the exception to be handled by the caller
 
-async def describe_image_with_gemini(image_url: str, mime_type: str) -> str:
+image_preprocessor = None
+if IMAGE_PREP_ENABLED:
+    image_preprocessor = ImagePreprocessor(
+        max_dimension=IMAGE_MAX_DIMENSION, quality=IMAGE_JPEG_QUALITY, workers=IMAGE_PREP_WORKERS
+    )
+
+
+@tracer.start_as_current_span("gemini.describe_image")
+async def describe_image_with_gemini(image_content: bytes, mime_type: str) -> str:
     """
-    Downloads an image file and generates a description using the Vertex AI Gemini 1.5 Pro model.
+    Generates a description of a downloaded image using the Vertex AI Gemini 1.5 Pro model.
+    The image is downscaled and re-encoded first unless IMAGE_PREP_ENABLED is false.
     """
-    print(f"Attempting to describe image from: {image_url} with mime_type: {mime_type}")
+    if image_preprocessor is not None:
+        image_content, mime_type = await image_preprocessor.prepare(image_content, mime_type)
+    logger.debug("Describing %d bytes of %s image with Gemini", len(image_content), mime_type)
     try:
-        response = requests.get(image_url, auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN))
-        response.raise_for_status()
-        image_content = response.content
-
-        image_part = Part.from_data(data=image_content, mime_type=mime_type)
-        model = GenerativeModel(GOOGLE_MODEL_FOR_IMAGE)
+        image_part = media_request_part(image_content, mime_type)
+        model = media_model(GOOGLE_MODEL_FOR_IMAGE)
 
-        print("Describing image with Vertex AI Gemini...")
         prompt = """Analyze the following image from an agricultural perspective. Describe what you see in detail. If it's a plant, identify it if possible and comment on its apparent health, noting any visible signs of disease, pests, or nutrient deficiencies. If it's a picture of soil or a field, describe that. Provide a detailed textual description that can be used by an agricultural assistant to provide advice."""
         description_response = await model.generate_content_async([image_part, prompt])
 
         description_text = description_response.text.strip()
-        print(f"Image description: '{description_text}'")
+        logger.debug("Image description: %r", description_text)
         return description_text
 
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error downloading image from {image_url}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to download image for analysis.")
-    except Exception as e:
-        print(f"Error during image description with Gemini: {e}")
+    except Exception:
+        logger.exception("Image description with Gemini failed")
         raise HTTPException(status_code=500, detail="Failed to analyze image.")
 
 
+async def media_part(content: bytes, mime_type: str) -> types.Part:
+    """Wraps downloaded media as a Part for the root agent (photos are preprocessed first)."""
+    if mime_type.startswith("image/") and image_preprocessor is not None:
+        content, mime_type = await image_preprocessor.prepare(content, mime_type)
+    return types.Part.from_bytes(data=content, mime_type=mime_type)
 
-# --- Twilio Webhook Endpoint ---
-@app.post("/sms")
-async def twilio_webhook(request: Request):
+
+media_derivation_cache = DerivationCache(
+    max_entries=MEDIA_CACHE_MAX_ENTRIES,
+    ttl_seconds=MEDIA_CACHE_TTL_SECONDS,
+    phash_max_distance=MEDIA_CACHE_PHASH_MAX_DISTANCE,
+)
+
+# Pooled, size-capped downloads of Twilio media; all attachments of a message are handled concurrently.
+# In multimodal mode attachments become media parts; otherwise they are turned into (cached) text.
+media_ingestor = MediaIngestor(
+    {"audio": media_part, "image": media_part} if MULTIMODAL_AGENT_INPUT else {
+        "audio": media_derivation_cache.wrap("audio", transcribe_audio_with_gemini),
+        "image": media_derivation_cache.wrap("image", describe_image_with_gemini),
+    },
+    auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID else None,
+    max_bytes=MEDIA_MAX_BYTES,
+    timeout_seconds=MEDIA_DOWNLOAD_TIMEOUT_SECONDS,
+    max_connections=MEDIA_MAX_CONNECTIONS,
+)
+
+
+# Metric stage names for turning an attachment into agent input.
+MEDIA_ANALYSIS_STAGES = {"audio": "transcription", "image": "image_description"}
+
+
+def observe_media_stages(attachments: list):
+    """Records download and analysis latency of each attachment."""
+    for attachment in attachments:
+        if not attachment.download_seconds:
+            continue  # skipped before download (unsupported type)
+        downloaded = attachment.size_bytes or not attachment.error
+        observe_stage("sms", "media_download", attachment.download_seconds, "ok" if downloaded else "error")
+        if downloaded:
+            stage = "media_part" if MULTIMODAL_AGENT_INPUT else MEDIA_ANALYSIS_STAGES.get(attachment.kind, "media_analysis")
+            observe_stage("sms", stage, attachment.analysis_seconds, "error" if attachment.error else "ok")
+
+
+# Instructions placed before media parts in multimodal mode.
+MEDIA_PART_HINTS = {
+    "audio": "The farmer sent this voice note. Answer the question asked in it, in the language it is spoken in.",
+    "image": "The farmer sent this photo. Analyze it from an agricultural perspective (crop, health, pests, deficiencies).",
+}
+
+
+def merge_message_input(body: str, attachments: list):
     """
-    Handles incoming Twilio messages, transcribes audio, invokes the agent,
-    and replies with text or a generated playable audio file.
+    Combines the message text with its attachments. Returns text, or a list of
+    types.Part when attachments were passed through as media parts.
     """
-    form_data = await request.form()
-    sender_number = form_data.get('From', '').strip()
-    is_audio_input = False
-    
-    # --- Input Processing ---
-    agent_input_text = form_data.get('Body', '').strip()
-    media_url = form_data.get('MediaUrl0', '').strip()
-    media_content_type = form_data.get('MediaContentType0', '').strip()
-    
-    if media_url:
-        if media_content_type.startswith('audio/'):
-            is_audio_input = True
-            try:
-                agent_input_text = await transcribe_audio_with_gemini(media_url, media_content_type)
-                if not agent_input_text:
-                    agent_input_text = "(No speech detected in audio)"
-            except HTTPException as e:
-                resp = MessagingResponse()
-                resp.message(f"Sorry, I had trouble processing your audio: {e.detail}")
-                return Response(content=str(resp), media_type="text/xml")
+    parts = [body] if body else []
+    for attachment in attachments:
+        if attachment.error:
+            parts.append(f"(Attachment {attachment.index + 1} could not be processed)")
+        elif attachment.part is not None:
+            parts.extend([MEDIA_PART_HINTS.get(attachment.kind, "The farmer sent this file."), attachment.part])
+        elif attachment.kind == "audio":
+            parts.append(attachment.text or "(No speech detected in audio)")
         else:
-            agent_input_text = await describe_image_with_gemini(media_url, media_content_type)
-            if not agent_input_text:
-                agent_input_text = "(Could not describe the image)"
+            parts.append(attachment.text or "(Could not describe the image)")
+    if all(isinstance(part, str) for part in parts):
+        return "\n\n".join(parts)
+    return [types.Part(text=part) if isinstance(part, str) else part for part in parts]
+
+
+def merge_agent_inputs(items: list):
+    """Merges the inputs of a coalesced burst; text stays text, anything with media becomes a Part list."""
+    if all(isinstance(item, str) for item in items):
+        return "\n".join(items)
+    parts = []
+    for item in items:
+        parts.extend([types.Part(text=item)] if isinstance(item, str) else item)
+    return parts
+
+
+def agent_input_text(agent_input) -> str:
+    """Returns the text of an agent input (text or a list of Parts), without the media."""
+    if isinstance(agent_input, str):
+        return agent_input
+    return "\n".join(part.text for part in agent_input if part.text)
+
+
+
+# --- Twilio Webhook Endpoint ---
+def twiml_response(messages: list) -> Response:
+    """Renders a list of ReplyMessages as a TwiML response."""
+    resp = MessagingResponse()
+    for reply in messages:
+        message = resp.message(reply.body or "")
+        if reply.media_url:
+            message.media(reply.media_url)
+    return Response(content=str(resp), media_type="text/xml")
 
-    if not agent_input_text:
-        resp = MessagingResponse().message("Please send a text or voice message.")
-        return Response(content=str(resp), media_type="text/xml")
 
+@tracer.start_as_current_span("sms.agent_turn")
+async def run_sms_turn(sender_number: str, agent_input) -> str:
+    """
+    Runs one agent turn in the sender's session and returns the reply text.
+    Called by the coalescer with the merged input (text or Parts) of all messages in the turn.
+    """
     # --- Session Management ---
-    current_session_id = user_adk_sessions.get(sender_number)
-    
     # -----Delete old sessions if they ask with create-new-session-----
-    if agent_input_text.lower() == "create new session":
-        if current_session_id:
-            try:
-                await session_service.delete_session(current_session_id)
-                print(f"Deleted old session for {sender_number}: {current_session_id}")
-            except Exception as e:
-                print(f"ERROR deleting old session: {e}")
-        current_session_id = None
-        user_adk_sessions[sender_number] = None
-    
-    # --- Create a new session if none exists ---
-    if not current_session_id:
+    if "create new session" in [line.strip().lower() for line in agent_input_text(agent_input).splitlines()]:
+        await session_manager.reset_session(sender_number)
+
+    # --- Reuse, rehydrate or create the sender's session ---
+    try:
+        current_session_id = await session_manager.get_or_create_session(sender_number)
+    except Exception:
+        logger.exception("Failed to create ADK session for %s", sender_number)
+        return "Sorry, I couldn't start a new conversation right now."
+
+    # Only the first turn of a session is answered from (and stored in) the semantic
+    # cache; later turns depend on the conversation so far. A cached answer is written
+    # into the session like an agent turn, so the farmer's follow-up has its context.
+    # Inputs carrying media are never cached.
+    first_turn = session_manager.is_fresh(sender_number) and isinstance(agent_input, str)
+    try:
+        if first_turn:
+            cached_answer = semantic_lookup(agent_input, "sms")
+            if cached_answer is not None:
+                try:
+                    await session_manager.append_turn(sender_number, agent_input, cached_answer, root_agent.name)
+                    return cached_answer
+                except Exception:
+                    logger.exception("Failed to record the cached turn for %s; running the agent instead", sender_number)
+        agents_used = set()
+        started = time.monotonic()
         try:
-            session_name = f"/projects/{GOOGLE_CLOUD_PROJECT}/locations/{GOOGLE_CLOUD_LOCATION}/sessions/{uuid.uuid4()} "
-            new_session = await session_service.create_session(app_name="agrimitra", user_id=sender_number)
-            current_session_id = new_session.id
-            user_adk_sessions[sender_number] = current_session_id
-            print(f"Created new ADK session for {sender_number}: {current_session_id}")
-        except Exception as e:
-            print(f"ERROR creating ADK session: {e}")
-            resp = MessagingResponse().message("Sorry, I couldn't start a new conversation right now.")
-            return Response(content=str(resp), media_type="text/xml")
-
-    # --- Invoke Agent ---
-    runner = Runner(agent=root_agent, app_name="agrimitra", session_service=session_service)
-    agent_response_text = await call_agent_async(
-        runner, sender_number, current_session_id, agent_input_text
-    )
+            async with agent_admission.slot():
+                agent_response_text = await call_agent_async(
+                    get_runner(), sender_number, current_session_id, agent_input,
+                    agents_used=agents_used, channel="sms",
+                )
+        except AdmissionRejected as e:
+            logger.warning("Shedding agent run for %s: %s", sender_number, e)
+            return AGENT_BUSY_MESSAGE
+        if first_turn:
+            semantic_store(
+                agent_input, agent_response_text, "sms", agents_used, time.monotonic() - started
+            )
+        return agent_response_text
+    finally:
+        await session_manager.record_turn(sender_number)
+
+
+async def run_serialized_sms_turn(sender_number: str, agent_input) -> str:
+    """Runs run_sms_turn while holding the sender's lease, so no other process runs a turn in their session."""
+    if sender_lock is None:
+        return await run_sms_turn(sender_number, agent_input)
+    try:
+        async with sender_lock.hold(sender_number):
+            return await run_sms_turn(sender_number, agent_input)
+    except SenderLockTimeout as e:
+        logger.warning("Shedding turn for %s: %s", sender_number, e)
+        return AGENT_BUSY_MESSAGE
+
+
+sms_coalescer = SenderCoalescer(
+    run_serialized_sms_turn,
+    merge=merge_agent_inputs,
+    debounce_seconds=SMS_DEBOUNCE_SECONDS,
+    max_wait_seconds=SMS_MAX_DEBOUNCE_SECONDS,
+)
+
+
+@tracer.start_as_current_span("sms.handle_message")
+async def handle_incoming_message(form_data: dict) -> list:
+    """
+    Processes an incoming Twilio message: transcribes audio, describes images,
+    invokes the agent, and returns the ReplyMessages to send back to the sender.
+    """
+    sender_number = form_data.get('From', '').strip()
+
+    # Shed load before spending time on media when no agent run could be admitted anyway.
+    try:
+        agent_admission.check()
+    except AdmissionRejected as e:
+        logger.warning("Shedding message from %s: %s", sender_number, e)
+        return [ReplyMessage(AGENT_BUSY_MESSAGE)]
+
+    # --- Input Processing (all attachments downloaded and analysed concurrently) ---
+    body = form_data.get('Body', '').strip()
+    attachments = await media_ingestor.ingest(form_data)
+    observe_media_stages(attachments)
+    is_audio_input = any(attachment.kind == "audio" for attachment in attachments)
+    if attachments and not body and all(attachment.error for attachment in attachments):
+        return [ReplyMessage("Sorry, I had trouble processing your media. Please try sending it again.")]
+    agent_input = merge_message_input(body, attachments)
+
+    if not agent_input:
+        return [ReplyMessage("Please send a text or voice message.")]
+
+    # --- Invoke Agent (serialized per sender, bursts merged into one turn) ---
+    agent_response_text = await sms_coalescer.submit(sender_number, agent_input)
+    if agent_response_text is None:
+        # This message was merged into a turn answered through a later message.
+        logger.info("Message from %s merged into a pending turn.", sender_number)
+        return []
 
     # --- Create Response (Text or Audio) ---
-    resp = MessagingResponse()
     if is_audio_input:
         try:
             # If input was audio, respond with a playable voice note and the text transcript.
@@ -281,67 +760,447 @@ async def twilio_webhook(request: Request):
             # UPDATED: Send the audio file in one message and the text in a second message.
             # This ensures the audio is rendered as a playable voice note.
             # Note: Twilio sends these as two separate, sequential messages.
-            # resp.message().media(audio_response_url)
+            # return [ReplyMessage(media_url=audio_response_url), ReplyMessage(agent_response_text)]
             # print(f"Audio response URL: {audio_response_url} sent successfully.")
             # print(f"Sending as text message due to time.")
-            resp.message(agent_response_text)
+            return [ReplyMessage(agent_response_text)]
 
-        except Exception as e:
+        except Exception:
             # Fallback to text if TTS fails
-            print(f"CRITICAL: TTS process failed. Falling back to text-only response. Error: {e}")
-            resp.message(agent_response_text)
+            logger.exception("TTS failed, falling back to a text-only response")
+            return [ReplyMessage(agent_response_text)]
     else:
         # If input was text, respond with text
-        print(f"Text response: {agent_response_text}. Sending as text message.")
-        resp.message(agent_response_text)
-        print("Text response sent successfully.")
+        logger.debug("Text response: %s", agent_response_text)
+        return [ReplyMessage(agent_response_text)]
 
-    return Response(content=str(resp), media_type="text/xml")
+
+# --- Startup Warm-up ---
+def warm_bigquery_schema() -> int:
+    """Runs the schema introspection the data-science agents would otherwise do for the first farmer."""
+    from agrimitra.sub_agents.data_science.data_science.sub_agents.bigquery.tools import get_database_settings
+
+    return len(get_database_settings()["bq_ddl_schema"])
+
+
+def warm_rag_corpora() -> int:
+    """Fills the corpus listing the RAG tools resolve corpus names from."""
+    from agrimitra.sub_agents.rag_agent.tools.utils import list_corpora_cached
+
+    return len(list_corpora_cached(refresh=True))
+
+
+async def warm_models() -> int:
+    # Walking the agent tree imports the lazily loaded sub-agents; that happens off the
+    # event loop first, so their models are shared as well.
+    await asyncio.to_thread(lambda: list(walk_agents(root_agent)))
+    return await warm_llm_clients(root_agent)
+
+
+def warm_gcp_clients() -> int:
+    """Builds the Text-to-Speech and Storage clients the voice replies use (unless replaced, e.g. by fakes)."""
+    clients = [client for client in (tts_client, storage_client) if isinstance(client, LazyClient)]
+    for client in clients:
+        client.get()
+    return len(clients)
+
+
+async def warm_runner() -> int:
+    get_runner()
+    return len(runners)
+
+
+async def warm_session_pool() -> int:
+    await query_session_pool.prefill()
+    return query_session_pool.stats()["ready"]
+
+
+startup_warmup = StartupWarmup(budget_seconds=WARMUP_BUDGET_SECONDS)
+startup_warmup.add("llm_clients", warm_models, enabled="llm_clients" not in WARMUP_SKIP)
+startup_warmup.add("bigquery_schema", warm_bigquery_schema, enabled="bigquery_schema" not in WARMUP_SKIP)
+startup_warmup.add("rag_corpora", warm_rag_corpora, enabled="rag_corpora" not in WARMUP_SKIP)
+startup_warmup.add("gcp_clients", warm_gcp_clients, enabled="gcp_clients" not in WARMUP_SKIP)
+startup_warmup.add("runner", warm_runner, enabled="runner" not in WARMUP_SKIP)
+startup_warmup.add("session_pool", warm_session_pool, enabled="session_pool" not in WARMUP_SKIP)
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """Warms caches and clients in the background; /ready reports the progress."""
+    startup_warmup.start()
+
+
+# Long-running background tasks started on startup (kept referenced so they are not garbage collected).
+background_tasks = set()
+
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    """Starts the background task that evicts idle sessions."""
+    task = asyncio.create_task(session_manager.run_sweeper(SESSION_SWEEP_INTERVAL_SECONDS))
+    background_tasks.add(task)
+
+
+# Created on startup when TWILIO_ASYNC_REPLY is enabled.
+reply_dispatcher = None
+
+
+@app.on_event("startup")
+async def start_reply_dispatcher():
+    """Starts the background delivery workers used by the asynchronous reply mode."""
+    global reply_dispatcher
+    if not TWILIO_ASYNC_REPLY:
+        return
+    if TWILIO_REPLY_TRANSPORT == "stub":
+        sender = LocalStubSender(TWILIO_REPLY_STUB_PATH)
+    else:
+        sender = TwilioRestSender(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    reply_dispatcher = ReplyDispatcher(
+        handle_incoming_message,
+        sender,
+        workers=TWILIO_REPLY_WORKERS,
+        queue_size=TWILIO_REPLY_QUEUE_SIZE,
+    )
+    reply_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_reply_dispatcher():
+    if reply_dispatcher is not None:
+        await reply_dispatcher.stop()
+
+
+@app.on_event("shutdown")
+async def close_media_client():
+    await media_ingestor.close()
+    if image_preprocessor is not None:
+        image_preprocessor.close()
+
+
+@app.on_event("shutdown")
+def flush_traces():
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
+
+@app.on_event("shutdown")
+def save_cassette():
+    if cassette is not None:
+        cassette.save()
+
+
+@app.post("/sms")
+async def twilio_webhook(request: Request):
+    """
+    Handles incoming Twilio messages, transcribes audio, invokes the agent,
+    and replies with text or a generated playable audio file.
+
+    In asynchronous reply mode the message is queued for a background worker and
+    Twilio gets an empty TwiML acknowledgement right away; the answer is delivered
+    later through the Twilio REST API.
+    """
+    with StageTimer("sms", "form_parse"):
+        form_data = dict(await request.form())
+
+    if reply_dispatcher is not None:
+        job = ReplyJob(
+            sender=form_data.get('From', '').strip(),
+            channel_number=form_data.get('To', '').strip(),
+            form_data=form_data,
+        )
+        if not reply_dispatcher.submit(job):
+            logger.warning("Reply queue full, rejecting message from %s", job.sender)
+            return twiml_response([ReplyMessage("We're receiving a lot of messages right now. Please try again in a few minutes.")])
+        return twiml_response([])
+
+    messages = await handle_incoming_message(form_data)
+    return twiml_response(messages)
 
 # --- General Query Endpoint (NEW) ---
-@app.exception_handler(RequestValidationError)
 @app.post("/query")
-async def handle_query(query: QueryInput):
+async def handle_query(query: QueryInput, request: Request, response: Response):
     """
     Handles a single, stateless query to the agent via a JSON API.
-    Creates a temporary session for each request.
+    Each request runs in an empty session checked out of the query session pool.
+
+    Answers are served from the exact-match answer cache when possible; send
+    `X-Cache-Bypass: true` (or `Cache-Control: no-cache`) to force a fresh run.
+    On an exact miss the semantic cache is consulted for a paraphrase of an
+    earlier question. The `X-Cache` response header reports HIT, SEMANTIC-HIT,
+    MISS or BYPASS.
     """
-    user_id = "api_user"  # A generic user ID for API requests
+    bypass_cache = (
+        request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes")
+        or "no-cache" in request.headers.get("cache-control", "").lower()
+    )
+    with StageTimer("api", "cache_lookup") as timer:
+        timer.outcome = "bypass" if bypass_cache else "miss"
+        cached_answer = None
+        if ANSWER_CACHE_ENABLED:
+            if bypass_cache:
+                answer_cache.record_bypass()
+            else:
+                cached_answer = answer_cache.get(query.input)
+                if cached_answer is not None:
+                    timer.outcome = "hit"
+        if cached_answer is None and not bypass_cache:
+            cached_answer = semantic_lookup(query.input, "api")
+            if cached_answer is not None:
+                timer.outcome = "semantic_hit"
+    if cached_answer is not None:
+        response.headers["X-Cache"] = "HIT" if timer.outcome == "hit" else "SEMANTIC-HIT"
+        return {"output": cached_answer}
+    try:
+        agent_admission.check()
+    except AdmissionRejected as e:
+        raise busy_exception(e)
+
+    user_id = query_session_pool.user_id  # A generic user ID for API requests
     session_id = None
+    finished = False
     try:
-        # Create a new, temporary session for each API call to ensure statelessness
-        new_session = await session_service.create_session(app_name="agrimitra", user_id=user_id)
-        session_id = new_session.id
-        print(f"Created temporary ADK session for API query: {session_id}")
+        # An empty pooled session for each API call keeps requests stateless
+        with StageTimer("api", "session_checkout"):
+            session_id = await query_session_pool.checkout()
+        logger.debug("Checked out pooled ADK session for API query: %s", session_id)
 
         # Invoke the agent with the user's input
-        runner = Runner(agent=root_agent, app_name="agrimitra", session_service=session_service)
-        agent_response_text = await call_agent_async(
-            runner, user_id, session_id, query.input
-        )
+        agents_used = set()
+        started = time.monotonic()
+        try:
+            async with agent_admission.slot():
+                agent_response_text = await call_agent_async(
+                    get_runner(), user_id, session_id, query.input, agents_used=agents_used, channel="api"
+                )
+        except AdmissionRejected as e:
+            # Queue rejections come before the run starts; a run cut off by its deadline
+            # may have left partial events in the session.
+            finished = e.reason != "run_deadline"
+            raise busy_exception(e)
+        finished = True
 
         # Check if the agent itself returned an error message
         if "An error occurred" in agent_response_text:
             raise HTTPException(status_code=500, detail=agent_response_text)
 
+        if ANSWER_CACHE_ENABLED:
+            answer_cache.put(query.input, agent_response_text, agents_used)
+            response.headers["X-Cache"] = "BYPASS" if bypass_cache else "MISS"
+        semantic_store(query.input, agent_response_text, "api", agents_used, time.monotonic() - started)
         return {"output": agent_response_text}
 
     except Exception as e:
-        print(f"Error in /query endpoint: {e}")
+        logger.error("Error in /query endpoint: %s", e)
         # Ensure we don't re-wrap FastAPI's own exceptions
         if isinstance(e, HTTPException):
             raise
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
     finally:
-        # Clean up the session after the request is complete
+        # Return the session to the pool; a cancelled run may still write to it, so it is discarded
         if session_id:
+            query_session_pool.checkin(session_id, discard=not finished)
+
+
+# --- Batch Query Endpoint ---
+@app.on_event("shutdown")
+async def close_query_session_pool():
+    await query_session_pool.close()
+
+
+@app.post("/query/batch")
+async def handle_query_batch(batch: BatchQueryInput):
+    """
+    Runs a list of stateless queries concurrently (bounded by a semaphore), each in
+    its own pooled ephemeral session. Results are returned in input order with a
+    per-item status and timing.
+    """
+    if len(batch.inputs) > BATCH_QUERY_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_QUERY_MAX_ITEMS} inputs.")
+
+    concurrency = max(1, min(batch.concurrency or BATCH_QUERY_CONCURRENCY, BATCH_QUERY_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, text: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
             try:
-                await session_service.delete_session(session_id)
-                print(f"Deleted temporary ADK session: {session_id}")
+                async with agent_admission.slot(), query_session_pool.session() as session_id:
+                    output = await call_agent_async(
+                        get_runner(), query_session_pool.user_id, session_id, text, channel="api_batch"
+                    )
+                status = "error" if "An error occurred" in output else "ok"
+            except AdmissionRejected:
+                output = AGENT_BUSY_MESSAGE
+                status = "rejected"
             except Exception as e:
-                # Log the error but don't fail the request if deletion fails
-                print(f"WARNING: Failed to delete temporary session {session_id}: {e}")
+                logger.exception("Error in /query/batch item %d", index)
+                output = f"An internal error occurred: {str(e)}"
+                status = "error"
+            return {
+                "index": index,
+                "status": status,
+                "output": output,
+                "elapsed_seconds": round(time.perf_counter() - start, 3),
+            }
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_item(i, text) for i, text in enumerate(batch.inputs)))
+    elapsed = time.perf_counter() - start
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    logger.info("Batch of %d queries finished in %.2fs with concurrency %d", len(results), elapsed, concurrency)
+
+    return {
+        "results": results,
+        "count": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "rejected": sum(1 for result in results if result["status"] == "rejected"),
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(len(results) / elapsed, 3) if elapsed > 0 else None,
+    }
+
+
+# --- Streaming Query Endpoint ---
+def sse_event(event: str, data: dict) -> str:
+    """Formats a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_agent_events(user_id: str, session_id: str, query_text: str):
+    """
+    Runs the agent with SSE streaming enabled and yields Server-Sent Events as the
+    run progresses. The pooled session is returned once the stream ends.
+    """
+    content = types.Content(role="user", parts=[types.Part(text=query_text)])
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+    final_response_text = ""
+    observer = AgentRunObserver("api_stream")
+    started = time.perf_counter()
+    outcome = "ok"
+
+    try:
+        async with agent_admission.slot(limit_run=False):
+            async for event in agent_admission.limit_events(get_runner().run_async(
+                user_id=user_id, session_id=session_id, new_message=content, run_config=run_config
+            )):
+                observer.observe(event)
+                # Sub-agents are invoked as tools, so calls and responses show their progress.
+                for call in event.get_function_calls():
+                    yield sse_event("progress", {"agent": event.author, "tool": call.name, "status": "started"})
+                for response in event.get_function_responses():
+                    yield sse_event("progress", {"agent": event.author, "tool": response.name, "status": "finished"})
+
+                if event.partial:
+                    if event.content and event.content.parts:
+                        text = "".join(part.text for part in event.content.parts if part.text)
+                        if text:
+                            yield sse_event("delta", {"agent": event.author, "text": text})
+                    continue
+
+                response_part = await process_agent_response(event)
+                if response_part:
+                    final_response_text += response_part + " "
+
+        yield sse_event("final", {"output": final_response_text.strip()})
+
+    except AdmissionRejected as e:
+        outcome = "timeout" if e.reason == "run_deadline" else "busy"
+        logger.warning("Shedding streaming agent run for session %s: %s", session_id, e)
+        yield sse_event("error", {"detail": AGENT_BUSY_MESSAGE, "retry_after_seconds": e.retry_after_seconds})
+
+    except Exception as e:
+        outcome = "error"
+        observer.finish(error=e)
+        logger.exception("Streaming agent run failed for session %s", session_id)
+        yield sse_event("error", {"detail": f"An error occurred while processing your request: {str(e)}"})
+
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away mid-stream; the run may not have stopped writing to the session yet.
+        outcome = "cancelled"
+        raise
+
+    finally:
+        observer.finish()
+        observe_stage("api_stream", "agent_run", time.perf_counter() - started, outcome)
+        query_session_pool.checkin(session_id, discard=outcome in ("cancelled", "timeout"))
+
+
+@app.post("/query/stream")
+async def handle_query_stream(query: QueryInput):
+    """
+    Streaming variant of /query. Responds with Server-Sent Events:
+      - progress: a sub-agent or tool started/finished ({"agent", "tool", "status"})
+      - delta: partial answer text as it is generated ({"agent", "text"})
+      - final: the complete answer ({"output"})
+      - error: the run failed ({"detail"})
+    """
+    try:
+        agent_admission.check()
+    except AdmissionRejected as e:
+        raise busy_exception(e)
+    try:
+        session_id = await query_session_pool.checkout()
+    except Exception as e:
+        logger.exception("Error in /query/stream endpoint")
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
+    logger.debug("Checked out pooled ADK session for streaming API query: %s", session_id)
+
+    return StreamingResponse(
+        stream_agent_events(query_session_pool.user_id, session_id, query.input),
+        media_type="text/event-stream",
+        # Disable proxy buffering so events reach the browser as soon as they are sent.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- Metrics ---
+# Request latency per endpoint, on top of the per-stage timings recorded in the handlers.
+METRIC_CHANNELS = {"/sms": "sms", "/query": "api", "/query/batch": "api_batch", "/query/stream": "api_stream"}
+
+
+@app.middleware("http")
+async def observe_request_latency(request: Request, call_next):
+    channel = METRIC_CHANNELS.get(request.url.path)
+    if channel is None:
+        return await call_next(request)
+    started = time.perf_counter()
+    with tracer.start_as_current_span(f"{request.method} {request.url.path}") as span:
+        try:
+            response = await call_next(request)
+        except Exception:
+            observe_stage(channel, "request", time.perf_counter() - started, "error")
+            raise
+        span.set_attribute("http.response.status_code", response.status_code)
+    # For /query/stream this is the time until the stream starts.
+    observe_stage(channel, "request", time.perf_counter() - started, f"{response.status_code // 100}xx")
+    return response
+
+
+@app.middleware("http")
+async def bind_request_id_middleware(request: Request, call_next):
+    """
+    Binds a request id to every log record written while handling the request: the
+    caller's X-Request-ID, Twilio's idempotency token, or a new id. It is echoed
+    back in the X-Request-ID response header.
+    """
+    token = bind_request_id(
+        request.headers.get("x-request-id") or request.headers.get("i-twilio-idempotency-token")
+    )
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = current_request_id()
+        return response
+    finally:
+        reset_request_id(token)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint with per-stage, per-tool and per-agent latency histograms."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 # --- Health Check Endpoint ---
@@ -350,6 +1209,40 @@ def health_check():
     """Simple health check endpoint."""
     return {"status": "ok", "message": "ADK Agent Twilio Webhook is running."}
 
+
+# --- Readiness Endpoint ---
+@app.get("/ready")
+def readiness_check(response: Response):
+    """Readiness probe: 503 until the startup warm-up is over; lists each warmer's status and duration."""
+    report = startup_warmup.report()
+    if not report["ready"]:
+        response.status_code = 503
+    return report
+
+
+# --- Stats Endpoint ---
+@app.get("/stats")
+def get_stats():
+    """Reports runtime counters for the background components of the webhook."""
+    return {
+        "reply_delivery": reply_dispatcher.stats() if reply_dispatcher is not None else None,
+        "sessions": session_manager.stats(),
+        "sms_coalescing": sms_coalescer.stats(),
+        "sender_lock": sender_lock.stats() if sender_lock is not None else None,
+        "query_session_pool": query_session_pool.stats(),
+        "warmup": startup_warmup.report(),
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "tts_cache": tts_cache.stats(),
+        "media": media_ingestor.stats(),
+        "media_derivation_cache": media_derivation_cache.stats(),
+        "image_prep": image_preprocessor.stats() if image_preprocessor is not None else None,
+        "agent_admission": agent_admission.stats(),
+        "logging": logging_stats(),
+        "session_compaction": session_compaction.summarizer.stats() if session_compaction is not None else None,
+        "cassette": cassette.stats() if cassette is not None else None,
+    }
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,  # Allow all origins for simplicity, adjust as needed
@@ -358,4 +1251,4 @@ app.add_middleware(
     expose_headers=["*"],  # Expose all headers to the client
 )
 
-print(f"Following App Middleware is added: {app.user_middleware}")
\ No newline at end of file
+logger.info("Following App Middleware is added: %s", app.user_middleware)
\ No newline at end of file
@@ -4,32 +4,58 @@ Vertex AI RAG Agent
 A package for interacting with Google Cloud Vertex AI RAG capabilities.
 """
 
+import logging
 import os
+import threading
 
-import vertexai
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables. This is the only place .env files are loaded: the package's
+# own, then the data-science agent's for its model and BigQuery settings. Neither overrides
+# variables that are already set.
 load_dotenv()
+load_dotenv(os.path.join(os.path.dirname(__file__), "sub_agents", "data_science", ".env"))
 
 # Get Vertex AI configuration from environment
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION")
 
-# Initialize Vertex AI at package load time
-try:
-    if PROJECT_ID and LOCATION:
-        print(f"Initializing Vertex AI with project={PROJECT_ID}, location={LOCATION}")
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        print("Vertex AI initialization successful")
-    else:
-        print(
-            f"Missing Vertex AI configuration. PROJECT_ID={PROJECT_ID}, LOCATION={LOCATION}. "
-            f"Tools requiring Vertex AI may not work properly."
-        )
-except Exception as e:
-    print(f"Failed to initialize Vertex AI: {str(e)}")
-    print("Please check your Google Cloud credentials and project settings.")
-
-
-from . import agent
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+_vertexai_lock = threading.Lock()
+_vertexai_initialized = False
+
+
+def init_vertexai():
+    """Initializes the Vertex AI SDK once, when the first module that uses it is loaded.
+
+    Importing vertexai takes over a second, and only the RAG and data-science
+    agents and the media models need it, so it is no longer done at package load.
+    """
+    global _vertexai_initialized
+    if _vertexai_initialized:
+        return
+    with _vertexai_lock:
+        if _vertexai_initialized:
+            return
+        _vertexai_initialized = True
+        try:
+            if PROJECT_ID and LOCATION:
+                import vertexai
+
+                logger.info("Initializing Vertex AI with project=%s, location=%s", PROJECT_ID, LOCATION)
+                vertexai.init(project=PROJECT_ID, location=LOCATION)
+                logger.info("Vertex AI initialization successful")
+            else:
+                logger.warning(
+                    "Missing Vertex AI configuration. PROJECT_ID=%s, LOCATION=%s. "
+                    "Tools requiring Vertex AI may not work properly.", PROJECT_ID, LOCATION,
+                )
+        except Exception as e:
+            logger.error(
+                "Failed to initialize Vertex AI: %s. Please check your Google Cloud credentials "
+                "and project settings.", e,
+            )
+
+
+from . import agent
@@ -4,12 +4,20 @@ from google.adk.agents import LlmAgent
 from google.adk.tools.agent_tool import AgentTool
 
 from . import prompt
+from .lazy_agent_tool import LazyAgentTool
 #from .sub_agents.academic_newresearch import academic_newresearch_agent
 from .sub_agents.websearch_agent import websearch_agent
-from .sub_agents.rag_agent import rag_agent
 from .sub_agents.weather_forecast_agent import weather_forecast_agent
 from .sub_agents.shopping_agent import shopping_agent
-from .sub_agents.data_science.data_science.agent import root_agent as db_ds_multiagent
+
+# The RAG and data-science agents import the Vertex AI SDK, BigQuery, pandas and sqlglot;
+# they are loaded on first use (or by the web app's warm-up) rather than with this module.
+rag_agent_tool = LazyAgentTool(
+    "agrimitra.sub_agents.rag_agent.agent:rag_agent", name="rag_agent", description="Vertex AI RAG Agent"
+)
+db_ds_multiagent_tool = LazyAgentTool(
+    "agrimitra.sub_agents.data_science.data_science.agent:root_agent", name="db_ds_multiagent"
+)
 
 
 
@@ -29,10 +37,10 @@ agrimitra_agent = LlmAgent(
     output_key="seminal_paper",
     tools=[
         AgentTool(agent=websearch_agent),
-        AgentTool(agent=rag_agent),
+        rag_agent_tool,
         AgentTool(agent=weather_forecast_agent),
         AgentTool(agent=shopping_agent),
-        AgentTool(agent=db_ds_multiagent),
+        db_ds_multiagent_tool,
     ],
 )
 
@@ -0,0 +1,272 @@
+"""Session history compaction for the agrimitra app.
+
+Every turn replays the whole session to agrimitra_agent, including large
+sub-agent results (BigQuery rows, shopping JSON), so prompts grow with the
+length of a conversation. ADK's token-threshold compaction
+(`EventsCompactionConfig`) folds older events into a summary event once the
+prompt of the root agent reaches `token_threshold` tokens; it runs before the
+root agent's model calls and after each turn. FarmerContextSummarizer decides
+what the summary holds:
+
+- the last `keep_turns` turns (counting the one in progress) stay verbatim;
+- older turns become a short summary of the conversation plus a structured
+  farmer-facts block (location, crops, land, ...), which is carried over and
+  updated by every later compaction.
+
+The summary is written by a small Gemini model when one is configured, and
+extractively (the first lines of each question and answer) otherwise or when
+the model call fails.
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+from typing import Optional
+
+from google.adk.apps.app import EventsCompactionConfig
+from google.adk.apps.base_events_summarizer import BaseEventsSummarizer
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions, EventCompaction
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_THRESHOLD = 6000  # the instruction and tool declarations alone are ~1500 tokens
+DEFAULT_KEEP_TURNS = 3
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+
+SUMMARY_HEADER = "Summary of the earlier conversation with this farmer:"
+FACTS_HEADER = "Farmer facts (JSON):"
+
+FARMER_FACT_FIELDS = {
+    "name": "the farmer's name",
+    "language": "the language the farmer writes in (e.g. Hinglish, Hindi, English)",
+    "location": "village / district / state",
+    "crops": "crops grown or planned, with their stage if known",
+    "land": "farm size and ownership",
+    "soil_and_irrigation": "soil type, water source, irrigation method",
+    "livestock": "animals kept",
+    "equipment": "machinery or inputs owned or being bought",
+    "schemes": "government schemes applied for or asked about",
+    "open_issues": "problems or questions still unresolved",
+}
+
+SUMMARY_PROMPT = """You maintain the memory of an agricultural assistant that talks to Indian farmers.
+Below are the previous summary and farmer facts (may be empty) and the conversation turns that followed.
+Return a JSON object with two keys:
+- "summary": at most {max_summary_words} words covering what the farmer asked, the advice given and
+  any numbers they will need again (prices, dates, doses). Do not repeat tool output verbatim.
+- "farmer_facts": an object with these keys, updated with anything new (use null when unknown):
+{fact_fields}
+
+Previous summary:
+{previous_summary}
+
+Previous farmer facts:
+{previous_facts}
+
+Conversation:
+{conversation}
+"""
+
+
+def _event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return " ".join(part.text.strip() for part in event.content.parts if part.text and not part.thought)
+
+
+def _is_user_message(event: Event) -> bool:
+    return event.author == "user" and event.content is not None and not event.get_function_responses()
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def parse_compacted_content(content: Optional[types.Content]) -> tuple:
+    """Returns (summary, farmer facts) from the content of an earlier compaction."""
+    summary, facts = "", {}
+    for part in (content.parts if content and content.parts else []):
+        text = part.text or ""
+        if text.startswith(FACTS_HEADER):
+            try:
+                facts = json.loads(text[len(FACTS_HEADER):])
+            except ValueError:
+                logger.warning("Ignoring unreadable farmer facts in an earlier compaction")
+        elif text.startswith(SUMMARY_HEADER):
+            summary = text[len(SUMMARY_HEADER):].strip()
+    return summary, facts
+
+
+def merge_facts(previous: dict, new: dict) -> dict:
+    """New non-empty values replace old ones; unknown keys from the model are dropped."""
+    merged = dict(previous)
+    for key, value in (new or {}).items():
+        if key in FARMER_FACT_FIELDS and value not in (None, "", [], {}):
+            merged[key] = value
+    return merged
+
+
+class FarmerContextSummarizer(BaseEventsSummarizer):
+    """Folds all but the last `keep_turns` turns into a summary and a farmer-facts block."""
+
+    def __init__(
+        self,
+        llm: Optional[BaseLlm] = None,
+        keep_turns: int = DEFAULT_KEEP_TURNS,
+        max_tool_chars: int = 1500,
+        max_summary_words: int = 200,
+    ):
+        self.llm = llm
+        self.keep_turns = max(1, keep_turns)
+        self.max_tool_chars = max_tool_chars
+        self.max_summary_words = max_summary_words
+        self.counters = Counter()
+
+    def _split(self, events: list) -> tuple:
+        """Splits ADK's candidate events into (previous compacted content, events to fold)."""
+        previous = None
+        # ADK passes the previous summary first, as a model event without an invocation of its own.
+        if events and events[0].author != "user" and _event_text(events[0]).startswith(SUMMARY_HEADER):
+            previous, events = events[0], events[1:]
+        turn_starts = [index for index, event in enumerate(events) if _is_user_message(event)]
+        if len(turn_starts) <= self.keep_turns:
+            return previous, []
+        return previous, events[:turn_starts[-self.keep_turns]]
+
+    def format_turns(self, events: list) -> str:
+        lines = []
+        for event in events:
+            text = _event_text(event)
+            if event.author == "user" and text:
+                lines.append(f"Farmer: {text}")
+            elif text:
+                lines.append(f"Agrimitra ({event.author}): {text}")
+            for call in event.get_function_calls():
+                lines.append(f"{event.author} asked {call.name}: {_clip(json.dumps(call.args or {}, ensure_ascii=False, default=str), self.max_tool_chars)}")
+            for response in event.get_function_responses():
+                lines.append(f"{response.name} answered: {_clip(json.dumps(response.response, ensure_ascii=False, default=str), self.max_tool_chars)}")
+        return "\n".join(lines)
+
+    def extractive_summary(self, previous_summary: str, events: list) -> str:
+        """A model-free summary: the first line of every question and final answer."""
+        lines = [previous_summary] if previous_summary else []
+        for event in events:
+            text = _event_text(event)
+            if not text:
+                continue
+            if event.author == "user":
+                lines.append(f"- Farmer: {_clip(text.splitlines()[0], 200)}")
+            elif event.is_final_response():
+                lines.append(f"  Agrimitra: {_clip(text.splitlines()[0], 200)}")
+        # Keep the newest lines when the summary outgrows its budget.
+        budget = self.max_summary_words * 7
+        summary = "\n".join(lines)
+        return summary if len(summary) <= budget else "..." + summary[-budget:]
+
+    async def _model_summary(self, previous_summary: str, previous_facts: dict, events: list) -> tuple:
+        prompt = SUMMARY_PROMPT.format(
+            max_summary_words=self.max_summary_words,
+            fact_fields="\n".join(f'  "{key}": {description}' for key, description in FARMER_FACT_FIELDS.items()),
+            previous_summary=previous_summary or "(none)",
+            previous_facts=json.dumps(previous_facts, ensure_ascii=False) if previous_facts else "(none)",
+            conversation=self.format_turns(events),
+        )
+        request = LlmRequest(
+            model=self.llm.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(temperature=0, response_mime_type="application/json"),
+        )
+        response = None
+        async for response in self.llm.generate_content_async(request, stream=False):
+            if response.content:
+                break
+        text = "".join(part.text or "" for part in (response.content.parts if response and response.content else []))
+        data = json.loads(text)
+        return str(data.get("summary") or "").strip(), data.get("farmer_facts") or {}, response.usage_metadata
+
+    async def maybe_summarize_events(self, *, events: list) -> Optional[Event]:
+        previous, to_fold = self._split(events)
+        if not to_fold:
+            return None
+        previous_summary, previous_facts = parse_compacted_content(previous.content if previous else None)
+
+        summary, facts, usage = "", {}, None
+        if self.llm is not None:
+            try:
+                summary, facts, usage = await self._model_summary(previous_summary, previous_facts, to_fold)
+            except Exception:
+                self.counters["model_failures"] += 1
+                logger.warning("Compaction summary model failed; using an extractive summary", exc_info=True)
+        if not summary:
+            summary = self.extractive_summary(previous_summary, to_fold)
+            self.counters["extractive_summaries"] += 1
+        facts = merge_facts(previous_facts, facts)
+
+        parts = [types.Part(text=f"{SUMMARY_HEADER}\n{summary}")]
+        if facts:
+            parts.append(types.Part(text=f"{FACTS_HEADER}\n{json.dumps(facts, ensure_ascii=False)}"))
+        self.counters["compactions"] += 1
+        self.counters["turns_folded"] += sum(1 for event in to_fold if _is_user_message(event))
+        self.counters["events_folded"] += len(to_fold)
+        logger.info(
+            "Compacted %d events (%d turns) into a %d-char summary with %d farmer facts",
+            len(to_fold), sum(1 for event in to_fold if _is_user_message(event)), len(summary), len(facts),
+        )
+        return Event(
+            author="user",
+            invocation_id=Event.new_id(),
+            usage_metadata=usage,
+            actions=EventActions(
+                compaction=EventCompaction(
+                    # Starting where the previous summary started makes this one replace it.
+                    start_timestamp=(previous or to_fold[0]).timestamp,
+                    end_timestamp=to_fold[-1].timestamp,
+                    compacted_content=types.Content(role="model", parts=parts),
+                )
+            ),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "keep_turns": self.keep_turns,
+            "model": self.llm.model if self.llm is not None else None,
+            **self.counters,
+        }
+
+
+def compaction_config(
+    token_threshold: int = DEFAULT_TOKEN_THRESHOLD,
+    keep_turns: int = DEFAULT_KEEP_TURNS,
+    model: Optional[str] = DEFAULT_MODEL,
+) -> Optional[EventsCompactionConfig]:
+    """The App compaction config, or None when token_threshold is 0 (compaction off).
+
+    An empty `model` uses the extractive summary only.
+    """
+    if token_threshold <= 0:
+        return None
+    llm = None
+    if model:
+        from google.adk.models.google_llm import Gemini
+
+        llm = Gemini(model=model)
+    return EventsCompactionConfig(
+        summarizer=FarmerContextSummarizer(llm=llm, keep_turns=keep_turns),
+        token_threshold=token_threshold,
+        # The summarizer keeps the last turns itself, so ADK hands it every candidate event.
+        event_retention_size=0,
+    )
+
+
+def compaction_config_from_env(environ=os.environ) -> Optional[EventsCompactionConfig]:
+    """compaction_config() from SESSION_COMPACTION_TOKEN_THRESHOLD / _KEEP_TURNS / _MODEL."""
+    return compaction_config(
+        token_threshold=int(environ.get("SESSION_COMPACTION_TOKEN_THRESHOLD", str(DEFAULT_TOKEN_THRESHOLD))),
+        keep_turns=int(environ.get("SESSION_COMPACTION_KEEP_TURNS", str(DEFAULT_KEEP_TURNS))),
+        model=environ.get("SESSION_COMPACTION_MODEL", DEFAULT_MODEL),
+    )
@@ -0,0 +1,84 @@
+"""AgentTool for sub-agents whose modules are imported on first use.
+
+The data-science and RAG agents pull in BigQuery, pandas, sqlglot and the
+Vertex AI SDK (about two seconds of imports) although most farmer questions
+never reach them. LazyAgentTool declares the tool to the root agent from a
+name and description alone, and imports the wrapped agent the first time the
+tool runs or something reads `tool.agent` (the web app's startup warm-up does,
+off the event loop). Until then the declaration is built from a stand-in agent
+with the same name and description, so a lazily loaded agent must not have an
+input or output schema. walk_agents() goes through LazyAgentTools too, and so
+loads every sub-agent below the agent it starts from.
+"""
+
+import importlib
+import logging
+import threading
+from typing import Optional
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.tools.agent_tool import AgentTool
+from google.adk.tools.base_tool import BaseTool
+
+logger = logging.getLogger(__name__)
+
+
+class LazyAgentTool(AgentTool):
+    """An AgentTool for the agent at `target` ("package.module:attribute"), imported on first use."""
+
+    def __init__(self, target: str, name: str, description: str = "", skip_summarization: bool = False):
+        # AgentTool.__init__ needs the agent itself, so its attributes are set here.
+        BaseTool.__init__(self, name=name, description=description)
+        self.target = target
+        self.skip_summarization = skip_summarization
+        self.include_plugins = True
+        self.propagate_grounding_metadata = False
+        self._agent: Optional[BaseAgent] = None
+        self._lock = threading.Lock()
+        self._stand_in = AgentTool(agent=LlmAgent(name=name, description=description))
+
+    @property
+    def loaded(self) -> bool:
+        return self._agent is not None
+
+    @property
+    def agent(self) -> BaseAgent:
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._load()
+        return self._agent
+
+    def _load(self) -> BaseAgent:
+        module_name, _, attribute = self.target.partition(":")
+        agent = getattr(importlib.import_module(module_name), attribute)
+        if agent.name != self.name or (agent.description or "") != self.description:
+            raise ValueError(
+                f"{self.target} is {agent.name!r} ({agent.description!r}), "
+                f"but the tool was declared as {self.name!r} ({self.description!r})"
+            )
+        if getattr(agent, "input_schema", None) or getattr(agent, "output_schema", None):
+            raise ValueError(f"{self.target} has an input or output schema and cannot be loaded lazily")
+        logger.info("Loaded sub-agent %s from %s", agent.name, self.target)
+        return agent
+
+    def _get_declaration(self):
+        if self._agent is None:
+            return self._stand_in._get_declaration()
+        return super()._get_declaration()
+
+
+def walk_agents(agent):
+    """Yields an agent and every agent below it, through sub_agents and AgentTools."""
+    seen = set()
+    stack = [agent]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        stack.extend(getattr(current, "sub_agents", None) or [])
+        for tool in getattr(current, "tools", None) or []:
+            if getattr(tool, "agent", None) is not None:
+                stack.append(tool.agent)
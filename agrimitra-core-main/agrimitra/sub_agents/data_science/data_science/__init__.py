@@ -14,6 +14,10 @@
 
 import os
 
+from agrimitra import init_vertexai
+
+init_vertexai()
+
 from . import agent
 
 __all__ = ["agent"]
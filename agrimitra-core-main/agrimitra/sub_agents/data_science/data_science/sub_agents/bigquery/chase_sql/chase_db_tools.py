@@ -15,6 +15,7 @@
 """This code contains the implementation of the tools used for the CHASE-SQL agent."""
 
 import enum
+import logging
 import os
 
 from google.adk.tools import ToolContext
@@ -29,6 +30,8 @@ from .sql_postprocessor import sql_translator
 
 BQ_DATA_PROJECT_ID = os.getenv("BQ_DATA_PROJECT_ID")
 
+logger = logging.getLogger(__name__)
+
 
 class GenerateSQLType(enum.Enum):
     """Enum for the different types of SQL generation methods.
@@ -74,7 +77,7 @@ def parse_response(response: str) -> str:
         if "```sql" in response and "```" in response:
             query = response.split("```sql")[1].split("```")[0]
     except ValueError as e:
-        print(f"Error in parsing response: {e}")
+        logger.warning("Error in parsing response: %s", e)
         query = response
     return query.strip()
 
@@ -92,7 +95,7 @@ def initial_bq_nl2sql(
     Returns:
       str: An SQL statement to answer this question.
     """
-    print("****** Running agent with ChaseSQL algorithm.")
+    logger.debug("Running agent with the ChaseSQL algorithm")
     ddl_schema = tool_context.state["database_settings"]["bq_ddl_schema"]
     project = tool_context.state["database_settings"]["bq_data_project_id"]
     db = tool_context.state["database_settings"]["bq_dataset_id"]
@@ -15,21 +15,22 @@
 """This code contains the LLM utils for the CHASE-SQL Agent."""
 
 import functools
+import logging
 import os
 import random
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Callable, List, Optional
 
-import dotenv
-import vertexai
-from google.cloud import aiplatform
+from agrimitra import init_vertexai
+from opentelemetry import trace
 from vertexai.generative_models import (GenerationConfig, HarmBlockThreshold,
                                         HarmCategory)
 from vertexai.preview import caching
 from vertexai.preview.generative_models import GenerativeModel
 
-dotenv.load_dotenv(override=True)
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 SAFETY_FILTER_CONFIG = {
     HarmCategory.HARM_CATEGORY_UNSPECIFIED: HarmBlockThreshold.BLOCK_NONE,
@@ -39,6 +40,10 @@ SAFETY_FILTER_CONFIG = {
     HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
 }
 
+# Builds the model behind GeminiModel from a model name. fake_llm.install() swaps in a
+# scripted fake for offline benchmarks.
+generative_model_factory = GenerativeModel
+
 GCP_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
 GCP_LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION")
 
@@ -73,12 +78,6 @@ GEMINI_URL = (
     "projects/{GCP_PROJECT}/locations/{region}/publishers/google/models/{model_name}"
 )
 
-aiplatform.init(
-    project=GCP_PROJECT,
-    location=GCP_LOCATION,
-)
-vertexai.init(project=GCP_PROJECT, location=GCP_LOCATION)
-
 
 def retry(max_attempts=8, base_delay=1, backoff_factor=2):
     """Decorator to add retry logic to a function.
@@ -101,7 +100,7 @@ def retry(max_attempts=8, base_delay=1, backoff_factor=2):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:  # pylint: disable=broad-exception-caught
-                    print(f"Attempt {attempts + 1} failed with error: {e}")
+                    logger.warning("Attempt %d failed with error: %s", attempts + 1, e)
                     attempts += 1
                     if attempts >= max_attempts:
                         raise e
@@ -131,6 +130,7 @@ class GeminiModel:
         self.arguments = kwargs
         self.distribute_requests = distribute_requests
         self.temperature = temperature
+        init_vertexai()
         model_name = self.model_name
         if not self.finetuned_model and self.distribute_requests:
             random_region = random.choice(GEMINI_AVAILABLE_REGIONS)
@@ -145,7 +145,7 @@ class GeminiModel:
                 cached_content=cached_content
             )
         else:
-            self.model = GenerativeModel(model_name=model_name)
+            self.model = generative_model_factory(model_name=model_name)
 
     @retry(max_attempts=12, base_delay=2, backoff_factor=2)
     def call(self, prompt: str, parser_func=None) -> str:
@@ -160,14 +160,16 @@ class GeminiModel:
         Returns:
             str: The processed response from the model.
         """
-        response = self.model.generate_content(
-            prompt,
-            generation_config=GenerationConfig(
-                temperature=self.temperature,
-                **self.arguments,
-            ),
-            safety_settings=SAFETY_FILTER_CONFIG,
-        ).text
+        with tracer.start_as_current_span("vertexai.generate_content") as span:
+            span.set_attribute("gen_ai.request.model", self.model_name or "")
+            response = self.model.generate_content(
+                prompt,
+                generation_config=GenerationConfig(
+                    temperature=self.temperature,
+                    **self.arguments,
+                ),
+                safety_settings=SAFETY_FILTER_CONFIG,
+            ).text
         if parser_func:
             return parser_func(response)
         return response
@@ -200,10 +202,10 @@ class GeminiModel:
                 try:
                     return self.call(prompt, parser_func)
                 except Exception as e:  # pylint: disable=broad-exception-caught
-                    print(f"Error for prompt {index}: {str(e)}")
+                    logger.warning("Error for prompt %d: %s", index, e)
                     retries += 1
                     if retries <= max_retries:
-                        print(f"Retrying ({retries}/{max_retries}) for prompt {index}")
+                        logger.info("Retrying (%d/%d) for prompt %d", retries, max_retries, index)
                         time.sleep(1)  # Small delay before retrying
                     else:
                         return f"Error after retries: {str(e)}"
@@ -220,14 +222,14 @@ class GeminiModel:
                 try:
                     results[index] = future.result()
                 except Exception as e:  # pylint: disable=broad-exception-caught
-                    print(f"Unhandled error for prompt {index}: {e}")
+                    logger.error("Unhandled error for prompt %d: %s", index, e)
                     results[index] = "Unhandled Error"
 
         # Handle remaining unfinished tasks after the timeout
         for future in future_to_index:
             index = future_to_index[future]
             if not future.done():
-                print(f"Timeout occurred for prompt {index}")
+                logger.warning("Timeout occurred for prompt %d", index)
                 results[index] = "Timeout"
 
         return results
@@ -14,6 +14,7 @@
 
 """Translator from SQLite to BigQuery."""
 
+import logging
 import re
 from typing import Any, Final
 
@@ -26,6 +27,8 @@ from .correction_prompt_template import (
     CORRECTION_PROMPT_TEMPLATE_V1_0,
 )  # pylint: disable=g-importing-member
 
+logger = logging.getLogger(__name__)
+
 
 ColumnSchemaType = tuple[str, str]
 AllColumnsSchemaType = list[ColumnSchemaType]
@@ -387,7 +390,7 @@ class SqlTranslator:
         errors, sql_query = errors_and_sql
         responses = sql_query  # Default to the input SQL query after error check.
         if errors:
-            print("Processing input errors")
+            logger.debug("Processing input errors")
             if schema_dict:
                 # If the schema is provided, then insert it into the prompt.
                 schema_insert = f"\nThe database schema is:\n{schema_dict}\n"
@@ -435,7 +438,7 @@ class SqlTranslator:
         Returns:
           The translated SQL query.
         """
-        print("****** sql_query at translator entry:", sql_query)
+        logger.debug("SQL at translator entry: %s", sql_query)
         if self._process_input_errors:
             sql_query = self._fix_errors(
                 sql_query,
@@ -445,7 +448,7 @@ class SqlTranslator:
                 ddl_schema=ddl_schema,
                 apply_heuristics=True,
             )
-        print("****** sql_query after fix_errors:", sql_query)
+        logger.debug("SQL after fix_errors: %s", sql_query)
         sql_query = sqlglot.transpile(
             sql=sql_query,
             read=self.INPUT_DIALECT,
@@ -454,7 +457,7 @@ class SqlTranslator:
         )[
             0
         ]  # Transpile returns a list of strings.
-        print("****** sql_query after transpile:", sql_query)
+        logger.debug("SQL after transpile: %s", sql_query)
         if self._tool_output_errors:
             sql_query = self._fix_errors(
                 sql_query,
@@ -25,6 +25,7 @@ from ...utils.utils import get_env_var
 from google.adk.tools import ToolContext
 from google.cloud import bigquery
 from google.genai import Client
+from opentelemetry import trace
 
 from .chase_sql import chase_constants
 
@@ -34,11 +35,23 @@ data_project = os.getenv("BQ_DATA_PROJECT_ID", None)
 compute_project = os.getenv("BQ_COMPUTE_PROJECT_ID", None)
 vertex_project = os.getenv("GOOGLE_CLOUD_PROJECT", None)
 location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-llm_client = Client(vertexai=True, project=vertex_project, location=location)
+# Built on first use by get_llm_client(); fake_llm.install() assigns a fake here.
+llm_client = None
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 MAX_NUM_ROWS = 80
 
 
+def get_llm_client():
+    """Returns the genai client for the baseline NL2SQL method, creating it on first use."""
+    global llm_client
+    if llm_client is None:
+        llm_client = Client(vertexai=True, project=vertex_project, location=location)
+    return llm_client
+
+
 def _serialize_value_for_sql(value):
     """Serializes a Python value from a pandas DataFrame into a BigQuery SQL literal."""
     if pd.isna(value):
@@ -210,8 +223,8 @@ OPTIONS (
                             f"INSERT INTO `{table_ref}` VALUES ({values_str});\n\n"
                         )
             except Exception as e:
-                logging.warning(
-                    f"Could not retrieve sample rows for table {table_ref.path}: {e}"
+                logger.warning(
+                    "Could not retrieve sample rows for table %s: %s", table_ref.path, e
                 )
                 ddl_statement += f"-- NOTE: Could not retrieve sample rows for table {table_ref.path}.\n\n"
 
@@ -275,17 +288,19 @@ The database structure is defined by the following table schemas (possibly with
         MAX_NUM_ROWS=MAX_NUM_ROWS, SCHEMA=ddl_schema, QUESTION=question
     )
 
-    response = llm_client.models.generate_content(
-        model=os.getenv("BASELINE_NL2SQL_MODEL"),
-        contents=prompt,
-        config={"temperature": 0.1},
-    )
+    with tracer.start_as_current_span("genai.generate_content") as span:
+        span.set_attribute("gen_ai.request.model", os.getenv("BASELINE_NL2SQL_MODEL") or "")
+        response = get_llm_client().models.generate_content(
+            model=os.getenv("BASELINE_NL2SQL_MODEL"),
+            contents=prompt,
+            config={"temperature": 0.1},
+        )
 
     sql = response.text
     if sql:
         sql = sql.replace("```sql", "").replace("```", "").strip()
 
-    print("\n sql:", sql)
+    logger.debug("Generated SQL: %s", sql)
 
     tool_context.state["sql_query"] = sql
 
@@ -346,9 +361,9 @@ def run_bigquery_validation(
 
         return sql_string
 
-    logging.info("Validating SQL: %s", sql_string)
+    logger.debug("Validating SQL: %s", sql_string)
     sql_string = cleanup_sql(sql_string)
-    logging.info("Validating SQL (after cleanup): %s", sql_string)
+    logger.debug("Validating SQL (after cleanup): %s", sql_string)
 
     final_result = {"query_result": None, "error_message": None}
 
@@ -362,8 +377,10 @@ def run_bigquery_validation(
         return final_result
 
     try:
-        query_job = get_bq_client().query(sql_string)
-        results = query_job.result()  # Get the query results
+        with tracer.start_as_current_span("bigquery.query") as span:
+            query_job = get_bq_client().query(sql_string)
+            results = query_job.result()  # Get the query results
+            span.set_attribute("bigquery.job_id", query_job.job_id or "")
 
         if results.schema:  # Check if query returned data
             rows = [
@@ -394,6 +411,6 @@ def run_bigquery_validation(
     ) as e:  # Catch generic exceptions from BigQuery  # pylint: disable=broad-exception-caught
         final_result["error_message"] = f"Invalid SQL: {e}"
 
-    print("\n run_bigquery_validation final_result: \n", final_result)
+    logger.debug("run_bigquery_validation final_result: %s", final_result)
 
     return final_result
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 """Data Science Agent V2: generate nl2py and use code interpreter to run the code."""
+import logging
 import os
 from google.adk.agents import Agent
 from google.adk.tools import ToolContext
@@ -33,6 +34,8 @@ from ..bigquery.tools import (
     get_database_settings as get_bq_database_settings,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def setup_before_agent_call(callback_context: CallbackContext):
     """Setup the agent."""
@@ -66,10 +69,7 @@ async def call_db_agent(
     tool_context: ToolContext,
 ):
     """Tool to call database (nl2sql) agent."""
-    print(
-        "\n call_db_agent.use_database:"
-        f' {tool_context.state["all_db_settings"]["use_database"]}'
-    )
+    logger.debug("call_db_agent.use_database: %s", tool_context.state["all_db_settings"]["use_database"])
     database_agent = (
         bq_db_agent
         if tool_context.state["all_db_settings"]["use_database"] == "BigQuery"
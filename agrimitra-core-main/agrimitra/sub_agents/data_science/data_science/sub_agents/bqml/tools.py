@@ -12,11 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 import time
 import os
 from google.cloud import bigquery
+from opentelemetry import trace
 from vertexai import rag
 
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
 
 def check_bq_models(dataset_id: str) -> str:
     """Lists models in a BigQuery dataset and returns them as a string.
@@ -36,7 +41,7 @@ def check_bq_models(dataset_id: str) -> str:
         models = client.list_models(dataset_id)
         model_list = []  # Initialize as a list
 
-        print(f"Models contained in '{dataset_id}':")
+        logger.debug("Listing models contained in %r", dataset_id)
         for model in models:
             model_id = model.model_id
             model_type = model.model_type
@@ -48,6 +53,7 @@ def check_bq_models(dataset_id: str) -> str:
         return f"An error occurred: {str(e)}"
 
 
+@tracer.start_as_current_span("bigquery.execute_bqml")
 def execute_bqml_code(bqml_code: str, project_id: str, dataset_id: str) -> str:
     """
     Executes BigQuery ML code.
@@ -69,9 +75,11 @@ def execute_bqml_code(bqml_code: str, project_id: str, dataset_id: str) -> str:
             #         f" {timeout_seconds} seconds. Job ID: {query_job.job_id}"
             #     )
 
-            print(
-                f"Query Job Status: {query_job.state}, Elapsed Time:"
-                f" {elapsed_time:.2f} seconds. Job ID: {query_job.job_id}"
+            logger.info(
+                "Query Job Status: %s, Elapsed Time: %.2f seconds. Job ID: %s",
+                query_job.state,
+                elapsed_time,
+                query_job.job_id,
             )
             time.sleep(5)
 
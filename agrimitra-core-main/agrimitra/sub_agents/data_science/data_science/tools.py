@@ -18,21 +18,22 @@
 -- then, it use NL2Py to do further data analysis as needed
 """
 
+import logging
+
 from google.adk.tools import ToolContext
 from google.adk.tools.agent_tool import AgentTool
 
 from .sub_agents import ds_agent, db_agent
 
+logger = logging.getLogger(__name__)
+
 
 async def call_db_agent(
     question: str,
     tool_context: ToolContext,
 ):
     """Tool to call database (nl2sql) agent."""
-    print(
-        "\n call_db_agent.use_database:"
-        f' {tool_context.state["all_db_settings"]["use_database"]}'
-    )
+    logger.debug("call_db_agent.use_database: %s", tool_context.state["all_db_settings"]["use_database"])
 
     agent_tool = AgentTool(agent=db_agent)
 
@@ -13,10 +13,13 @@
 # limitations under the License.
 
 import json
+import logging
 import os
 
 from vertexai.preview.extensions import Extension
 
+logger = logging.getLogger(__name__)
+
 
 def list_all_extensions():
   extensions = Extension.list(location='us-central1')
@@ -60,10 +63,10 @@ def get_image_bytes(filepath):
       image_bytes = f.read()
     return image_bytes
   except FileNotFoundError:
-    print(f'Error: File not found at {filepath}')
+    logger.error('File not found at %s', filepath)
     return None
   except Exception as e:
-    print(f'Error reading file: {e}')
+    logger.error('Error reading file %s: %s', filepath, e)
     return None
 
 
@@ -88,7 +91,7 @@ def extract_json_from_model_output(model_output):
     return json_object
   except json.JSONDecodeError as e:
     msg = f'Error decoding JSON: {e}'
-    print(msg)
+    logger.warning(msg)
     return {'error': msg}
 
 
@@ -0,0 +1,37 @@
+"""Import-time budget for the agrimitra package.
+
+The data-science and RAG sub-agents, and with them BigQuery, pandas, sqlglot and
+the Vertex AI SDK, are loaded on first use. This test imports the package in a
+fresh interpreter with agri-mitra-backend/benchmarks/bench_import_time.py and
+fails if it gets slow again or pulls one of those modules in eagerly.
+"""
+
+import importlib.util
+import pathlib
+
+import pytest
+
+BENCHMARK = (
+    pathlib.Path(__file__).resolve().parents[5]
+    / "agri-mitra-backend"
+    / "benchmarks"
+    / "bench_import_time.py"
+)
+BUDGET_MS = 1500
+
+
+@pytest.fixture(scope="module")
+def bench_import_time():
+    if not BENCHMARK.exists():
+        pytest.skip(f"{BENCHMARK} not found (the web backend is not checked out)")
+    spec = importlib.util.spec_from_file_location("bench_import_time", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_agrimitra_import_is_light(bench_import_time):
+    cumulative_ms, self_times, _ = bench_import_time.import_once("agrimitra")
+    assert cumulative_ms < BUDGET_MS, f"import agrimitra took {cumulative_ms:.0f} ms"
+    heavy = [name for name in bench_import_time.HEAVY_MODULES if name in self_times]
+    assert not heavy, f"import agrimitra loaded {', '.join(heavy)}"
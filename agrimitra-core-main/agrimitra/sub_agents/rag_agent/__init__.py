@@ -1 +1,5 @@
-from .agent import rag_agent
\ No newline at end of file
+from agrimitra import init_vertexai
+
+init_vertexai()
+
+from .agent import rag_agent
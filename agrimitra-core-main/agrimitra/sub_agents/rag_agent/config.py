@@ -2,17 +2,12 @@
 Configuration settings for the RAG Agent.
 
 These settings are used by the various RAG tools.
-Vertex AI initialization is performed in the package's __init__.py
+Vertex AI initialization is performed in the package's __init__.py,
+and .env is loaded by the agrimitra package.
 """
 
 import os
 
-from dotenv import load_dotenv
-
-# Load environment variables (this is redundant if __init__.py is imported first,
-# but included for safety when importing config directly)
-load_dotenv()
-
 # Vertex AI settings
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION")
@@ -24,3 +19,5 @@ DEFAULT_TOP_K = 3
 DEFAULT_DISTANCE_THRESHOLD = 0.5
 DEFAULT_EMBEDDING_MODEL = "publishers/google/models/text-embedding-005"
 DEFAULT_EMBEDDING_REQUESTS_PER_MIN = 1000
+# How long a corpus listing is reused; create_corpus and delete_corpus drop it sooner
+CORPUS_CACHE_TTL_SECONDS = int(os.environ.get("RAG_CORPUS_CACHE_TTL_SECONDS", "300"))
@@ -10,7 +10,7 @@ from vertexai import rag
 from ..config import (
     DEFAULT_EMBEDDING_MODEL,
 )
-from .utils import check_corpus_exists
+from .utils import check_corpus_exists, invalidate_corpora_cache
 
 
 def create_corpus(
@@ -54,6 +54,7 @@ def create_corpus(
                 rag_embedding_model_config=embedding_model_config
             ),
         )
+        invalidate_corpora_cache()
 
         # Update state to track corpus existence
         tool_context.state[f"corpus_exists_{corpus_name}"] = True
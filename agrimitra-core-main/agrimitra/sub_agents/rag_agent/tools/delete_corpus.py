@@ -5,7 +5,7 @@ Tool for deleting a Vertex AI RAG corpus when it's no longer needed.
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
-from .utils import check_corpus_exists, get_corpus_resource_name
+from .utils import check_corpus_exists, get_corpus_resource_name, invalidate_corpora_cache
 
 
 def delete_corpus(
@@ -48,6 +48,7 @@ def delete_corpus(
 
         # Delete the corpus
         rag.delete_corpus(corpus_resource_name)
+        invalidate_corpora_cache()
 
         # Remove from state by setting to False
         state_key = f"corpus_exists_{corpus_name}"
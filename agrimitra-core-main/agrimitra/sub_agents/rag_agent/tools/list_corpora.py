@@ -4,7 +4,7 @@ Tool for listing all available Vertex AI RAG corpora.
 
 from typing import Dict, List, Union
 
-from vertexai import rag
+from .utils import list_corpora_cached
 
 
 def list_corpora() -> dict:
@@ -19,8 +19,8 @@ def list_corpora() -> dict:
             - update_time: When the corpus was last updated
     """
     try:
-        # Get the list of corpora
-        corpora = rag.list_corpora()
+        # Get the list of corpora (fresh, since the user asked for it)
+        corpora = list_corpora_cached(refresh=True)
 
         # Process corpus information into a more usable format
         corpus_info: List[Dict[str, Union[str, int]]] = []
@@ -13,6 +13,8 @@ from ..config import (
 )
 from .utils import check_corpus_exists, get_corpus_resource_name
 
+logger = logging.getLogger(__name__)
+
 
 def rag_query(
     corpus_name: str,
@@ -52,7 +54,7 @@ def rag_query(
         )
 
         # Perform the query
-        print("Performing retrieval query...")
+        logger.debug("Performing retrieval query on %s", corpus_resource_name)
         response = rag.retrieval_query(
             rag_resources=[
                 rag.RagResource(
@@ -103,7 +105,7 @@ def rag_query(
 
     except Exception as e:
         error_msg = f"Error querying corpus: {str(e)}"
-        logging.error(error_msg)
+        logger.error(error_msg)
         return {
             "status": "error",
             "message": error_msg,
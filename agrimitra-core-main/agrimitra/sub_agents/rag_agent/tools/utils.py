@@ -4,17 +4,42 @@ Utility functions for the RAG tools.
 
 import logging
 import re
+import time
 
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
 from ..config import (
+    CORPUS_CACHE_TTL_SECONDS,
     LOCATION,
     PROJECT_ID,
 )
 
 logger = logging.getLogger(__name__)
 
+# Every rag_query resolved the corpus name through rag.list_corpora() up to three
+# times; the listing is now shared and refreshed every CORPUS_CACHE_TTL_SECONDS.
+_corpora = None
+_corpora_listed_at = 0.0
+
+
+def list_corpora_cached(refresh: bool = False) -> list:
+    """
+    Return the RAG corpora of the project, listing them at most once per
+    CORPUS_CACHE_TTL_SECONDS unless refresh is True.
+    """
+    global _corpora, _corpora_listed_at
+    if refresh or _corpora is None or time.monotonic() - _corpora_listed_at > CORPUS_CACHE_TTL_SECONDS:
+        _corpora = list(rag.list_corpora())
+        _corpora_listed_at = time.monotonic()
+    return _corpora
+
+
+def invalidate_corpora_cache() -> None:
+    """Forget the cached corpus listing, e.g. after a corpus was created or deleted."""
+    global _corpora
+    _corpora = None
+
 
 def get_corpus_resource_name(corpus_name: str) -> str:
     """
@@ -36,7 +61,7 @@ def get_corpus_resource_name(corpus_name: str) -> str:
     # Check if this is a display name of an existing corpus
     try:
         # List all corpora and check if there's a match with the display name
-        corpora = rag.list_corpora()
+        corpora = list_corpora_cached()
         for corpus in corpora:
             if hasattr(corpus, "display_name") and corpus.display_name == corpus_name:
                 return corpus.name
@@ -79,7 +104,7 @@ def check_corpus_exists(corpus_name: str, tool_context: ToolContext) -> bool:
         corpus_resource_name = get_corpus_resource_name(corpus_name)
 
         # List all corpora and check if this one exists
-        corpora = rag.list_corpora()
+        corpora = list_corpora_cached()
         for corpus in corpora:
             if (
                 corpus.name == corpus_resource_name
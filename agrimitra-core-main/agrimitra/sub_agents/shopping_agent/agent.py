@@ -1,8 +1,11 @@
 """Academic_newresearch_agent for finding new research lines"""
 
 from google.adk import Agent
+from opentelemetry import trace
 import requests
 
+tracer = trace.get_tracer(__name__)
+
 
 MODEL = "gemini-2.5-flash"
 
@@ -20,7 +23,9 @@ def shopping_tool(item: str) -> dict:
         "postal_code": ""
     }
 
-    response = requests.get(url, params=params)
+    with tracer.start_as_current_span("scrapingdog.amazon_search") as span:
+        response = requests.get(url, params=params)
+        span.set_attribute("http.response.status_code", response.status_code)
 
     if response.status_code == 200:
         data = response.json()
@@ -1,8 +1,11 @@
 """Academic_newresearch_agent for finding new research lines"""
 
 from google.adk import Agent
+from opentelemetry import trace
 import requests
 
+tracer = trace.get_tracer(__name__)
+
 
 MODEL = "gemini-2.5-flash"
 
@@ -17,7 +20,10 @@ def get_weather(city: str) -> dict:
         "aqi": 'false'  # Use "imperial" for Fahrenheit
     }
 
-    response = requests.get(base_url, params=params)
+    with tracer.start_as_current_span("weatherapi.request") as span:
+        span.set_attribute("url.full", base_url)
+        response = requests.get(base_url, params=params)
+        span.set_attribute("http.response.status_code", response.status_code)
 
     if response.status_code == 200:
         data = response.json()
@@ -51,7 +57,10 @@ def get_weather_forecast(city: str, days: str) -> dict:
         "alerts": "yes"
     }
 
-    response = requests.get(base_url, params=params)
+    with tracer.start_as_current_span("weatherapi.request") as span:
+        span.set_attribute("url.full", base_url)
+        response = requests.get(base_url, params=params)
+        span.set_attribute("http.response.status_code", response.status_code)
 
     if response.status_code == 200:
         data = response.json()
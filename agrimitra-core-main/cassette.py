@@ -0,0 +1,745 @@
+"""Record/replay cassettes for the external calls made by the agent tree.
+
+A Cassette patches the client libraries at the boundary where the agents and
+web.py leave the process:
+
+- HTTP through `requests` (weatherapi.com in get_weather / get_weather_forecast,
+  scrapingdog in shopping_tool);
+- BigQuery `Client.query`, `Client.get_table` and `Client.list_models`
+  (get_bq_client, the schema lookup, bqml/tools.py);
+- Vertex RAG `rag.retrieval_query` and `rag.list_corpora`;
+- Gemini through google-genai (every ADK agent, streamed or not, and the NL2SQL
+  client) and through the Vertex `GenerativeModel` (GeminiModel in chase_sql,
+  audio transcription and image description in web.py).
+
+Modes:
+- "record": every call goes to the live service and is appended to the cassette;
+- "replay": calls are answered from the cassette and nothing leaves the machine;
+  a call that was not recorded raises CassetteMiss;
+- "auto": replays what is recorded and records what is not.
+
+Calls are matched on a hash of the request (model, contents and config for
+Gemini, SQL text for BigQuery, URL and parameters for HTTP, ...). The random
+function call ids ADK assigns and API keys in query strings are left out of the
+hash, and API keys are never written to the cassette. Dates (YYYY-MM-DD) in a
+Gemini system instruction are masked too, so an agent that puts today's date in
+its instruction still replays on later days; dates in the contents still have to
+match. Identical requests replay
+their recordings in order and then keep repeating the last one, so a cassette
+recorded once can drive a load test of any length. Each replay waits for the
+recorded latency times `latency_scale` (0 replays instantly), and streamed
+responses keep the recorded gaps between chunks. Errors are recorded too and
+raised again on replay.
+
+Usage:
+    with Cassette("cassettes/weather.json", mode="record"):
+        ...  # talk to the live services once
+    with Cassette("cassettes/weather.json", mode="replay", latency_scale=0.5):
+        ...  # same answers, half the latency, no network
+
+`install_from_env()` does the same for CASSETTE_PATH, CASSETTE_MODE and
+CASSETTE_LATENCY_SCALE. Replaying on a machine without Google credentials
+also needs `fake_llm.install_fake_google_auth()` before the agrimitra package
+is imported.
+"""
+
+import asyncio
+import atexit
+import base64
+import contextlib
+import contextvars
+import dataclasses
+import datetime
+import decimal
+import enum
+import hashlib
+import importlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "auto")
+
+# Query parameters that carry credentials; they are not part of the match and are never saved.
+SECRET_PARAMS = {"key", "api_key", "apikey", "access_token", "token"}
+
+# Request fields that differ between otherwise identical calls.
+IGNORED_FIELDS = {"http_options"}
+
+# Dates in system instructions (the data-science agent states today's date); they are
+# masked in the match so a cassette keeps replaying after the day it was recorded.
+INSTRUCTION_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a call the cassette has no recording of."""
+
+
+class CassetteError(RuntimeError):
+    """A recorded error whose original exception type could not be rebuilt."""
+
+
+# Seconds spent in, and number of, calls through a cassette in the current task (see measure()).
+_meter = contextvars.ContextVar("cassette_meter", default=None)
+
+
+@contextlib.contextmanager
+def measure():
+    """Collects the latency (live or replayed) and number of cassette calls made inside the block (same task)."""
+    meter = SimpleNamespace(seconds=0.0, calls=0)
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+def _add_to_meter(seconds: float):
+    meter = _meter.get()
+    if meter is not None:
+        meter.seconds += seconds
+        meter.calls += 1
+
+
+def _canonical(value):
+    """Reduces a request argument to plain JSON data that is stable between runs."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {
+            str(key): _canonical(item)
+            for key, item in value.items()
+            if item is not None
+            and key not in IGNORED_FIELDS
+            # ADK gives every function call a random id ("adk-<uuid>").
+            and not (key == "id" and isinstance(item, str) and item.startswith("adk-"))
+        }
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if hasattr(value, "model_dump"):  # pydantic (google-genai types)
+        return _canonical(value.model_dump(exclude_none=True))
+    if hasattr(type(value), "pb") and hasattr(type(value), "to_dict"):  # proto-plus messages
+        return _canonical(type(value).to_dict(value))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _canonical(dataclasses.asdict(value))
+    if hasattr(value, "to_dict"):  # vertexai Part / Content
+        return _canonical(value.to_dict())
+    if callable(value):
+        return getattr(value, "__qualname__", type(value).__name__)
+    return str(value)
+
+
+def request_key(kind: str, request) -> str:
+    material = json.dumps([kind, _canonical(request)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _summary(value, limit: int = 200) -> str:
+    text = value if isinstance(value, str) else json.dumps(_canonical(value), ensure_ascii=False, default=str)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _redact_params(params) -> dict:
+    if not params:
+        return {}
+    items = params.items() if isinstance(params, dict) else params
+    return {key: ("<redacted>" if key.lower() in SECRET_PARAMS else value) for key, value in items}
+
+
+def _redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = urlencode(list(_redact_params(parse_qsl(parts.query, keep_blank_values=True)).items()))
+    return urlunsplit(parts._replace(query=query))
+
+
+def _class_path(cls) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _import_class(path: str):
+    module_name, _, qualname = path.partition(":")
+    value = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        value = getattr(value, name)
+    return value
+
+
+def _encode_error(error: BaseException) -> dict:
+    # google.api_core errors prefix str() with the HTTP code, which their constructor adds back.
+    message = getattr(error, "message", None)
+    return {"type": _class_path(type(error)), "message": message if isinstance(message, str) else str(error)}
+
+
+def _decode_error(recorded: dict) -> BaseException:
+    try:
+        return _import_class(recorded["type"])(recorded["message"])
+    except Exception:
+        return CassetteError(f"{recorded['type']}: {recorded['message']}")
+
+
+def _encode_message(message) -> dict:
+    """Proto-plus message (Vertex RAG responses) to cassette data."""
+    return {"class": _class_path(type(message)), "json": type(message).to_json(message)}
+
+
+def _decode_message(recorded: dict):
+    return _import_class(recorded["class"]).from_json(recorded["json"], ignore_unknown_fields=True)
+
+
+# --- Response codecs: (encode live response -> JSON data, decode JSON data -> response) ---
+
+def _encode_http(response) -> dict:
+    return {
+        "status_code": response.status_code,
+        "headers": {
+            key: value
+            for key, value in response.headers.items()
+            # The body is stored decoded, so transfer headers no longer apply.
+            if key.lower() not in ("content-encoding", "content-length", "transfer-encoding", "set-cookie")
+        },
+        "encoding": response.encoding,
+        "url": _redact_url(response.url or ""),
+        "body": response.text,
+    }
+
+
+def _decode_http(recorded: dict):
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    response = requests.Response()
+    response.status_code = recorded["status_code"]
+    response.headers = CaseInsensitiveDict(recorded["headers"])
+    response.encoding = recorded["encoding"] or "utf-8"
+    response.url = recorded["url"]
+    response._content = recorded["body"].encode(response.encoding)
+    return response
+
+
+def _encode_genai(response) -> dict:
+    return json.loads(response.model_dump_json(exclude_none=True))
+
+
+def _decode_genai(recorded: dict):
+    from google.genai import types
+
+    return types.GenerateContentResponse.model_validate_json(json.dumps(recorded))
+
+
+def _encode_vertex(response) -> dict:
+    return response.to_dict()
+
+
+def _decode_vertex(recorded: dict):
+    from vertexai.generative_models import GenerationResponse
+
+    return GenerationResponse.from_dict(recorded)
+
+
+def _encode_value(value):
+    """BigQuery cell to JSON data; types JSON lacks are tagged."""
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"$time": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"$decimal": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"$bytes": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode_value(item) for key, item in value.items()}
+    return value
+
+
+_VALUE_DECODERS = {
+    "$datetime": datetime.datetime.fromisoformat,
+    "$date": datetime.date.fromisoformat,
+    "$time": datetime.time.fromisoformat,
+    "$decimal": decimal.Decimal,
+    "$bytes": base64.b64decode,
+}
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1:
+            (tag, item), = value.items()
+            if tag in _VALUE_DECODERS:
+                return _VALUE_DECODERS[tag](item)
+        return {key: _decode_value(item) for key, item in value.items()}
+    return value
+
+
+class RecordedRows(list):
+    """Rows of a recorded query result, with the RowIterator attributes the tools read."""
+
+    def __init__(self, rows: list, schema: list, total_rows: int):
+        super().__init__(rows)
+        self.schema = schema
+        self.total_rows = total_rows
+
+
+class RecordedQueryJob:
+    """A finished BigQuery query job, as returned by Client.query under a cassette."""
+
+    state = "DONE"
+    error_result = None
+
+    def __init__(self, job_id: str, rows: RecordedRows):
+        self.job_id = job_id
+        self._rows = rows
+
+    def done(self, *args, **kwargs) -> bool:
+        return True
+
+    def exception(self, *args, **kwargs):
+        return None
+
+    def result(self, *args, **kwargs) -> RecordedRows:
+        return self._rows
+
+    def to_dataframe(self, *args, **kwargs):
+        import pandas as pd
+
+        columns = [field.name for field in self._rows.schema]
+        return pd.DataFrame([list(row.values()) for row in self._rows], columns=columns)
+
+
+def _encode_query_job(job) -> dict:
+    result = job.result()
+    rows = list(result)
+    schema = list(result.schema or [])
+    return {
+        "job_id": job.job_id,
+        "schema": [field.to_api_repr() for field in schema],
+        "rows": [[_encode_value(value) for value in row.values()] for row in rows],
+        "total_rows": result.total_rows if result.total_rows is not None else len(rows),
+    }
+
+
+def _decode_query_job(recorded: dict) -> RecordedQueryJob:
+    from google.cloud import bigquery
+    from google.cloud.bigquery.table import Row
+
+    schema = [bigquery.SchemaField.from_api_repr(field) for field in recorded["schema"]]
+    field_to_index = {field.name: index for index, field in enumerate(schema)}
+    rows = [Row(tuple(_decode_value(value) for value in row), field_to_index) for row in recorded["rows"]]
+    return RecordedQueryJob(recorded["job_id"], RecordedRows(rows, schema, recorded["total_rows"]))
+
+
+def _encode_table(table) -> dict:
+    return table.to_api_repr()
+
+
+def _decode_table(recorded: dict):
+    from google.cloud import bigquery
+
+    return bigquery.Table.from_api_repr(recorded)
+
+
+def _encode_models(models) -> list:
+    return [model.to_api_repr() for model in models]
+
+
+def _decode_models(recorded: list) -> list:
+    from google.cloud import bigquery
+
+    return [bigquery.Model.from_api_repr(model) for model in recorded]
+
+
+def _encode_messages(messages) -> list:
+    return [_encode_message(message) for message in messages]
+
+
+def _decode_messages(recorded: list) -> list:
+    return [_decode_message(message) for message in recorded]
+
+
+class Cassette:
+    """Records external calls to, or replays them from, one JSON cassette file."""
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode} (expected one of {', '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions = []
+        self._by_key = {}
+        self._cursors = Counter()
+        self._lock = threading.Lock()
+        self._patches = []
+        self._dirty = False
+        self.counters = Counter()
+        if mode != "record":
+            if os.path.exists(path):
+                self.load()
+            elif mode == "replay":
+                raise FileNotFoundError(f"No cassette at {path}; record one first (mode='record')")
+
+    # --- Storage ---
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        for interaction in data.get("interactions", []):
+            self._index(interaction)
+        logger.info("Loaded %d recorded calls from %s", len(self.interactions), self.path)
+
+    def save(self):
+        """Writes the cassette if anything was recorded since it was loaded."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": 1, "interactions": list(self.interactions)}
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        logger.info("Saved %d recorded calls to %s", len(data["interactions"]), self.path)
+
+    def _index(self, interaction: dict):
+        self.interactions.append(interaction)
+        self._by_key.setdefault((interaction["kind"], interaction["key"]), []).append(interaction)
+
+    def _lookup(self, kind: str, key: str) -> Optional[dict]:
+        with self._lock:
+            recorded = self._by_key.get((kind, key))
+            if not recorded:
+                return None
+            index = self._cursors[(kind, key)]
+            self._cursors[(kind, key)] += 1
+            # Repeated requests replay their recordings in order, then the last one again.
+            return recorded[min(index, len(recorded) - 1)]
+
+    def _record(self, kind: str, key: str, summary: str, latency: float, **outcome):
+        _add_to_meter(latency)
+        interaction = {"kind": kind, "key": key, "request": summary, "latency": round(latency, 4), **outcome}
+        with self._lock:
+            self._index(interaction)
+            self._dirty = True
+            self.counters["recorded"] += 1
+
+    def _replay_delay(self, seconds: float) -> float:
+        delay = max(0.0, seconds * self.latency_scale)
+        _add_to_meter(delay)
+        return delay
+
+    def _hit(self, kind: str, key: str, summary: str) -> Optional[dict]:
+        if self.mode == "record":
+            return None
+        recorded = self._lookup(kind, key)
+        if recorded is not None:
+            self.counters["replayed"] += 1
+            return recorded
+        self.counters["missed"] += 1
+        if self.mode == "replay":
+            raise CassetteMiss(f"No recorded {kind} call for request {summary!r} in {self.path}")
+        return None
+
+    # --- Call wrappers ---
+
+    def call(self, kind: str, request, summary: str, live, encode, decode):
+        """Replays `live()` from the cassette, or runs and records it."""
+        key = request_key(kind, request)
+        recorded = self._hit(kind, key, summary)
+        if recorded is not None:
+            time.sleep(self._replay_delay(recorded["latency"]))
+            return self._outcome(recorded, decode)
+        started = time.perf_counter()
+        try:
+            response = encode(live())
+        except Exception as e:
+            self._record(kind, key, summary, time.perf_counter() - started, error=_encode_error(e))
+            raise
+        self._record(kind, key, summary, time.perf_counter() - started, response=response)
+        return decode(response)
+
+    async def call_async(self, kind: str, request, summary: str, live, encode, decode):
+        """call() for coroutines."""
+        key = request_key(kind, request)
+        recorded = self._hit(kind, key, summary)
+        if recorded is not None:
+            await asyncio.sleep(self._replay_delay(recorded["latency"]))
+            return self._outcome(recorded, decode)
+        started = time.perf_counter()
+        try:
+            response = encode(await live())
+        except Exception as e:
+            self._record(kind, key, summary, time.perf_counter() - started, error=_encode_error(e))
+            raise
+        self._record(kind, key, summary, time.perf_counter() - started, response=response)
+        return decode(response)
+
+    async def stream_async(self, kind: str, request, summary: str, live, encode, decode):
+        """call_async() for calls that return an async iterator; chunks keep their recorded timing."""
+        key = request_key(kind, request)
+        recorded = self._hit(kind, key, summary)
+        if recorded is not None:
+            return self._replay_stream(recorded, decode)
+        return self._record_stream(kind, key, summary, live, encode, decode)
+
+    async def _replay_stream(self, recorded: dict, decode):
+        _add_to_meter(recorded["latency"] * self.latency_scale)
+        elapsed = 0.0
+        for offset, chunk in zip(recorded["offsets"], recorded["chunks"]):
+            await asyncio.sleep(max(0.0, (offset - elapsed) * self.latency_scale))
+            elapsed = offset
+            yield decode(chunk)
+        if "error" in recorded:
+            raise _decode_error(recorded["error"])
+
+    async def _record_stream(self, kind: str, key: str, summary: str, live, encode, decode):
+        started = time.perf_counter()
+        chunks, offsets, error = [], [], None
+        try:
+            async for chunk in await live():
+                chunks.append(encode(chunk))
+                offsets.append(round(time.perf_counter() - started, 4))
+                yield decode(chunks[-1])
+        except Exception as e:
+            error = _encode_error(e)
+            raise
+        finally:
+            outcome = {"chunks": chunks, "offsets": offsets}
+            if error is not None:
+                outcome["error"] = error
+            self._record(kind, key, summary, time.perf_counter() - started, **outcome)
+
+    def _outcome(self, recorded: dict, decode):
+        if "error" in recorded:
+            raise _decode_error(recorded["error"])
+        return decode(recorded["response"])
+
+    # --- Patching ---
+
+    def _patch(self, owner, name: str, replacement):
+        self._patches.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def install(self) -> "Cassette":
+        """Patches the client libraries; undone by uninstall()."""
+        if self._patches:
+            return self
+        self._patch_http()
+        self._patch_genai()
+        self._patch_vertex_generative_model()
+        self._patch_bigquery()
+        self._patch_rag()
+        logger.info("Cassette %s installed in %s mode (latency x%s)", self.path, self.mode, self.latency_scale)
+        return self
+
+    def uninstall(self):
+        while self._patches:
+            owner, name, original = self._patches.pop()
+            setattr(owner, name, original)
+
+    def __enter__(self) -> "Cassette":
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+        self.save()
+
+    def _patch_http(self):
+        import requests.api
+
+        original = requests.api.request
+        cassette = self
+
+        def request(method, url, **kwargs):
+            params = _redact_params(kwargs.get("params"))
+            body = kwargs.get("json", kwargs.get("data"))
+            summary = f"{method.upper()} {_redact_url(url)} {json.dumps(params, ensure_ascii=False, default=str)}"
+            return cassette.call(
+                "http", {"method": method.upper(), "url": _redact_url(url), "params": params, "body": body},
+                summary, lambda: original(method, url, **kwargs), _encode_http, _decode_http,
+            )
+
+        # requests.get() and friends look up request() in requests.api at call time.
+        self._patch(requests.api, "request", request)
+        self._patch(requests, "request", request)
+
+    def _patch_genai(self):
+        from google.genai import models
+
+        cassette = self
+        generate_content = models.Models.generate_content
+        generate_content_async = models.AsyncModels.generate_content
+        generate_content_stream = models.AsyncModels.generate_content_stream
+
+        def genai_request(kwargs: dict):
+            config = _canonical(kwargs.get("config"))
+            if isinstance(config, dict) and "system_instruction" in config:
+                instruction = json.dumps(config["system_instruction"], ensure_ascii=False)
+                config["system_instruction"] = json.loads(INSTRUCTION_DATE.sub("<date>", instruction))
+            request = {"model": kwargs.get("model"), "contents": kwargs.get("contents"), "config": config}
+            contents = request["contents"]
+            last = contents[-1] if isinstance(contents, list) and contents else contents
+            return request, f"{request['model']}: {_summary(last)}"
+
+        def sync_generate_content(self, **kwargs):
+            request, summary = genai_request(kwargs)
+            return cassette.call(
+                "genai.generate_content", request, summary,
+                lambda: generate_content(self, **kwargs), _encode_genai, _decode_genai,
+            )
+
+        async def async_generate_content(self, **kwargs):
+            request, summary = genai_request(kwargs)
+            return await cassette.call_async(
+                "genai.generate_content", request, summary,
+                lambda: generate_content_async(self, **kwargs), _encode_genai, _decode_genai,
+            )
+
+        async def async_generate_content_stream(self, **kwargs):
+            request, summary = genai_request(kwargs)
+            return await cassette.stream_async(
+                "genai.generate_content_stream", request, summary,
+                lambda: generate_content_stream(self, **kwargs), _encode_genai, _decode_genai,
+            )
+
+        self._patch(models.Models, "generate_content", sync_generate_content)
+        self._patch(models.AsyncModels, "generate_content", async_generate_content)
+        self._patch(models.AsyncModels, "generate_content_stream", async_generate_content_stream)
+
+    def _patch_vertex_generative_model(self):
+        from vertexai.generative_models import _generative_models
+
+        cassette = self
+        model_class = _generative_models._GenerativeModel
+        generate_content = model_class.generate_content
+        generate_content_async = model_class.generate_content_async
+
+        def vertex_request(model, contents, kwargs: dict):
+            request = {
+                "model": model._model_name,
+                "contents": contents,
+                "generation_config": kwargs.get("generation_config"),
+                "system_instruction": getattr(model, "_system_instruction", None),
+            }
+            last = contents[-1] if isinstance(contents, list) and contents else contents
+            return request, f"{model._model_name}: {_summary(last)}"
+
+        def sync_generate_content(self, contents, **kwargs):
+            if kwargs.get("stream"):
+                return generate_content(self, contents, **kwargs)
+            request, summary = vertex_request(self, contents, kwargs)
+            return cassette.call(
+                "vertexai.generate_content", request, summary,
+                lambda: generate_content(self, contents, **kwargs), _encode_vertex, _decode_vertex,
+            )
+
+        async def async_generate_content(self, contents, **kwargs):
+            if kwargs.get("stream"):
+                return await generate_content_async(self, contents, **kwargs)
+            request, summary = vertex_request(self, contents, kwargs)
+            return await cassette.call_async(
+                "vertexai.generate_content", request, summary,
+                lambda: generate_content_async(self, contents, **kwargs), _encode_vertex, _decode_vertex,
+            )
+
+        self._patch(model_class, "generate_content", sync_generate_content)
+        self._patch(model_class, "generate_content_async", async_generate_content)
+
+    def _patch_bigquery(self):
+        from google.cloud import bigquery
+
+        cassette = self
+        query = bigquery.Client.query
+        get_table = bigquery.Client.get_table
+        list_models = bigquery.Client.list_models
+
+        def recorded_query(self, sql, *args, **kwargs):
+            # Recording waits for the job to finish, so the latency covers the whole query.
+            return cassette.call(
+                "bigquery.query", {"project": self.project, "query": sql}, _summary(" ".join(str(sql).split())),
+                lambda: query(self, sql, *args, **kwargs), _encode_query_job, _decode_query_job,
+            )
+
+        def recorded_get_table(self, table, *args, **kwargs):
+            return cassette.call(
+                "bigquery.get_table", {"table": str(table)}, str(table),
+                lambda: get_table(self, table, *args, **kwargs), _encode_table, _decode_table,
+            )
+
+        def recorded_list_models(self, dataset, *args, **kwargs):
+            return cassette.call(
+                "bigquery.list_models", {"dataset": str(dataset)}, str(dataset),
+                lambda: list_models(self, dataset, *args, **kwargs), _encode_models, _decode_models,
+            )
+
+        self._patch(bigquery.Client, "query", recorded_query)
+        self._patch(bigquery.Client, "get_table", recorded_get_table)
+        self._patch(bigquery.Client, "list_models", recorded_list_models)
+
+    def _patch_rag(self):
+        from vertexai import rag
+
+        cassette = self
+        retrieval_query = rag.retrieval_query
+        list_corpora = rag.list_corpora
+
+        def recorded_retrieval_query(*args, **kwargs):
+            text = kwargs.get("text", args[0] if args else "")
+            return cassette.call(
+                "rag.retrieval_query", {"args": args, "kwargs": kwargs}, _summary(text),
+                lambda: retrieval_query(*args, **kwargs), _encode_message, _decode_message,
+            )
+
+        def recorded_list_corpora(*args, **kwargs):
+            return cassette.call(
+                "rag.list_corpora", {"args": args, "kwargs": kwargs}, "list_corpora",
+                lambda: list_corpora(*args, **kwargs), _encode_messages, _decode_messages,
+            )
+
+        # The tools call rag.<function> on the module, so patching the module attributes is enough.
+        self._patch(rag, "retrieval_query", recorded_retrieval_query)
+        self._patch(rag, "list_corpora", recorded_list_corpora)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "mode": self.mode,
+            "latency_scale": self.latency_scale,
+            "interactions": len(self.interactions),
+            **self.counters,
+        }
+
+
+def install_from_env(environ=os.environ) -> Optional[Cassette]:
+    """Installs a cassette from CASSETTE_PATH / CASSETTE_MODE / CASSETTE_LATENCY_SCALE, saved at exit."""
+    path = environ.get("CASSETTE_PATH")
+    if not path:
+        return None
+    cassette = Cassette(
+        path,
+        mode=environ.get("CASSETTE_MODE", "replay"),
+        latency_scale=float(environ.get("CASSETTE_LATENCY_SCALE", "1")),
+    ).install()
+    atexit.register(cassette.save)
+    return cassette
@@ -0,0 +1,352 @@
+"""Deterministic fake LLM backend for offline benchmarks of the agent tree.
+
+`install(root_agent, script)` gives every LlmAgent in the tree a FakeLlm and
+replaces the models behind `GeminiModel` (chase_sql/llm_utils.py) and the
+NL2SQL genai client (bigquery/tools.py). Responses come from a FakeScript:
+
+- scripted rules, loaded from JSON (`FakeScript.load`), that match on agent
+  name, a regex over the input and the step within the agent's turn, and emit
+  either a final text or tool calls;
+- recorded transcripts: `FakeScript.from_session` turns an ADK session dump
+  (e.g. a SessionManager archive) into rules that replay the same routing and
+  answers, including the sub-agent results returned through AgentTools.
+
+Every response waits for a latency drawn from the rule's distribution (fixed,
+uniform, normal or log-normal). The draw is seeded by the script seed, agent,
+input and step, so the same conversation gets the same latencies however
+requests interleave. `measure()` collects the simulated model time of the
+current task, which benchmarks subtract from wall time to get framework
+overhead.
+
+Script format (JSON):
+    {
+      "seed": 1,
+      "latency": {"distribution": "lognormal", "mean": 0.8, "sigma": 0.4},
+      "rules": [
+        {"agent": "agrimitra_agent", "when": "weather|mausam", "step": 0,
+         "call": {"name": "weather_forecast_agent", "args": {"request": "{input}"}}},
+        {"agent": "agrimitra_agent", "step": 1, "text": "{tool_result}"},
+        {"agent": "*", "text": "(fake {agent}) {input}", "latency": 0.2}
+      ]
+    }
+Templates: {input} (the user text of the turn), {agent} and {tool_result}
+(the text of the last tool response). Rules are tried in order; a rule without
+"step" matches any step and one without "when" matches any input.
+
+Google clients are built on first use (the web app's startup warm-up builds
+them right away), and building one needs Google credentials; call
+`install_fake_google_auth()` first on a machine without them.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import math
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+class Latency:
+    """A latency distribution in seconds."""
+
+    def __init__(self, distribution: str = "fixed", mean: float = 0.0, sigma: float = 0.0,
+                 low: float = 0.0, high: float = 0.0):
+        if distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.mean = mean
+        self.sigma = sigma
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def from_spec(cls, spec) -> "Latency":
+        """Builds a Latency from a number of seconds or a dict such as {"distribution": "lognormal", "mean": 0.8}."""
+        if spec is None:
+            return cls()
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", mean=float(spec))
+        return cls(**spec)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "uniform":
+            return rng.uniform(self.low, self.high)
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "normal":
+            return max(0.0, rng.gauss(self.mean, self.sigma))
+        if self.distribution == "lognormal":
+            mu = math.log(self.mean) - self.sigma ** 2 / 2
+            return rng.lognormvariate(mu, self.sigma)
+        return self.mean
+
+
+@dataclass
+class Rule:
+    """One scripted response. `calls` are (name, args) tool calls; otherwise `text` is returned."""
+    agent: str = "*"
+    when: Optional[str] = None
+    step: Optional[int] = None
+    text: Optional[str] = None
+    calls: list = field(default_factory=list)
+    latency: Optional[Latency] = None
+
+    def __post_init__(self):
+        self._pattern = re.compile(self.when, re.IGNORECASE | re.DOTALL) if self.when else None
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "Rule":
+        calls = spec.get("calls") or ([spec["call"]] if spec.get("call") else [])
+        return cls(
+            agent=spec.get("agent", "*"),
+            when=spec.get("when"),
+            step=spec.get("step"),
+            text=spec.get("text"),
+            calls=[(call["name"], call.get("args", {})) for call in calls],
+            latency=Latency.from_spec(spec["latency"]) if "latency" in spec else None,
+        )
+
+    def matches(self, agent: str, input_text: str, step: int) -> bool:
+        return (
+            self.agent in ("*", agent)
+            and (self.step is None or self.step == step)
+            and (self._pattern is None or self._pattern.search(input_text) is not None)
+        )
+
+
+def _fill(template, values: dict):
+    """Substitutes {input}/{agent}/{tool_result} in a string, or in every string of a dict/list."""
+    if isinstance(template, str):
+        for key, value in values.items():
+            template = template.replace("{" + key + "}", value)
+        return template
+    if isinstance(template, dict):
+        return {key: _fill(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_fill(value, values) for value in template]
+    return template
+
+
+# Simulated model seconds and calls of the current task (see measure()).
+_meter = contextvars.ContextVar("fake_llm_meter", default=None)
+
+
+@contextlib.contextmanager
+def measure():
+    """Collects the simulated latency and number of fake model calls made inside the block (same task)."""
+    meter = SimpleNamespace(seconds=0.0, calls=0)
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+class FakeScript:
+    """An ordered list of rules with a default latency and seed."""
+
+    def __init__(self, rules: list, latency=None, seed: int = 0):
+        self.rules = rules
+        self.latency = Latency.from_spec(latency)
+        self.seed = seed
+        self.calls = {}  # agent or model name -> number of responses
+
+    @classmethod
+    def load(cls, path: str) -> "FakeScript":
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        return cls([Rule.from_dict(rule) for rule in spec.get("rules", [])], spec.get("latency"), spec.get("seed", 0))
+
+    @classmethod
+    def from_session(cls, path: str, latency=None, seed: int = 0) -> "FakeScript":
+        """Builds replay rules from an ADK session dump (Session.model_dump_json())."""
+        from google.adk.sessions import Session
+
+        with open(path, "r", encoding="utf-8") as f:
+            session = Session.model_validate_json(f.read())
+        return cls(rules_from_events(session.events), latency, seed)
+
+    def respond(self, agent: str, input_text: str, step: int, tool_result: str) -> tuple:
+        """Returns (rule, latency in seconds) for a model call."""
+        self.calls[agent] = self.calls.get(agent, 0) + 1
+        rule = next((rule for rule in self.rules if rule.matches(agent, input_text, step)), None)
+        if rule is None:
+            rule = Rule(text="(fake {agent}) {input}")
+        rng = random.Random(f"{self.seed}:{agent}:{step}:{input_text}")
+        seconds = (rule.latency or self.latency).sample(rng)
+        meter = _meter.get()
+        if meter is not None:
+            meter.seconds += seconds
+            meter.calls += 1
+        values = {"input": input_text, "agent": agent, "tool_result": tool_result}
+        return Rule(text=_fill(rule.text, values), calls=[(name, _fill(args, values)) for name, args in rule.calls]), seconds
+
+
+def rules_from_events(events: list) -> list:
+    """
+    Turns recorded events into exact-match rules: the routing and final answer of
+    every agent that authored events, and the result of every AgentTool call
+    (an AgentTool sub-agent's own events are not part of the parent session).
+    """
+    rules = []
+    turn_input, step = None, 0
+    call_args = {}
+    for event in events:
+        parts = event.content.parts if event.content and event.content.parts else []
+        text = "".join(part.text for part in parts if part.text and not part.thought)
+        if event.author == "user":
+            if any(part.function_response for part in parts):
+                continue
+            turn_input, step = text, 0
+            continue
+        if turn_input is None:
+            continue
+        when = "^" + re.escape(turn_input) + "$"
+        calls = event.get_function_calls()
+        responses = event.get_function_responses()
+        if calls:
+            for call in calls:
+                call_args[call.id] = call.args or {}
+            rules.append(Rule(agent=event.author, when=when, step=step,
+                              calls=[(call.name, call.args or {}) for call in calls]))
+        if responses:
+            step += 1
+            for response in responses:
+                request = call_args.get(response.id, {}).get("request")
+                result = (response.response or {}).get("result")
+                if isinstance(request, str) and isinstance(result, str):
+                    rules.append(Rule(agent=response.name, when="^" + re.escape(request) + "$", step=0, text=result))
+        if text and not calls and not responses and not event.partial:
+            rules.append(Rule(agent=event.author, when=when, step=step, text=text))
+    return rules
+
+
+def default_script(latency=None, seed: int = 0) -> FakeScript:
+    """
+    Routes farmer questions by keyword to the sub-agents that need no network
+    (weather, shopping, RAG; none of their own tools are called) and answers with
+    the sub-agent result. Everything else is answered by the agent itself.
+    """
+    routes = [
+        ("weather_forecast_agent", r"weather|forecast|rain|mausam|baarish|barish|temperature"),
+        ("shopping_agent", r"\bbuy\b|price of|kit|kharid|amazon|suggest a"),
+        ("rag_agent", r"scheme|yojana|kisan|subsidy|msp|fertili[sz]er|khad|pest|disease|blight"),
+    ]
+    rules = [
+        Rule.from_dict({"agent": "agrimitra_agent", "when": pattern, "step": 0,
+                        "call": {"name": name, "args": {"request": "{input}"}}})
+        for name, pattern in routes
+    ]
+    rules += [
+        Rule.from_dict({"agent": "agrimitra_agent", "step": 1, "text": "{tool_result}"}),
+        Rule.from_dict({"agent": "*", "text": "(fake {agent}) Advice for: {input}"}),
+    ]
+    return FakeScript(rules, latency, seed)
+
+
+def _request_view(llm_request) -> tuple:
+    """Returns (input text, step, last tool result) of an LlmRequest."""
+    contents = llm_request.contents or []
+    input_index, input_text = -1, ""
+    for index, content in enumerate(contents):
+        parts = content.parts or []
+        if content.role == "user" and any(part.text for part in parts) and not any(part.function_response for part in parts):
+            input_index, input_text = index, "\n".join(part.text for part in parts if part.text)
+    step, tool_result = 0, ""
+    for content in contents[input_index + 1:]:
+        responses = [part.function_response for part in content.parts or [] if part.function_response]
+        if responses:
+            step += 1
+            result = responses[-1].response or {}
+            tool_result = result["result"] if isinstance(result.get("result"), str) else json.dumps(result, default=str)
+    return input_text, step, tool_result
+
+
+class FakeLlm(BaseLlm):
+    """An ADK model that answers from a FakeScript on behalf of one agent."""
+
+    model: str = "fake-llm"
+    agent_name: str = ""
+    script: Any = None
+
+    async def generate_content_async(self, llm_request, stream: bool = False):
+        input_text, step, tool_result = _request_view(llm_request)
+        rule, seconds = self.script.respond(self.agent_name, input_text, step, tool_result)
+        await asyncio.sleep(seconds)
+        if rule.calls:
+            parts = [types.Part(function_call=types.FunctionCall(name=name, args=args)) for name, args in rule.calls]
+            output_chars = sum(len(json.dumps(args)) for _, args in rule.calls)
+        else:
+            parts = [types.Part(text=rule.text or "")]
+            output_chars = len(rule.text or "")
+        prompt_chars = sum(len(part.text or "") for content in llm_request.contents or [] for part in content.parts or [])
+        yield LlmResponse(
+            content=types.Content(role="model", parts=parts),
+            # Rough token counts (4 characters per token), so usage-based telemetry keeps working.
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4,
+                candidates_token_count=output_chars // 4,
+                total_token_count=(prompt_chars + output_chars) // 4,
+            ),
+        )
+
+
+class FakeGenerativeModel:
+    """Stands in for vertexai's GenerativeModel behind GeminiModel.call (synchronous)."""
+
+    def __init__(self, script: FakeScript, model_name: str = "gemini"):
+        self.script = script
+        self.model_name = model_name
+
+    def generate_content(self, prompt, generation_config=None, safety_settings=None):
+        rule, seconds = self.script.respond(self.model_name, str(prompt), 0, "")
+        time.sleep(seconds)
+        return SimpleNamespace(text=rule.text or "")
+
+
+class FakeGenaiClient:
+    """Stands in for google.genai.Client: only `models.generate_content` is implemented."""
+
+    def __init__(self, script: FakeScript):
+        self.models = self
+        self.script = script
+
+    def generate_content(self, model: str, contents, config=None):
+        rule, seconds = self.script.respond(model or "genai", str(contents), 0, "")
+        time.sleep(seconds)
+        return SimpleNamespace(text=rule.text or "")
+
+
+def install(root_agent, script: FakeScript) -> FakeScript:
+    """Points every LlmAgent under `root_agent`, GeminiModel and the NL2SQL client at `script`."""
+    from agrimitra.lazy_agent_tool import walk_agents
+
+    for agent in walk_agents(root_agent):
+        if hasattr(agent, "model"):
+            agent.model = FakeLlm(agent_name=agent.name, script=script)
+
+    from agrimitra.sub_agents.data_science.data_science.sub_agents.bigquery import tools as bigquery_tools
+    from agrimitra.sub_agents.data_science.data_science.sub_agents.bigquery.chase_sql import llm_utils
+
+    llm_utils.generative_model_factory = lambda model_name: FakeGenerativeModel(script, model_name)
+    bigquery_tools.llm_client = FakeGenaiClient(script)
+    return script
+
+
+def install_fake_google_auth(project: str = "offline"):
+    """Makes google.auth.default() return anonymous credentials, so Google clients can be constructed offline."""
+    import google.auth
+    from google.auth.credentials import AnonymousCredentials
+
+    google.auth.default = lambda *args, **kwargs: (AnonymousCredentials(), project)
@@ -1,13 +1,26 @@
 import asyncio
+import logging
+import os
 
 from agrimitra.agent import agrimitra_agent
+from agrimitra.compaction import compaction_config_from_env
 from dotenv import load_dotenv
+from google.adk.apps import App
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from utils2 import add_user_query_to_history, call_agent_async
 
 load_dotenv()
 
+# Agent and tool diagnostics (SQL, events, state); LOG_LEVEL=DEBUG shows the full payloads.
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper())
+
+# CASSETTE_PATH=... CASSETTE_MODE=record records the conversation's external calls for offline replay.
+if os.environ.get("CASSETTE_PATH"):
+    import cassette
+
+    cassette.install_from_env()
+
 
 
 # Create a new session service to store state
@@ -36,9 +49,14 @@ async def main_async():
     SESSION_ID = new_session.id
     print(f"Created new session: {SESSION_ID}")
 
+    # Long conversations are compacted once the prompt reaches SESSION_COMPACTION_TOKEN_THRESHOLD
+    # tokens (see agrimitra/compaction.py); each turn prints the prompt tokens it used.
     runner = Runner(
-        agent=agrimitra_agent,
-        app_name=APP_NAME,
+        app=App(
+            name=APP_NAME,
+            root_agent=agrimitra_agent,
+            events_compaction_config=compaction_config_from_env(),
+        ),
         session_service=session_service,
     )
     print("\nWelcome to Agrimitra!")
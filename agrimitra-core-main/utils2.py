@@ -1,7 +1,10 @@
+import logging
 from datetime import datetime
 
 from google.genai import types
 
+logger = logging.getLogger(__name__)
+
 
 # ANSI color codes for terminal output
 class Colors:
@@ -69,8 +72,8 @@ async def update_interaction_history(session_service, app_name, user_id, session
             session_id=session_id,
             state=updated_state,
         )
-    except Exception as e:
-        print(f"Error updating interaction history: {e}")
+    except Exception:
+        logger.exception("Error updating interaction history")
 
 
 async def add_user_query_to_history(session_service, app_name, user_id, session_id, query):
@@ -111,21 +114,21 @@ async def display_state(session_service, app_name, user_id, session_id, label="C
             app_name=app_name, user_id=user_id, session_id=session_id
         )
         interaction_history = session.state.get("interaction_history", [])
-        print(interaction_history)
-    except Exception as e:
-        print(f"Error updating interaction history: {e}")
+        logger.debug("%s: interaction history %s", label, interaction_history)
+    except Exception:
+        logger.exception("Error reading interaction history")
 
 
 async def process_agent_response(event):
     """Process and display agent response events."""
-    print(f"Event ID: {event.id}, Author: {event.author}")
+    logger.debug("Event ID: %s, Author: %s", event.id, event.author)
 
     # Check for specific parts first
     has_specific_part = False
     if event.content and event.content.parts:
         for part in event.content.parts:
             if hasattr(part, "text") and part.text and not part.text.isspace():
-                print(f"  Text: '{part.text.strip()}'")
+                logger.debug("  Text: %r", part.text.strip())
 
     # Check for final response after specific parts
     final_response = None
@@ -161,6 +164,7 @@ async def call_agent_async(runner, user_id, session_id, query):
     )
     final_response_text = None
     agent_name = None
+    prompt_tokens = last_prompt_tokens = 0
 
     # Display state before processing the message
     await display_state(
@@ -178,12 +182,15 @@ async def call_agent_async(runner, user_id, session_id, query):
             # Capture the agent name from the event if available
             if event.author:
                 agent_name = event.author
+            if not event.partial and event.usage_metadata and event.usage_metadata.prompt_token_count:
+                prompt_tokens += event.usage_metadata.prompt_token_count
+                last_prompt_tokens = event.usage_metadata.prompt_token_count
 
             response = await process_agent_response(event)
             if response:
                 final_response_text = response
-    except Exception as e:
-        print(f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: {e}{Colors.RESET}")
+    except Exception:
+        logger.exception("ERROR during agent run")
 
     # Add the agent response to interaction history if we got a final response
     if final_response_text and agent_name:
@@ -205,5 +212,9 @@ async def call_agent_async(runner, user_id, session_id, query):
         "State AFTER processing",
     )
 
+    print(
+        f"{Colors.YELLOW}Prompt tokens this turn: {prompt_tokens} "
+        f"(last model call: {last_prompt_tokens}){Colors.RESET}"
+    )
     print(f"{Colors.YELLOW}{'-' * 30}{Colors.RESET}")
     return final_response_text
\ No newline at end of file